@@ -1,6 +1,8 @@
 from os import getenv, path
 from pathlib import Path
+from tempfile import gettempdir
 from django.core.management.utils import get_random_secret_key
+from corsheaders.defaults import default_headers
 import dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'questionario.instrumentacao.InstrumentacaoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -91,6 +94,19 @@ DATABASES = {
 }
 
 
+# Cache
+# Em produção com vários workers use um backend compartilhado (Redis,
+# Memcached, banco) para que invalidações valham entre processos. A versão
+# do catálogo fica no banco e vale para todos mesmo com LocMemCache.
+
+CACHES = {
+    'default': {
+        'BACKEND': getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': getenv('CACHE_LOCATION', ''),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -156,11 +172,60 @@ AUTH_COOKIE_HTTP_ONLY = True
 AUTH_COOKIE_PATH = '/'
 AUTH_COOKIE_SAMESITE = 'Lax'
 
+# Autenticação: segundos de cache do usuário (invalidado ao salvar) e quantos
+# tokens já validados cada processo guarda para pular a checagem da assinatura
+USUARIO_CACHE_TTL = int(getenv('USUARIO_CACHE_TTL', '60'))
+TOKENS_VALIDADOS_MAXIMO = int(getenv('TOKENS_VALIDADOS_MAXIMO', '1024'))
+
+# Revogação de tokens (logout, desativação): cada processo relê as novas a
+# cada REVOGACAO_INTERVALO segundos; no processo que revogou vale na hora
+REVOGACAO_INTERVALO = int(getenv('REVOGACAO_INTERVALO', '5'))
+REVOGACAO_CAPACIDADE = int(getenv('REVOGACAO_CAPACIDADE', '100000'))
+
+# Relatórios PDF: processos de renderização (0 = na própria requisição),
+# renderizações que podem aguardar na fila e tempo limite em segundos
+RELATORIO_PROCESSOS = int(getenv('RELATORIO_PROCESSOS', '2'))
+RELATORIO_FILA_MAXIMA = int(getenv('RELATORIO_FILA_MAXIMA', '32'))
+RELATORIO_TEMPO_LIMITE = int(getenv('RELATORIO_TEMPO_LIMITE', '120'))
+RELATORIO_AQUECER = getenv('RELATORIO_AQUECER', 'False') == 'True'
+
+# Submissões aceitas por requisição em modulos/respostas/lote/
+RESPOSTAS_LOTE_MAXIMO = int(getenv('RESPOSTAS_LOTE_MAXIMO', '100'))
+
+# Idempotency-Key nas submissões: validade do resultado guardado, quanto uma
+# retentativa espera a requisição original e por quanto tempo a original
+# segura a chave antes de outra poder assumi-la (segundos)
+IDEMPOTENCIA_TTL = int(getenv('IDEMPOTENCIA_TTL', str(60 * 60 * 24)))
+IDEMPOTENCIA_ESPERA = int(getenv('IDEMPOTENCIA_ESPERA', '30'))
+IDEMPOTENCIA_CONCESSAO = int(getenv('IDEMPOTENCIA_CONCESSAO', str(2 * IDEMPOTENCIA_ESPERA)))
+
+# Autosave dos rascunhos só no cache, gravado no banco a cada RASCUNHO_INTERVALO
+# segundos. Exige CACHE_BACKEND compartilhado (check questionario.E001), e um
+# worker morto com SIGKILL deixa os últimos segundos de autosave só no cache.
+RASCUNHO_BUFFER = getenv('RASCUNHO_BUFFER', 'False') == 'True'
+RASCUNHO_INTERVALO = int(getenv('RASCUNHO_INTERVALO', '5'))
+
+# Header Server-Timing (total, SQL e spans) em todas as respostas e log JSON
+# das requisições acima de INSTRUMENTACAO_LENTA_MS milissegundos
+INSTRUMENTACAO = getenv('INSTRUMENTACAO', 'True') == 'True'
+INSTRUMENTACAO_LENTA_MS = int(getenv('INSTRUMENTACAO_LENTA_MS', '1000'))
+
+# Métricas Prometheus em /api/metricas/ (só staff). Cada worker grava as suas em
+# METRICAS_DIR, que deve ser um diretório local comum a todos os workers da máquina.
+METRICAS = getenv('METRICAS', 'True') == 'True'
+METRICAS_DIR = getenv('METRICAS_DIR', path.join(gettempdir(), 'hub_metricas'))
+METRICAS_INTERVALO = int(getenv('METRICAS_INTERVALO', '5'))
+
+# Tamanho padrão e máximo (?limite=) das páginas do histórico de relatórios
+RELATORIOS_PAGINA = int(getenv('RELATORIOS_PAGINA', '50'))
+RELATORIOS_PAGINA_MAXIMA = int(getenv('RELATORIOS_PAGINA_MAXIMA', '500'))
+
 CORS_ALLOWED_ORIGINS = getenv(
     'CORS_ALLOWED_ORIGINS',
     'http://localhost:3000, https://127.0.0.1:3000, http://localhost:8000'
 ).split(',')
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
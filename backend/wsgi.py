@@ -5,3 +5,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Workers que geram relatórios podem carregar o reportlab e subir o pool de
+# renderização já no boot, em vez de na primeira requisição de PDF
+from django.conf import settings
+
+if settings.RELATORIO_AQUECER:
+    from questionario.tarefas import aquecer_relatorios
+    aquecer_relatorios()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Relatorio, Modulo, RespostaModulo, Dimensao, RespostaDimensao, Pergunta
+from .models import Relatorio, Modulo, RespostaModulo, Dimensao, RespostaDimensao, Pergunta, MediaDimensao, TarefaRelatorio, ChaveIdempotencia, UltimaRespostaModulo, UltimaRespostaDimensao
 
 admin.site.register(Relatorio)
 admin.site.register(Modulo)
@@ -7,4 +7,9 @@ admin.site.register(RespostaModulo)
 admin.site.register(Dimensao)
 admin.site.register(RespostaDimensao)
 admin.site.register(Pergunta)
+admin.site.register(MediaDimensao)
+admin.site.register(TarefaRelatorio)
 
+admin.site.register(ChaveIdempotencia)
+admin.site.register(UltimaRespostaModulo)
+admin.site.register(UltimaRespostaDimensao)
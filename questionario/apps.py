@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class QuestionarioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'questionario'
\ No newline at end of file
+    name = 'questionario'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
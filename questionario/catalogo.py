@@ -0,0 +1,117 @@
+import hashlib
+import json
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from .metricas import contar_cache
+from .models import Modulo, VersaoCatalogo
+
+TEMPO_CACHE = getattr(settings, 'CATALOGO_CACHE_TIMEOUT', 60 * 60)
+
+# Cópia local do catálogo da versão atual, evita desserializar a cada request
+_local = {'versao': None, 'itens': {}}
+
+
+def versao_catalogo():
+    # Uma consulta pela chave primária. A versão não pode morar no cache:
+    # com LocMemCache só o worker que salvou a edição veria a versão nova, e
+    # os outros seguiriam servindo o catálogo e os planos de pontuação antigos.
+    versao = VersaoCatalogo.objects.filter(pk=1).values_list('versao', flat=True).first()
+    if versao is None:
+        versao = VersaoCatalogo.objects.get_or_create(pk=1, defaults={'versao': uuid.uuid4().hex})[0].versao
+    return versao
+
+
+def invalidar_catalogo():
+    versao = uuid.uuid4().hex
+    if not VersaoCatalogo.objects.filter(pk=1).update(versao=versao):
+        VersaoCatalogo.objects.update_or_create(pk=1, defaults={'versao': versao})
+
+
+def calcular_etag(dados):
+    conteudo = json.dumps(dados, sort_keys=True, separators=(',', ':'), default=str)
+    return '"%s"' % hashlib.sha256(conteudo.encode()).hexdigest()[:32]
+
+
+def _obter(nome, construir):
+    versao = versao_catalogo()
+    if _local['versao'] != versao:
+        _local['versao'] = versao
+        _local['itens'] = {}
+
+    if nome in _local['itens']:
+        contar_cache('catalogo', True)
+        return _local['itens'][nome]
+
+    chave = f'questionario:catalogo:{versao}:{nome}'
+    item = cache.get(chave)
+    contar_cache('catalogo', item is not None)
+    if item is None:
+        dados = construir()
+        if dados is None:
+            return None, None
+        item = (dados, calcular_etag(dados))
+        cache.set(chave, item, TEMPO_CACHE)
+
+    _local['itens'][nome] = item
+    return item
+
+
+def _construir_questionario():
+    modulos = Modulo.objects.prefetch_related('dimensoes').all()
+
+    dadosQuestionario = []
+    for modulo in modulos:
+        dadosDimensoes = [
+            {
+                'dimensaoTitulo': dimensao.titulo,
+                'descricao': dimensao.descricao,
+                'tipo': dimensao.get_tipo_display(),
+                'explicacao': dimensao.explicacao,
+            }
+            for dimensao in modulo.dimensoes.all()
+        ]
+        dadosQuestionario.append({
+            'nome': modulo.nome,
+            'descricao': modulo.descricao,
+            'tempo': modulo.tempo,
+            'perguntasQntd': modulo.perguntasQntd,
+            'dimensoes': dadosDimensoes
+        })
+    return dadosQuestionario
+
+
+def _construir_modulo(nomeModulo):
+    moduloObj = Modulo.objects.prefetch_related(
+        'dimensoes__perguntas').filter(nome=nomeModulo).first()
+    if moduloObj is None:
+        return None
+
+    dadosDimensoes = []
+    for dimensao in moduloObj.dimensoes.all():
+        dadosDimensoes.append({
+            'dimensaoTitulo': dimensao.titulo,
+            'descricao': dimensao.descricao,
+            'tipo': dimensao.get_tipo_display(),
+            'explicacao': dimensao.explicacao,
+            'perguntas': [
+                {'id': p.id, 'pergunta': p.pergunta} for p in dimensao.perguntas.all()
+            ]
+        })
+
+    return {
+        'id': moduloObj.id,
+        'nomeModulo': moduloObj.nome,
+        'dimensoes': dadosDimensoes,
+    }
+
+
+def catalogo_questionario():
+    # (lista de módulos, etag)
+    return _obter('questionario', _construir_questionario)
+
+
+def catalogo_modulo(nomeModulo):
+    # (dados do módulo, etag) ou (None, None) se o módulo não existe
+    chave = 'modulo:' + hashlib.sha256(nomeModulo.encode()).hexdigest()[:16]
+    return _obter(chave, lambda: _construir_modulo(nomeModulo))
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Backends em que cada worker enxerga só o próprio cache
+CACHES_LOCAIS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def rascunhos_exigem_cache_compartilhado(app_configs, **kwargs):
+    # Com o buffer dos rascunhos num cache local, um worker não vê os autosaves
+    # dos outros: a leitura mostra rascunho antigo e a submissão final descarrega
+    # só o que está no cache do próprio worker.
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if getattr(settings, 'RASCUNHO_BUFFER', False) and backend in CACHES_LOCAIS:
+        return [Error(
+            f'RASCUNHO_BUFFER=True exige um cache compartilhado entre os workers; '
+            f'o cache padrão é {backend}.',
+            hint='Configure CACHE_BACKEND (Redis, Memcached, banco) ou desligue '
+                 'RASCUNHO_BUFFER. Com um único processo, silencie questionario.E001 '
+                 'em SILENCED_SYSTEM_CHECKS.',
+            id='questionario.E001',
+        )]
+    return []
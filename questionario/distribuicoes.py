@@ -0,0 +1,126 @@
+import threading
+import uuid
+from .models import UltimaRespostaDimensao, UltimaRespostaModulo, VersaoDistribuicoes
+
+FAIXAS_HISTOGRAMA = 10
+
+
+def limites_histograma(minimo, maximo):
+    import numpy as np
+    return np.linspace(minimo, maximo, FAIXAS_HISTOGRAMA + 1)
+
+
+def versao_distribuicoes():
+    # Uma consulta pela chave primária; no banco pelo mesmo motivo da
+    # versão do catálogo (ver catalogo.versao_catalogo)
+    versao = VersaoDistribuicoes.objects.filter(pk=1).values_list('versao', flat=True).first()
+    if versao is None:
+        versao = VersaoDistribuicoes.objects.get_or_create(
+            pk=1, defaults={'versao': uuid.uuid4().hex})[0].versao
+    return versao
+
+
+def invalidar_distribuicoes():
+    # Chamada depois do commit de toda mudança nos ponteiros de última resposta
+    versao = uuid.uuid4().hex
+    if not VersaoDistribuicoes.objects.filter(pk=1).update(versao=versao):
+        VersaoDistribuicoes.objects.update_or_create(pk=1, defaults={'versao': versao})
+
+
+class Distribuicao:
+    # Última pontuação de cada usuário e o vetor ordenado correspondente
+
+    def __init__(self):
+        self.ultimas = {}
+        self._ordenado = None
+
+    def registrar(self, usuario_id, valor):
+        self.ultimas[usuario_id] = valor
+        self._ordenado = None
+
+    def ordenado(self):
+        import numpy as np
+        if self._ordenado is None:
+            self._ordenado = np.sort(np.fromiter(
+                self.ultimas.values(),
+                dtype=np.int64, count=len(self.ultimas)
+            ))
+        return self._ordenado
+
+    def valor_usuario(self, usuario_id):
+        return self.ultimas.get(usuario_id)
+
+    def estatisticas(self, usuario_id, limites):
+        import numpy as np
+        valores = self.ordenado()
+        valor = self.valor_usuario(usuario_id)
+        dados = {
+            'valorFinal': valor,
+            'participantes': int(valores.size),
+            'percentil': None,
+            'quartis': None,
+            'histograma': {'limites': [float(x) for x in limites], 'contagens': [0] * (len(limites) - 1)},
+        }
+        if not valores.size:
+            return dados
+
+        if valor is not None:
+            # Percentil "médio": abaixo + metade dos empates
+            abaixo = np.searchsorted(valores, valor, side='left')
+            ate = np.searchsorted(valores, valor, side='right')
+            dados['percentil'] = round(float((abaixo + (ate - abaixo) / 2) / valores.size * 100), 2)
+
+        q1, mediana, q3 = np.percentile(valores, [25, 50, 75])
+        dados['quartis'] = {'q1': float(q1), 'mediana': float(mediana), 'q3': float(q3)}
+
+        contagens, _ = np.histogram(np.clip(valores, limites[0], limites[-1]), bins=limites)
+        dados['histograma']['contagens'] = contagens.tolist()
+        return dados
+
+
+class DistribuicoesPontuacao:
+    # Mantém, por processo, as distribuições das últimas pontuações por
+    # dimensão e por módulo, lidas dos ponteiros de última resposta. Cada
+    # submissão troca a versão; o processo relê os ponteiros na próxima
+    # consulta depois disso, uma linha por usuário e dimensão ou módulo.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versao = None
+        self.dimensoes = {}
+        self.modulos = {}
+
+    def atualizar(self):
+        # A versão é lida antes dos ponteiros: um commit entre as duas
+        # leituras no máximo força mais uma releitura
+        versao = versao_distribuicoes()
+        with self._lock:
+            if versao == self._versao:
+                return
+
+            dimensoes = {}
+            for dimensao_id, usuario_id, valor in UltimaRespostaDimensao.objects.values_list(
+                    'dimensao_id', 'usuario_id', 'resposta_dimensao__valorFinal').iterator(chunk_size=2000):
+                dimensoes.setdefault(dimensao_id, Distribuicao()).registrar(usuario_id, valor)
+
+            modulos = {}
+            for modulo_id, usuario_id, valor in UltimaRespostaModulo.objects.values_list(
+                    'modulo_id', 'usuario_id', 'resposta_modulo__valorFinal').iterator(chunk_size=2000):
+                modulos.setdefault(modulo_id, Distribuicao()).registrar(usuario_id, valor)
+
+            self.dimensoes, self.modulos, self._versao = dimensoes, modulos, versao
+
+    def estatisticas_modulo(self, usuario_id, modulo_id, limites_modulo, limites_dimensoes):
+        # limites_dimensoes: {dimensao_id: limites do histograma}
+        self.atualizar()
+        with self._lock:
+            vazia = Distribuicao()
+            total = self.modulos.get(modulo_id, vazia).estatisticas(usuario_id, limites_modulo)
+            por_dimensao = {
+                dimensao_id: self.dimensoes.get(dimensao_id, vazia).estatisticas(usuario_id, limites)
+                for dimensao_id, limites in limites_dimensoes.items()
+            }
+        return total, por_dimensao
+
+
+distribuicoes = DistribuicoesPontuacao()
@@ -0,0 +1,145 @@
+import re
+import time
+import zipfile
+from collections import deque
+from .models import RespostaModulo
+from .relatorios import abrir_relatorio, coletar_dados_relatorios, relatorios_salvos, salvar_relatorio
+from .metricas import contar_cache, incrementar
+from .tarefas import FilaCheia, PROCESSOS, submeter_renderizacao
+from . import pdf
+
+TAMANHO_LOTE = 50
+# Segundos esperando vaga no pool, sem nada nosso em voo, antes de renderizar aqui mesmo
+ESPERA_FILA = 5
+
+
+class _SaidaZip:
+    # Destino não posicionável do ZipFile: acumula os bytes escritos até o
+    # gerador repassá-los ao cliente
+    def __init__(self):
+        self._partes = []
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def esvaziar(self):
+        dados = b''.join(self._partes)
+        self._partes = []
+        return dados
+
+
+def selecionar_respostas(modulo=None, de=None, ate=None, todas=False):
+    # Respostas no período; por padrão só a última de cada empresa por módulo
+    respostas = RespostaModulo.objects.select_related('usuario', 'modulo')
+    if modulo is not None:
+        respostas = respostas.filter(modulo=modulo)
+    if de is not None:
+        respostas = respostas.filter(dataResposta__gte=de)
+    if ate is not None:
+        respostas = respostas.filter(dataResposta__lte=ate)
+
+    if todas:
+        return respostas.order_by('modulo_id', 'dataResposta', 'id').iterator(chunk_size=500)
+    return _ultimas_por_empresa(
+        respostas.order_by('modulo_id', 'usuario_id', '-dataResposta', '-id').iterator(chunk_size=500)
+    )
+
+
+def _ultimas_por_empresa(respostas):
+    anterior = None
+    for resposta in respostas:
+        chave = (resposta.modulo_id, resposta.usuario_id)
+        if chave != anterior:
+            anterior = chave
+            yield resposta
+
+
+def _nome_arquivo(resposta):
+    limpar = lambda texto: re.sub(r'[^\w.-]+', '_', texto).strip('_')
+    return (f"{limpar(resposta.modulo.nome)}/{limpar(resposta.usuario.username)}_"
+            f"{resposta.dataResposta:%Y-%m-%d}_{resposta.id}.pdf")
+
+
+def _lotes(iteravel, tamanho):
+    lote = []
+    for item in iteravel:
+        lote.append(item)
+        if len(lote) == tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def gerar_pdfs(respostas):
+    # (nome do arquivo, bytes do PDF). PDFs já salvos são reaproveitados; os
+    # demais vão para o pool de renderização com no máximo PROCESSOS em voo,
+    # para não ocupar a fila dos downloads individuais.
+    janela = max(PROCESSOS, 1)
+    em_voo = deque()
+
+    def concluir_mais_antigo():
+        nome, dados, future = em_voo.popleft()
+        conteudo = future.result()
+        salvar_relatorio(dados, conteudo)
+        return nome, conteudo
+
+    for lote in _lotes(respostas, TAMANHO_LOTE):
+        lista_dados = coletar_dados_relatorios(lote)
+        salvos = relatorios_salvos(lista_dados)
+
+        for resposta, dados in zip(lote, lista_dados):
+            if not dados['dimensoes']:
+                continue
+            nome = _nome_arquivo(resposta)
+
+            # Arquivo removido depois da consulta: renderiza como os demais
+            relatorio = salvos.get(resposta.id)
+            arquivo = abrir_relatorio(relatorio) if relatorio is not None else None
+            contar_cache('relatorio_pdf', arquivo is not None)
+            if arquivo is not None:
+                with arquivo:
+                    yield nome, arquivo.read()
+                continue
+
+            prazo = None
+            while True:
+                if len(em_voo) >= janela:
+                    yield concluir_mais_antigo()
+                    continue
+                try:
+                    em_voo.append((nome, dados, submeter_renderizacao(dados)))
+                    break
+                except FilaCheia:
+                    if em_voo:
+                        yield concluir_mais_antigo()
+                        continue
+                    if prazo is None:
+                        prazo = time.monotonic() + ESPERA_FILA
+                    if time.monotonic() < prazo:
+                        time.sleep(0.5)
+                        continue
+                    # Fila tomada pelos downloads individuais: não espera para sempre
+                    incrementar('hub_relatorios_renderizados_total')
+                    conteudo = pdf.renderizar_pdf(dados)
+                    salvar_relatorio(dados, conteudo)
+                    yield nome, conteudo
+                    break
+
+    while em_voo:
+        yield concluir_mais_antigo()
+
+
+def gerar_zip(respostas):
+    # Gera o ZIP em pedaços à medida que os PDFs ficam prontos, sem manter o
+    # arquivo inteiro em memória
+    saida = _SaidaZip()
+    with zipfile.ZipFile(saida, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for nome, conteudo in gerar_pdfs(respostas):
+            zf.writestr(nome, conteudo)
+            yield saida.esvaziar()
+    yield saida.esvaziar()
@@ -0,0 +1,120 @@
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import ChaveIdempotencia
+
+# Por quanto tempo o resultado de uma chave é repetido (segundos)
+TTL = getattr(settings, 'IDEMPOTENCIA_TTL', 24 * 60 * 60)
+# Quanto uma retentativa espera a requisição original terminar (segundos)
+ESPERA = getattr(settings, 'IDEMPOTENCIA_ESPERA', 30)
+# Validade da reivindicação enquanto a original executa (segundos). Se o
+# worker morre no meio, a chave volta a ficar livre depois disso, não do TTL.
+CONCESSAO = getattr(settings, 'IDEMPOTENCIA_CONCESSAO', 2 * ESPERA)
+
+
+def _impressao(request):
+    # A mesma chave com outro payload é erro do cliente, não uma retentativa
+    conteudo = json.dumps([request.method, request.path, request.data], sort_keys=True, default=str)
+    return hashlib.sha256(conteudo.encode()).hexdigest()
+
+
+def _reivindicar(usuario, chave, impressao):
+    # (registro, criado). Quem cria o registro executa a requisição; os
+    # demais recebem o registro existente, ou None se ele acabou de sumir.
+    agora = timezone.now()
+    ChaveIdempotencia.objects.filter(usuario=usuario, chave=chave, expira_em__lte=agora).delete()
+    try:
+        with transaction.atomic():
+            return ChaveIdempotencia.objects.create(
+                usuario=usuario, chave=chave, impressao=impressao,
+                expira_em=agora + timedelta(seconds=CONCESSAO)
+            ), True
+    except IntegrityError:
+        return ChaveIdempotencia.objects.filter(usuario=usuario, chave=chave).first(), False
+
+
+def _aguardar(usuario, chave, impressao):
+    # Retentativas concorrentes esperam a original em vez de executar de novo;
+    # uma reivindicação com a concessão vencida é apagada e assumida
+    limite = time.monotonic() + ESPERA
+    intervalo = 0.05
+    while True:
+        registro, criado = _reivindicar(usuario, chave, impressao)
+        if criado:
+            return registro, True
+        if registro is not None and (
+                registro.status == 'CONCLUIDA' or registro.impressao != impressao
+                or time.monotonic() >= limite):
+            return registro, False
+        time.sleep(intervalo)
+        intervalo = min(intervalo * 2, 0.5)
+
+
+def idempotente(metodo):
+    # Para métodos de APIView. Deve ficar por fora do transaction.atomic:
+    # o registro da chave precisa ser visível antes de a view terminar.
+    @functools.wraps(metodo)
+    def wrapper(self, request, *args, **kwargs):
+        chave = request.headers.get('Idempotency-Key')
+        if not chave:
+            return metodo(self, request, *args, **kwargs)
+        if len(chave) > 255:
+            return Response(
+                {'error': 'Idempotency-Key deve ter no máximo 255 caracteres.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        impressao = _impressao(request)
+        registro, criado = _aguardar(request.user, chave, impressao)
+
+        if not criado:
+            if registro.impressao != impressao:
+                return Response(
+                    {'error': 'Idempotency-Key já usada com outra requisição.'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if registro.status != 'CONCLUIDA':
+                response = Response(
+                    {'error': 'Requisição com esta Idempotency-Key ainda em processamento.'},
+                    status=status.HTTP_409_CONFLICT
+                )
+                response['Retry-After'] = '5'
+                return response
+            response = Response(registro.resposta, status=registro.status_http)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = metodo(self, request, *args, **kwargs)
+        except Exception:
+            registro.delete()
+            raise
+
+        # Falhas do servidor não são memorizadas: a retentativa executa de novo
+        if response.status_code >= 500 or not isinstance(response, Response):
+            registro.delete()
+        else:
+            ChaveIdempotencia.objects.filter(pk=registro.pk).update(
+                status='CONCLUIDA', status_http=response.status_code, resposta=response.data,
+                expira_em=timezone.now() + timedelta(seconds=TTL))
+        return response
+
+    return wrapper
+
+
+def limpar_chaves_expiradas(lote=1000):
+    # Remove em lotes pelo índice de expira_em; retorna quantas saíram
+    total = 0
+    while True:
+        ids = list(ChaveIdempotencia.objects.filter(
+            expira_em__lte=timezone.now()).values_list('id', flat=True)[:lote])
+        if not ids:
+            return total
+        total += ChaveIdempotencia.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,116 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from . import metricas
+
+logger = logging.getLogger(__name__)
+
+# Medição da requisição em andamento; None fora do middleware (comandos, pool)
+_medicao = ContextVar('medicao', default=None)
+
+
+class Medicao:
+    __slots__ = ('inicio', 'consultas', 'sql', 'spans')
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.sql = 0.0
+        # nome -> segundos, na ordem em que apareceram
+        self.spans = {}
+
+    def adicionar(self, nome, segundos):
+        self.spans[nome] = self.spans.get(nome, 0.0) + segundos
+
+
+@contextmanager
+def span(nome):
+    # Soma o tempo do bloco no span `nome` da requisição atual, se houver
+    medicao = _medicao.get()
+    if medicao is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicao.adicionar(nome, time.perf_counter() - inicio)
+
+
+def registrar_span(nome, segundos):
+    # Para tempos medidos em outro lugar (ex.: no processo do pool de PDFs)
+    medicao = _medicao.get()
+    if medicao is not None:
+        medicao.adicionar(nome, segundos)
+
+
+def _server_timing(total, medicao):
+    partes = [f'total;dur={total * 1000:.1f}',
+              f'db;dur={medicao.sql * 1000:.1f};desc="{medicao.consultas} consultas"']
+    partes += [f'{nome};dur={segundos * 1000:.1f}' for nome, segundos in medicao.spans.items()]
+    return ', '.join(partes)
+
+
+def _rota(request):
+    # Nome da rota, e não o caminho, para não multiplicar as séries por id
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'nao_encontrada'
+    return match.url_name or match.route
+
+
+class InstrumentacaoMiddleware:
+    # Mede cada requisição: tempo total, número e tempo das consultas SQL e os
+    # spans nomeados abertos pelas views. Devolve tudo no header Server-Timing
+    # e registra uma linha JSON para as requisições acima de
+    # INSTRUMENTACAO_LENTA_MS. Alimenta também as métricas de questionario.metricas.
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTACAO', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.lenta = getattr(settings, 'INSTRUMENTACAO_LENTA_MS', 1000) / 1000
+
+    def __call__(self, request):
+        medicao = Medicao()
+        token = _medicao.set(medicao)
+
+        def medir_sql(execute, sql, params, many, context):
+            inicio = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                medicao.sql += time.perf_counter() - inicio
+                medicao.consultas += 1
+
+        try:
+            with connection.execute_wrapper(medir_sql):
+                response = self.get_response(request)
+        finally:
+            _medicao.reset(token)
+
+        total = time.perf_counter() - medicao.inicio
+        response['Server-Timing'] = _server_timing(total, medicao)
+        metricas.observar_requisicao(
+            _rota(request), request.method, response.status_code, total, medicao.consultas, medicao.sql)
+        if total >= self.lenta:
+            self._registrar_lenta(request, response, total, medicao)
+        return response
+
+    def _registrar_lenta(self, request, response, total, medicao):
+        usuario = getattr(request, 'user', None)
+        logger.warning('requisicao_lenta %s', json.dumps({
+            'metodo': request.method,
+            'caminho': request.path,
+            'status': response.status_code,
+            'usuario': usuario.pk if usuario is not None and usuario.is_authenticated else None,
+            'total_ms': round(total * 1000, 1),
+            'db_ms': round(medicao.sql * 1000, 1),
+            'consultas': medicao.consultas,
+            'spans_ms': {nome: round(segundos * 1000, 1) for nome, segundos in medicao.spans.items()},
+        }, ensure_ascii=False))
@@ -0,0 +1,200 @@
+import io
+import json
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+import django
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from questionario.models import Dimensao, Modulo, Pergunta, RespostaModulo
+from questionario.pontuacao import plano_pontuacao
+from users.models import UserAccount
+
+
+def _respostas(plano, semente=0):
+    return [{'id': int(pk), 'valor': 1 + (semente + i) % 5} for i, pk in enumerate(plano.ids)]
+
+
+# nome -> requisição feita com o cliente autenticado e o contexto semeado
+ENDPOINTS = {
+    'catalogo': lambda c, ctx: c.get(reverse('obter-questionario')),
+    'modulo': lambda c, ctx: c.get(reverse('obter_modulo', args=[ctx['plano'].nome])),
+    'submissao': lambda c, ctx: c.post(
+        reverse('salvar_respostas_modulo', args=[ctx['plano'].nome]),
+        {'respostas': _respostas(ctx['plano'])}, format='json'),
+    'rascunho': lambda c, ctx: c.post(reverse('salvar_resposta_incompleta'), {
+        'nomeModulo': ctx['plano'].nome,
+        'dimensaoTitulo': ctx['dimensao'],
+        'respostas': _respostas(ctx['plano'])[:5],
+    }, format='json'),
+    'relatorio_pdf': lambda c, ctx: c.get(reverse('modulo-relatorio.pdf', args=[ctx['plano'].nome])),
+    'busca_por_data': lambda c, ctx: c.get(reverse('relatorios'), {'data': ctx['data']}),
+    'benchmark_dimensoes': lambda c, ctx: c.get(reverse('modulo-benchmark', args=[ctx['plano'].modulo_id])),
+    'ultimas_dimensoes': lambda c, ctx: c.get(reverse('all-dimensoes')),
+    'historico': lambda c, ctx: c.get(reverse('all-dates-relatorios')),
+    'relatorio_modulo': lambda c, ctx: c.get(reverse('relatorio-modulo'), {'modulo_id': ctx['resposta']}),
+}
+
+METRICAS = ('p50_ms', 'p95_ms', 'p99_ms', 'consultas', 'memoria_pico_kib')
+
+
+def percentil(valores, fracao):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * fracao))]
+
+
+def consumir(response):
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+class Command(BaseCommand):
+    help = ('Mede as views da API em processo, num banco de teste semeado: latência p50/p95/p99, '
+            'consultas e pico de memória por endpoint. Salva baselines em JSON e compara com elas.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=200, help='Usuários sintéticos no banco')
+        parser.add_argument('--submissoes', type=int, default=3)
+        parser.add_argument('--repeticoes', type=int, default=50)
+        parser.add_argument('--aquecimento', type=int, default=3)
+        parser.add_argument('--endpoints', nargs='+', choices=sorted(ENDPOINTS), help='Só estes endpoints')
+        parser.add_argument('--salvar', metavar='ARQUIVO', help='Grava o resultado como baseline JSON')
+        parser.add_argument('--comparar', metavar='ARQUIVO', help='Compara com uma baseline JSON')
+        parser.add_argument('--limite', type=float, default=0.2,
+                            help='Piora relativa tolerada na latência e memória (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['comparar']:
+            try:
+                with open(options['comparar']) as arquivo:
+                    baseline = json.load(arquivo)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Baseline inválida: {e}')
+
+        media_root = tempfile.mkdtemp()
+        setup_test_environment()
+        nome_original = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                cache.clear()
+                ctx, cliente = self._semear(options)
+                resultado = {
+                    'meta': {
+                        'data': timezone.now().isoformat(),
+                        'python': platform.python_version(),
+                        'django': django.get_version(),
+                        'banco': connection.vendor,
+                        'usuarios': options['usuarios'],
+                        'submissoes': options['submissoes'],
+                        'repeticoes': options['repeticoes'],
+                    },
+                    'endpoints': {},
+                }
+                for nome in options['endpoints'] or ENDPOINTS:
+                    resultado['endpoints'][nome] = self._medir(ENDPOINTS[nome], cliente, ctx, options)
+                    self._imprimir(nome, resultado['endpoints'][nome])
+        finally:
+            connection.creation.destroy_test_db(nome_original, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        if options['salvar']:
+            with open(options['salvar'], 'w') as arquivo:
+                json.dump(resultado, arquivo, indent=2)
+            self.stdout.write(f'Baseline gravada em {options["salvar"]}')
+
+        if baseline is not None:
+            regressoes = self._comparar(baseline, resultado, options['limite'])
+            if regressoes:
+                raise CommandError('Regressões acima do limite:\n' + '\n'.join(regressoes))
+            self.stdout.write(self.style.SUCCESS('Nenhuma regressão acima do limite.'))
+
+    def _semear(self, options):
+        # Catálogo com o formato do fillQuestionnaire.sql e dados sintéticos por cima
+        for m in range(3):
+            modulo = Modulo.objects.create(nome=f'Módulo {m + 1}', descricao='Módulo de benchmark', tempo=20)
+            for d in range(7):
+                dimensao = Dimensao.objects.create(
+                    titulo=f'Dimensão {m + 1}.{d + 1}', descricao='Dimensão de benchmark',
+                    tipo='OBRIGATORIO', modulo=modulo)
+                Pergunta.objects.bulk_create([
+                    Pergunta(pergunta=f'Pergunta {m + 1}.{d + 1}.{p + 1}', dimensao=dimensao, peso=1 + p % 2)
+                    for p in range(6)
+                ])
+
+        call_command('gerar_dados_sinteticos', usuarios=options['usuarios'],
+                     submissoes=options['submissoes'], stdout=io.StringIO())
+
+        usuario = UserAccount.objects.order_by('id').first()
+        plano = plano_pontuacao('Módulo 1')
+        resposta = RespostaModulo.objects.filter(usuario=usuario, modulo_id=plano.modulo_id).latest('id')
+        ctx = {
+            'plano': plano,
+            'dimensao': next(iter(plano.dimensoes_por_titulo)),
+            'resposta': resposta.id,
+            'data': timezone.localdate(resposta.dataResposta).isoformat(),
+        }
+        cliente = APIClient()
+        cliente.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(usuario).access_token}')
+        return ctx, cliente
+
+    def _medir(self, requisicao, cliente, ctx, options):
+        for _ in range(options['aquecimento']):
+            consumir(requisicao(cliente, ctx))
+
+        tempos = []
+        for _ in range(options['repeticoes']):
+            inicio = time.perf_counter()
+            response = consumir(requisicao(cliente, ctx))
+            tempos.append((time.perf_counter() - inicio) * 1000)
+            if response.status_code >= 400:
+                raise CommandError(f'{response.status_code}: {getattr(response, "data", "")}')
+
+        # Consultas e memória numa execução à parte: o tracemalloc distorce a latência
+        with CaptureQueriesContext(connection) as consultas:
+            tracemalloc.start()
+            consumir(requisicao(cliente, ctx))
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        return {
+            'p50_ms': round(percentil(tempos, 0.50), 3),
+            'p95_ms': round(percentil(tempos, 0.95), 3),
+            'p99_ms': round(percentil(tempos, 0.99), 3),
+            'consultas': len(consultas),
+            'memoria_pico_kib': round(pico / 1024, 1),
+        }
+
+    def _imprimir(self, nome, medida):
+        self.stdout.write(
+            f'{nome:<20} p50 {medida["p50_ms"]:8.2f} ms  p95 {medida["p95_ms"]:8.2f} ms  '
+            f'p99 {medida["p99_ms"]:8.2f} ms  {medida["consultas"]:3d} consultas  '
+            f'pico {medida["memoria_pico_kib"]:9.1f} KiB'
+        )
+
+    def _comparar(self, baseline, resultado, limite):
+        regressoes = []
+        for nome, medida in resultado['endpoints'].items():
+            anterior = baseline.get('endpoints', {}).get(nome)
+            if anterior is None:
+                continue
+            for metrica in METRICAS:
+                if metrica not in anterior:
+                    continue
+                # Consultas são exatas: qualquer consulta a mais é regressão
+                tolerancia = 0 if metrica == 'consultas' else limite
+                if medida[metrica] > anterior[metrica] * (1 + tolerancia):
+                    regressoes.append(
+                        f'{nome}.{metrica}: {anterior[metrica]} -> {medida[metrica]}')
+        return regressoes
@@ -0,0 +1,90 @@
+import io
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from questionario.pdf import renderizar_pdf
+
+DADOS_EXEMPLO = {
+    'respostaId': 0,
+    'usuario': {'username': 'benchmark', 'email': 'benchmark@exemplo.com'},
+    'modulo': {'nome': 'Diagnóstico Organizacional', 'descricao': 'Módulo de exemplo para o benchmark.'},
+    'valorFinal': 118,
+    'dimensoes': [
+        ['ESG', 17],
+        ['Estratégia Empresarial', 21],
+        ['Estrutura Organizacional', 14],
+        ['Gestão Comercial', 19],
+        ['Gestão de Marketing', 12],
+        ['Gestão de Pessoas', 16],
+        ['Gestão Financeira', 19],
+    ],
+}
+
+
+def desenhar_radar_matplotlib(c, labels, values, x, y, largura, altura):
+    # Implementação anterior (PNG rasterizado pelo matplotlib), mantida só
+    # como referência de comparação
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import numpy as np
+    from reportlab.lib.utils import ImageReader
+
+    values = list(values)
+    angles = np.linspace(0, 2 * np.pi, len(labels), endpoint=False).tolist()
+    values += values[:1]
+    angles += angles[:1]
+
+    fig, ax = plt.subplots(figsize=(5, 5), subplot_kw=dict(polar=True))
+    ax.plot(angles, values, color='#058aff', linewidth=2)
+    ax.fill(angles, values, color='#058aff', alpha=0.25)
+    ax.set_xticks(angles[:-1])
+    ax.set_xticklabels(labels, fontsize=10)
+    ax.set_yticklabels([])
+    ax.set_title('Desempenho por Dimensão', y=1.08)
+    plt.tight_layout()
+
+    img_buffer = io.BytesIO()
+    plt.savefig(img_buffer, format='PNG', bbox_inches='tight', dpi=120)
+    plt.close(fig)
+    img_buffer.seek(0)
+    c.drawImage(ImageReader(img_buffer), x, y, width=largura, height=altura)
+
+
+class Command(BaseCommand):
+    help = 'Compara latência de renderização e tamanho do PDF entre o radar vetorial e o matplotlib.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=30)
+        parser.add_argument('--salvar', metavar='PREFIXO',
+                            help='Salva um PDF de cada implementação como PREFIXO_<nome>.pdf')
+
+    def handle(self, *args, **options):
+        implementacoes = [
+            ('reportlab', None),
+            ('matplotlib', desenhar_radar_matplotlib),
+        ]
+        repeticoes = options['repeticoes']
+
+        for nome, desenhar in implementacoes:
+            kwargs = {'desenhar_grafico': desenhar} if desenhar else {}
+            # Primeira chamada fora da medição: imports e caches de fontes
+            pdf = renderizar_pdf(DADOS_EXEMPLO, **kwargs)
+
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                pdf = renderizar_pdf(DADOS_EXEMPLO, **kwargs)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+
+            tempos.sort()
+            p95 = tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))]
+            self.stdout.write(
+                f'{nome:<11} média {statistics.mean(tempos):8.2f} ms  '
+                f'p50 {statistics.median(tempos):8.2f} ms  p95 {p95:8.2f} ms  '
+                f'PDF {len(pdf) / 1024:8.1f} KiB'
+            )
+
+            if options['salvar']:
+                with open(f"{options['salvar']}_{nome}.pdf", 'wb') as arquivo:
+                    arquivo.write(pdf)
@@ -0,0 +1,74 @@
+import statistics
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from questionario.models import Modulo, RespostaModulo
+from questionario.renderers import RenderizadorJSONRapido, orjson
+from questionario.serializers import RelatorioSerializer, RelatorioValoresSerializer
+from users.models import UserAccount
+
+
+def gerar_linhas(quantidade):
+    # Mesmos dados como instâncias (com usuario e modulo já carregados, como
+    # no select_related) e como linhas de .values(); nada vai ao banco
+    usuario = UserAccount(id=1, username='benchmark', email='benchmark@exemplo.com')
+    modulos = [Modulo(id=m, nome=f'Módulo {m}') for m in range(1, 4)]
+    inicio = timezone.now() - timedelta(days=quantidade)
+    instancias, valores = [], []
+    for i in range(quantidade):
+        modulo = modulos[i % len(modulos)]
+        data = inicio + timedelta(days=i, seconds=i)
+        instancias.append(RespostaModulo(
+            id=i + 1, usuario=usuario, modulo=modulo, valorFinal=35 + i % 140, dataResposta=data))
+        valores.append({
+            'id': i + 1, 'usuario__username': usuario.username, 'modulo__nome': modulo.nome,
+            'valorFinal': 35 + i % 140, 'dataResposta': data,
+        })
+    return instancias, valores
+
+
+class Command(BaseCommand):
+    help = ('Compara o custo por linha de RelatorioSerializer + JSONRenderer com '
+            'RelatorioValoresSerializer + RenderizadorJSONRapido.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=1000)
+        parser.add_argument('--repeticoes', type=int, default=30)
+
+    def _medir(self, funcao, repeticoes):
+        funcao()
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            resultado = funcao()
+            tempos.append(time.perf_counter() - inicio)
+        return statistics.median(tempos), resultado
+
+    def handle(self, *args, **options):
+        linhas, repeticoes = options['linhas'], options['repeticoes']
+        instancias, valores = gerar_linhas(linhas)
+        padrao, rapido = JSONRenderer(), RenderizadorJSONRapido()
+
+        ser_drf, dados_drf = self._medir(lambda: RelatorioSerializer(instancias, many=True).data, repeticoes)
+        ser_valores, dados_valores = self._medir(lambda: RelatorioValoresSerializer(valores).data, repeticoes)
+        if list(map(dict, dados_drf)) != dados_valores:
+            self.stderr.write(self.style.ERROR('As duas serializações produziram dados diferentes.'))
+
+        ren_drf, json_drf = self._medir(lambda: padrao.render(dados_drf), repeticoes)
+        ren_rapido, json_rapido = self._medir(lambda: rapido.render(dados_valores), repeticoes)
+        if json_drf != json_rapido:
+            self.stderr.write(self.style.ERROR('Os dois renderizadores produziram JSON diferente.'))
+
+        self.stdout.write(f'{linhas} linhas, mediana de {repeticoes} repetições, '
+                          f'encoder rápido: {"orjson" if orjson else "indisponível (stdlib)"}')
+        for nome, drf, novo in (
+                ('serialização', ser_drf, ser_valores),
+                ('renderização', ren_drf, ren_rapido),
+                ('total', ser_drf + ren_drf, ser_valores + ren_rapido)):
+            self.stdout.write(
+                f'{nome:<13} DRF {drf / linhas * 1e6:7.2f} µs/linha  '
+                f'valores {novo / linhas * 1e6:7.2f} µs/linha  '
+                f'economia {(drf - novo) / linhas * 1e6:7.2f} µs/linha ({drf / novo:5.1f}x)'
+            )
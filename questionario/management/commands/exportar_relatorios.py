@@ -0,0 +1,49 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from questionario.exportacao import gerar_zip, selecionar_respostas
+from questionario.models import Modulo
+
+
+class Command(BaseCommand):
+    help = 'Exporta num ZIP os relatórios PDF de um módulo e/ou período, reaproveitando os já gerados.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('saida', help='Caminho do arquivo ZIP')
+        parser.add_argument('--modulo', help='Nome ou id do módulo')
+        parser.add_argument('--de', help='Data inicial (YYYY-MM-DD)')
+        parser.add_argument('--ate', help='Data final (YYYY-MM-DD)')
+        parser.add_argument('--todas', action='store_true',
+                            help='Inclui todas as respostas, não só a última de cada empresa')
+
+    def _data(self, valor, hora):
+        if not valor:
+            return None
+        try:
+            data_obj = datetime.strptime(valor, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Data inválida: {valor}. Use YYYY-MM-DD.')
+        return timezone.make_aware(datetime.combine(data_obj, hora))
+
+    def handle(self, *args, **options):
+        modulo = None
+        if options['modulo']:
+            filtro = {'id': int(options['modulo'])} if options['modulo'].isdigit() else {'nome': options['modulo']}
+            modulo = Modulo.objects.filter(**filtro).first()
+            if modulo is None:
+                raise CommandError(f'Módulo "{options["modulo"]}" não encontrado.')
+
+        respostas = selecionar_respostas(
+            modulo=modulo,
+            de=self._data(options['de'], datetime.min.time()),
+            ate=self._data(options['ate'], datetime.max.time()),
+            todas=options['todas'],
+        )
+
+        total = 0
+        with open(options['saida'], 'wb') as arquivo:
+            for pedaco in gerar_zip(respostas):
+                arquivo.write(pedaco)
+                total += len(pedaco)
+
+        self.stdout.write(self.style.SUCCESS(f'{options["saida"]}: {total / 1024:.1f} KiB'))
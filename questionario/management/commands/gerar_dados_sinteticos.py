@@ -0,0 +1,233 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from questionario.distribuicoes import invalidar_distribuicoes
+from questionario.medias import recalcular_medias_dimensoes
+from questionario.models import (
+    Modulo, RespostaDimensao, RespostaModulo, RespostaModuloIncompleta,
+    UltimaRespostaDimensao, UltimaRespostaModulo
+)
+from questionario.pontuacao import plano_pontuacao
+from users.models import UserAccount
+
+PESOS_DV1 = [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
+PESOS_DV2 = [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
+
+
+def _digito(numeros, pesos):
+    resto = sum(n * p for n, p in zip(numeros, pesos)) % 11
+    return 0 if resto < 2 else 11 - resto
+
+
+def gerar_cnpj(raiz):
+    # Raiz de 8 dígitos + filial 0001 + dígitos verificadores válidos
+    numeros = [int(c) for c in f'{raiz:08d}0001']
+    numeros.append(_digito(numeros, PESOS_DV1))
+    numeros.append(_digito(numeros, PESOS_DV2))
+    return ''.join(map(str, numeros))
+
+
+@contextmanager
+def sem_auto_now(*modelos):
+    # dataResposta é auto_now: sem isso o bulk_create gravaria a hora atual
+    campos = [modelo._meta.get_field('dataResposta') for modelo in modelos]
+    anteriores = [(campo.auto_now, campo.auto_now_add) for campo in campos]
+    for campo in campos:
+        campo.auto_now = campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, (auto_now, auto_now_add) in zip(campos, anteriores):
+            campo.auto_now, campo.auto_now_add = auto_now, auto_now_add
+
+
+def _proximo_id(modelo):
+    return (modelo.objects.aggregate(maior=Max('id'))['maior'] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = ('Gera usuários, respostas e rascunhos sintéticos em volume de produção sobre o '
+            'questionário já carregado (ScriptsSQL/fillQuestionnaire.sql). Determinístico pela --semente.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=1000)
+        parser.add_argument('--submissoes', type=int, default=3, help='Submissões por usuário e módulo')
+        parser.add_argument('--dias', type=int, default=365, help='Janela de datas das respostas, até --ate')
+        parser.add_argument('--ate', help='Última data possível (YYYY-MM-DD); padrão: hoje')
+        parser.add_argument('--rascunhos', type=float, default=0.3,
+                            help='Fração dos usuários com um módulo em andamento')
+        parser.add_argument('--semente', type=int, default=42)
+        parser.add_argument('--lote', type=int, default=5000, help='Linhas por INSERT')
+        parser.add_argument('--usuarios-por-transacao', type=int, default=500)
+        parser.add_argument('--prefixo', default='sintetico', help='Prefixo de username e email')
+        parser.add_argument('--senha', default='senha123', help='Senha de todos os usuários gerados')
+
+    def handle(self, *args, **options):
+        import numpy as np
+
+        planos = [plano_pontuacao(nome) for nome in Modulo.objects.order_by('id').values_list('nome', flat=True)]
+        planos = [plano for plano in planos if plano is not None and len(plano.ids)]
+        if not planos:
+            raise CommandError('Nenhum módulo com perguntas. Carregue ScriptsSQL/fillQuestionnaire.sql antes.')
+
+        prefixo = options['prefixo']
+        if UserAccount.objects.filter(username__startswith=f'{prefixo}_').exists():
+            raise CommandError(f'Já existem usuários "{prefixo}_*". Use outro --prefixo.')
+
+        if options['ate']:
+            try:
+                ate = datetime.strptime(options['ate'], '%Y-%m-%d')
+            except ValueError:
+                raise CommandError('Data inválida em --ate. Use YYYY-MM-DD.')
+        else:
+            ate = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        ate = ate.replace(tzinfo=dt_timezone.utc)
+        janela = options['dias'] * 86400
+
+        self.rng = np.random.default_rng(options['semente'])
+        # Um único hash para todos: hashear um milhão de senhas levaria horas
+        self.senha = make_password(options['senha'])
+        self.lote = options['lote']
+        self.planos = planos
+        # Matriz pergunta x dimensão de cada módulo, para somar por dimensão
+        self.pertence = [np.eye(len(plano.dimensao_ids), dtype=np.int64)[plano.dimensoes] for plano in planos]
+
+        total, por_transacao = options['usuarios'], options['usuarios_por_transacao']
+        # Raízes de CNPJ espalhadas e sem repetição, a partir da semente
+        raizes = self.rng.choice(10 ** 8 - 1, size=total, replace=False) + 1
+        cnpjs_existentes = set(UserAccount.objects.values_list('cnpj', flat=True))
+
+        inicio = time.monotonic()
+        contagem = {'usuarios': 0, 'modulos': 0, 'dimensoes': 0, 'rascunhos': 0}
+        with sem_auto_now(RespostaModulo, RespostaDimensao, RespostaModuloIncompleta):
+            for primeiro in range(0, total, por_transacao):
+                indices = range(primeiro, min(primeiro + por_transacao, total))
+                with transaction.atomic():
+                    parcial = self._gerar_lote(
+                        indices, raizes, cnpjs_existentes, prefixo, ate, janela,
+                        options['submissoes'], options['rascunhos'])
+                for chave, valor in parcial.items():
+                    contagem[chave] += valor
+                self.stdout.write(
+                    f'{contagem["usuarios"]}/{total} usuários, {contagem["modulos"]} respostas de módulo, '
+                    f'{contagem["dimensoes"]} de dimensão ({time.monotonic() - inicio:.0f}s)')
+
+        # Ids foram atribuídos aqui; sequências (PostgreSQL) precisam acompanhar
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [
+                    UserAccount, RespostaModulo, RespostaDimensao, RespostaModuloIncompleta,
+                    UltimaRespostaModulo, UltimaRespostaDimensao]):
+                cursor.execute(sql)
+
+        recalcular_medias_dimensoes()
+        invalidar_distribuicoes()
+        self.stdout.write(self.style.SUCCESS(
+            f'{contagem["usuarios"]} usuários, {contagem["modulos"]} respostas de módulo, '
+            f'{contagem["dimensoes"]} respostas de dimensão e {contagem["rascunhos"]} rascunhos '
+            f'em {time.monotonic() - inicio:.0f}s.'))
+
+    def _gerar_lote(self, indices, raizes, cnpjs_existentes, prefixo, ate, janela, submissoes, fracao_rascunhos):
+        import numpy as np
+        rng = self.rng
+
+        proximo = {
+            modelo: _proximo_id(modelo)
+            for modelo in (UserAccount, RespostaModulo, RespostaDimensao, RespostaModuloIncompleta,
+                           UltimaRespostaModulo, UltimaRespostaDimensao)
+        }
+
+        def novo_id(modelo):
+            pk = proximo[modelo]
+            proximo[modelo] += 1
+            return pk
+
+        usuarios, modulos, dimensoes = [], [], []
+        ultimas_modulo, ultimas_dimensao, rascunhos = [], [], []
+
+        for i in indices:
+            raiz = int(raizes[i])
+            cnpj = gerar_cnpj(raiz)
+            while cnpj in cnpjs_existentes:
+                raiz = raiz % (10 ** 8 - 1) + 1
+                cnpj = gerar_cnpj(raiz)
+            cnpjs_existentes.add(cnpj)
+
+            # Respostas espalhadas na janela; o cadastro vem antes da primeira
+            datas = np.sort(rng.integers(0, janela, size=(len(self.planos), submissoes)), axis=1)
+            cadastro = ate - timedelta(seconds=janela + int(rng.integers(0, 30 * 86400)))
+            usuario = UserAccount(
+                id=novo_id(UserAccount),
+                username=f'{prefixo}_{i}',
+                email=f'{prefixo}_{i}@exemplo.com',
+                cnpj=cnpj,
+                password=self.senha,
+                registration_date=cadastro,
+            )
+            usuarios.append(usuario)
+
+            # Maturidade da empresa e quanto ela melhora entre submissões
+            nivel = rng.normal(3.0, 0.7)
+            evolucao = rng.normal(0.15, 0.1)
+
+            for m, plano in enumerate(self.planos):
+                valores = np.clip(np.rint(
+                    nivel + evolucao * np.arange(submissoes)[:, None]
+                    + rng.normal(0, 0.8, size=(submissoes, len(plano.ids)))
+                ), plano.valor_minimo, plano.valor_maximo).astype(np.int64)
+                somas = (valores * plano.pesos) @ self.pertence[m]
+
+                for s in range(submissoes):
+                    data = ate - timedelta(seconds=janela - int(datas[m, s]))
+                    resposta_modulo = RespostaModulo(
+                        id=novo_id(RespostaModulo), usuario_id=usuario.id, modulo_id=plano.modulo_id,
+                        valorFinal=int(somas[s].sum()), dataResposta=data)
+                    modulos.append(resposta_modulo)
+                    for d, dimensao_id in enumerate(plano.dimensao_ids):
+                        dimensoes.append(RespostaDimensao(
+                            id=novo_id(RespostaDimensao), usuario_id=usuario.id, dimensao_id=dimensao_id,
+                            resposta_modulo_id=resposta_modulo.id, valorFinal=int(somas[s, d]),
+                            dataResposta=data))
+
+                if submissoes:
+                    # Datas em ordem: a última gerada é a mais recente
+                    ultimas_modulo.append(UltimaRespostaModulo(
+                        id=novo_id(UltimaRespostaModulo), usuario_id=usuario.id,
+                        modulo_id=plano.modulo_id, resposta_modulo_id=modulos[-1].id))
+                    for resposta_dimensao in dimensoes[-len(plano.dimensao_ids):]:
+                        ultimas_dimensao.append(UltimaRespostaDimensao(
+                            id=novo_id(UltimaRespostaDimensao), usuario_id=usuario.id,
+                            dimensao_id=resposta_dimensao.dimensao_id,
+                            resposta_dimensao_id=resposta_dimensao.id))
+
+            # Um módulo em andamento, com as primeiras dimensões respondidas
+            if rng.random() < fracao_rascunhos:
+                m = int(rng.integers(0, len(self.planos)))
+                plano = self.planos[m]
+                respondidas = int(rng.integers(1, len(plano.dimensao_ids) + 1))
+                valores = np.clip(np.rint(nivel + rng.normal(0, 0.8, size=len(plano.ids))),
+                                  plano.valor_minimo, plano.valor_maximo).astype(np.int64)
+                for d, dimensao_id in enumerate(plano.dimensao_ids[:respondidas]):
+                    perguntas = np.flatnonzero(plano.dimensoes == d)
+                    rascunhos.append(RespostaModuloIncompleta(
+                        id=novo_id(RespostaModuloIncompleta), usuario_id=usuario.id,
+                        modulo_id=plano.modulo_id, dimensao_id=dimensao_id,
+                        respostas=[{'id': int(plano.ids[p]), 'valor': int(valores[p])} for p in perguntas],
+                        dataResposta=ate - timedelta(seconds=int(rng.integers(0, 14 * 86400)))))
+
+        for modelo, objetos in (
+                (UserAccount, usuarios), (RespostaModulo, modulos), (RespostaDimensao, dimensoes),
+                (UltimaRespostaModulo, ultimas_modulo), (UltimaRespostaDimensao, ultimas_dimensao),
+                (RespostaModuloIncompleta, rascunhos)):
+            modelo.objects.bulk_create(objetos, batch_size=self.lote)
+
+        return {
+            'usuarios': len(usuarios),
+            'modulos': len(modulos),
+            'dimensoes': len(dimensoes),
+            'rascunhos': len(rascunhos),
+        }
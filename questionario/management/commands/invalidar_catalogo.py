@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from questionario.catalogo import invalidar_catalogo
+
+
+class Command(BaseCommand):
+    help = 'Invalida o cache do catálogo do questionário (ex.: após carregar ScriptsSQL direto no banco).'
+
+    def handle(self, *args, **options):
+        invalidar_catalogo()
+        self.stdout.write(self.style.SUCCESS('Versão do catálogo atualizada.'))
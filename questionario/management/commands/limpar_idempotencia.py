@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from questionario.idempotencia import limpar_chaves_expiradas
+
+
+class Command(BaseCommand):
+    help = 'Remove as chaves de idempotência expiradas (agendar periodicamente, ex.: cron diário).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = limpar_chaves_expiradas(options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{total} chaves expiradas removidas.'))
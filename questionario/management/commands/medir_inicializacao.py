@@ -0,0 +1,91 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Executado num interpretador novo para medir o custo real de um worker frio
+SCRIPT = r'''
+import json, os, resource, sys, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+inicio = time.perf_counter()
+import importlib
+importlib.import_module(sys.argv[1])
+boot = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls = time.perf_counter()
+if sys.argv[2] == '1':
+    from questionario.tarefas import aquecer_relatorios
+    aquecer_relatorios()
+fim = time.perf_counter()
+with open('/proc/self/statm') as statm:
+    rss = int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+print(json.dumps({
+    'boot_ms': (boot - inicio) * 1000,
+    'urls_ms': (urls - boot) * 1000,
+    'aquecimento_ms': (fim - urls) * 1000,
+    'rss_mb': rss / 2**20,
+    'pico_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'pesados': sorted(m for m in ('reportlab', 'matplotlib', 'numpy') if m in sys.modules),
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = ('Mede o tempo de import a frio e a memória (RSS) de backend.wsgi/backend.asgi, '
+            'incluindo o carregamento das URLs. Falha se os limites informados forem excedidos.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modulos', nargs='+', default=['backend.wsgi', 'backend.asgi'])
+        parser.add_argument('--repeticoes', type=int, default=3)
+        parser.add_argument('--aquecer', action='store_true',
+                            help='Inclui aquecer_relatorios() na medição')
+        parser.add_argument('--limite-ms', type=float,
+                            help='Tempo máximo (boot + URLs) em milissegundos')
+        parser.add_argument('--limite-mb', type=float, help='RSS máximo em MiB')
+        parser.add_argument('--json', action='store_true', help='Saída em JSON')
+
+    def _medir(self, modulo, aquecer):
+        resultado = subprocess.run(
+            [sys.executable, '-c', SCRIPT, modulo, '1' if aquecer else '0'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env={**os.environ, 'RELATORIO_AQUECER': 'False'}
+        )
+        if resultado.returncode != 0:
+            raise CommandError(f'Falha ao importar {modulo}:\n{resultado.stderr}')
+        return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        relatorio = {}
+        excedidos = []
+
+        for modulo in options['modulos']:
+            medicoes = [self._medir(modulo, options['aquecer']) for _ in range(options['repeticoes'])]
+            resumo = {
+                chave: round(statistics.median(m[chave] for m in medicoes), 1)
+                for chave in ('boot_ms', 'urls_ms', 'aquecimento_ms', 'rss_mb', 'pico_rss_mb')
+            }
+            resumo['pesados'] = medicoes[-1]['pesados']
+            relatorio[modulo] = resumo
+
+            total = resumo['boot_ms'] + resumo['urls_ms']
+            if options['limite_ms'] is not None and total > options['limite_ms']:
+                excedidos.append(f'{modulo}: {total:.1f} ms > {options["limite_ms"]} ms')
+            if options['limite_mb'] is not None and resumo['rss_mb'] > options['limite_mb']:
+                excedidos.append(f'{modulo}: {resumo["rss_mb"]:.1f} MiB > {options["limite_mb"]} MiB')
+
+        if options['json']:
+            self.stdout.write(json.dumps(relatorio, indent=2))
+        else:
+            for modulo, resumo in relatorio.items():
+                self.stdout.write(
+                    f"{modulo:<14} boot {resumo['boot_ms']:7.1f} ms  urls {resumo['urls_ms']:7.1f} ms  "
+                    f"aquecimento {resumo['aquecimento_ms']:7.1f} ms  RSS {resumo['rss_mb']:6.1f} MiB  "
+                    f"pico {resumo['pico_rss_mb']:6.1f} MiB  carregados: {', '.join(resumo['pesados']) or '-'}"
+                )
+
+        if excedidos:
+            raise CommandError('Orçamento de inicialização excedido:\n' + '\n'.join(excedidos))
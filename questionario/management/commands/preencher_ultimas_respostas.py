@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from questionario.ultimas import recalcular_ultimas
+from users.models import UserAccount
+
+
+class Command(BaseCommand):
+    help = 'Preenche os ponteiros de última resposta (módulo e dimensão) a partir do histórico.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help='Usuários por transação')
+
+    def handle(self, *args, **options):
+        usuario_ids = list(UserAccount.objects.order_by('id').values_list('id', flat=True))
+        lote = options['lote']
+        for inicio in range(0, len(usuario_ids), lote):
+            recalcular_ultimas(usuario_ids[inicio:inicio + lote])
+        self.stdout.write(self.style.SUCCESS(f'Ponteiros recalculados para {len(usuario_ids)} usuários.'))
@@ -0,0 +1,108 @@
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, F, IntegerField, Value, When
+from .models import Dimensao, MediaDimensao, RespostaDimensao, UltimaRespostaDimensao
+
+
+def ultimas_respostas_usuario(usuario, dimensao_ids=None, travar=False):
+    # {dimensao_id: valorFinal} da última resposta do usuário em cada dimensão.
+    # travar=True faz uma leitura com lock, que vê o último commit e não o
+    # snapshot da transação
+    ultimas = UltimaRespostaDimensao.objects.filter(usuario=usuario)
+    if travar:
+        ultimas = ultimas.select_for_update()
+    if dimensao_ids is not None:
+        ultimas = ultimas.filter(dimensao_id__in=dimensao_ids)
+    return dict(ultimas.values_list('dimensao_id', 'resposta_dimensao__valorFinal'))
+
+
+def _travar_medias(dimensao_ids):
+    # Cria as linhas que faltam e as trava em ordem de dimensao_id. Serializa
+    # submissões concorrentes e recálculos nas mesmas dimensões.
+    MediaDimensao.objects.bulk_create(
+        [MediaDimensao(dimensao_id=pk) for pk in dimensao_ids],
+        ignore_conflicts=True
+    )
+    list(MediaDimensao.objects.select_for_update()
+         .filter(dimensao_id__in=dimensao_ids).order_by('dimensao_id')
+         .values_list('dimensao_id', flat=True))
+
+
+def atualizar_medias_dimensoes(usuario, somasPorDimensao):
+    # Deve ser chamada dentro da transação da submissão, antes de criar as
+    # novas RespostaDimensao: a última resposta anterior do usuário sai do
+    # agregado e a nova entra no lugar.
+    if not somasPorDimensao:
+        return
+
+    dimensao_ids = sorted(somasPorDimensao)
+    _travar_medias(dimensao_ids)
+
+    # Os ponteiros têm de ser lidos com lock e depois de _travar_medias. No
+    # MySQL (REPEATABLE READ) uma leitura comum usa o snapshot fixado pelo
+    # primeiro SELECT da transação (ex.: a versão do catálogo na view), anterior
+    # ao lock: duas submissões concorrentes do mesmo usuário tirariam do
+    # agregado a mesma resposta "anterior" e a média contaria em dobro.
+    anteriores = ultimas_respostas_usuario(usuario, dimensao_ids, travar=True)
+
+    # Um único UPDATE para todas as dimensões da submissão
+    MediaDimensao.objects.filter(dimensao_id__in=dimensao_ids).update(
+        soma=F('soma') + Case(
+            *[When(dimensao_id=pk, then=Value(somasPorDimensao[pk] - anteriores.get(pk, 0)))
+              for pk in dimensao_ids],
+            default=Value(0), output_field=BigIntegerField()
+        ),
+        contagem=F('contagem') + Case(
+            *[When(dimensao_id=pk, then=Value(1)) for pk in dimensao_ids if pk not in anteriores],
+            default=Value(0), output_field=IntegerField()
+        )
+    )
+
+
+def medias_outros_usuarios(usuario, ultimas_usuario=None):
+    # {dimensao_id: média das últimas respostas dos demais usuários}
+    if ultimas_usuario is None:
+        ultimas_usuario = ultimas_respostas_usuario(usuario)
+
+    medias = {}
+    for dimensao_id, soma, contagem in Dimensao.objects.values_list(
+            'id', 'media__soma', 'media__contagem'):
+        soma, contagem = soma or 0, contagem or 0
+        if dimensao_id in ultimas_usuario:
+            soma -= ultimas_usuario[dimensao_id]
+            contagem -= 1
+        medias[dimensao_id] = round(soma / contagem, 2) if contagem > 0 else 0
+    return medias
+
+
+def recalcular_medias_dimensoes(dimensao_ids=None):
+    # Reconstrói o agregado a partir do histórico; usado após remoções ou
+    # edições manuais de RespostaDimensao. O histórico é lido com as linhas do
+    # agregado já travadas e elas são atualizadas no lugar: uma submissão
+    # concorrente espera o recálculo e aplica o seu incremento depois, sem ser
+    # apagada nem contada duas vezes.
+    dimensoes = Dimensao.objects.all()
+    if dimensao_ids is not None:
+        dimensoes = dimensoes.filter(id__in=dimensao_ids)
+
+    with transaction.atomic():
+        dimensao_ids = sorted(dimensoes.values_list('id', flat=True))
+        if not dimensao_ids:
+            return
+        _travar_medias(dimensao_ids)
+
+        somas = {pk: [0, 0] for pk in dimensao_ids}
+        vistos = set()
+        for dimensao_id, usuario_id, valor in RespostaDimensao.objects.filter(
+                dimensao_id__in=dimensao_ids
+        ).order_by('-dataResposta', '-id').values_list('dimensao_id', 'usuario_id', 'valorFinal'):
+            chave = (dimensao_id, usuario_id)
+            if chave in vistos:
+                continue
+            vistos.add(chave)
+            somas[dimensao_id][0] += valor
+            somas[dimensao_id][1] += 1
+
+        MediaDimensao.objects.bulk_update([
+            MediaDimensao(dimensao_id=pk, soma=soma, contagem=contagem)
+            for pk, (soma, contagem) in somas.items()
+        ], ['soma', 'contagem'])
@@ -0,0 +1,289 @@
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Métricas no formato texto do Prometheus, somadas entre os workers. Cada
+# processo acumula em memória e grava um arquivo próprio em DIRETORIO a cada
+# INTERVALO segundos (e na coleta e no encerramento); a coleta soma todos os
+# arquivos. Na coleta, contadores e histogramas de workers encerrados são
+# somados em AGREGADO e os arquivos deles removidos, como o
+# mark_process_dead do prometheus_client; os medidores deles são descartados.
+ATIVAS = getattr(settings, 'METRICAS', True)
+DIRETORIO = getattr(settings, 'METRICAS_DIR', '/tmp/hub_metricas')
+INTERVALO = getattr(settings, 'METRICAS_INTERVALO', 5)
+AGREGADO = 'encerrados.json'
+
+# Limites superiores (segundos) dos buckets do histograma de latência
+LIMITES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DESCRICOES = {
+    'hub_requisicoes_total': ('counter', 'Requisições atendidas por rota, método e status.'),
+    'hub_requisicao_segundos': ('histogram', 'Latência das requisições por rota.'),
+    'hub_consultas_sql_total': ('counter', 'Consultas SQL executadas por rota.'),
+    'hub_sql_segundos_total': ('counter', 'Tempo gasto em SQL por rota.'),
+    'hub_relatorios_renderizados_total': ('counter', 'PDFs de relatório renderizados.'),
+    'hub_cache_consultas_total': ('counter', 'Consultas aos caches por resultado (acerto ou falha).'),
+    'hub_cache_taxa_acerto': ('gauge', 'Fração de acertos de cada cache desde o início da coleta.'),
+    'hub_relatorios_fila': ('gauge', 'Renderizações de PDF submetidas ao pool e ainda não concluídas.'),
+}
+
+_lock = threading.Lock()
+_parar = threading.Event()
+_estado = {'pid': None, 'arquivo': None, 'contadores': {}, 'histogramas': {}, 'medidores': {}, 'alterado': False}
+
+
+def _chave(nome, rotulos):
+    return (nome, tuple(sorted(rotulos.items())))
+
+
+def _processo():
+    # Chamado com _lock. Depois de um fork (gunicorn --preload) o filho
+    # começa do zero, com arquivo e thread próprios.
+    if _estado['pid'] == os.getpid():
+        return
+    _estado.update(
+        pid=os.getpid(),
+        arquivo=os.path.join(DIRETORIO, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json'),
+        contadores={}, histogramas={}, medidores={}, alterado=False,
+    )
+    threading.Thread(target=_laco, name='metricas', daemon=True).start()
+
+
+def incrementar(nome, valor=1, **rotulos):
+    if not ATIVAS:
+        return
+    chave = _chave(nome, rotulos)
+    with _lock:
+        _processo()
+        _estado['contadores'][chave] = _estado['contadores'].get(chave, 0) + valor
+        _estado['alterado'] = True
+
+
+def observar(nome, segundos, **rotulos):
+    if not ATIVAS:
+        return
+    chave = _chave(nome, rotulos)
+    with _lock:
+        _processo()
+        histograma = _estado['histogramas'].get(chave)
+        if histograma is None:
+            # [contagem por bucket (o último é +Inf), soma, total]
+            histograma = _estado['histogramas'][chave] = [[0] * (len(LIMITES) + 1), 0.0, 0]
+        indice = next((i for i, limite in enumerate(LIMITES) if segundos <= limite), len(LIMITES))
+        histograma[0][indice] += 1
+        histograma[1] += segundos
+        histograma[2] += 1
+        _estado['alterado'] = True
+
+
+def definir(nome, valor, **rotulos):
+    # Medidor: vale o último valor de cada processo, somado na coleta
+    if not ATIVAS:
+        return
+    chave = _chave(nome, rotulos)
+    with _lock:
+        _processo()
+        _estado['medidores'][chave] = valor
+        _estado['alterado'] = True
+
+
+def contar_cache(cache, acerto):
+    incrementar('hub_cache_consultas_total', cache=cache, resultado='acerto' if acerto else 'falha')
+
+
+def observar_requisicao(rota, metodo, status, segundos, consultas, sql):
+    incrementar('hub_requisicoes_total', rota=rota, metodo=metodo, status=str(status))
+    observar('hub_requisicao_segundos', segundos, rota=rota)
+    incrementar('hub_consultas_sql_total', consultas, rota=rota)
+    incrementar('hub_sql_segundos_total', sql, rota=rota)
+
+
+def gravar():
+    with _lock:
+        # Estado herdado do pai num fork não é deste processo
+        if not _estado['alterado'] or _estado['pid'] != os.getpid():
+            return
+        arquivo = _estado['arquivo']
+        conteudo = _serializar(_estado['contadores'], _estado['histogramas'], _estado['medidores'])
+        _estado['alterado'] = False
+
+    os.makedirs(DIRETORIO, exist_ok=True)
+    _escrever(arquivo, conteudo)
+
+
+def _serializar(contadores, histogramas, medidores):
+    return {
+        'contadores': [[nome, dict(rotulos), valor] for (nome, rotulos), valor in contadores.items()],
+        'histogramas': [[nome, dict(rotulos), *valores] for (nome, rotulos), valores in histogramas.items()],
+        'medidores': [[nome, dict(rotulos), valor] for (nome, rotulos), valor in medidores.items()],
+    }
+
+
+def _escrever(arquivo, conteudo):
+    # Troca atômica: a coleta nunca lê um arquivo pela metade
+    temporario = f'{arquivo}.tmp'
+    with open(temporario, 'w') as saida:
+        json.dump(conteudo, saida)
+    os.replace(temporario, arquivo)
+
+
+def _ler(caminho):
+    try:
+        with open(caminho) as entrada:
+            return json.load(entrada)
+    except (OSError, ValueError):
+        return None
+
+
+def _laco():
+    while not _parar.wait(INTERVALO):
+        try:
+            gravar()
+        except Exception:
+            logger.exception('Falha ao gravar as métricas do processo')
+
+
+def _encerrar():
+    _parar.set()
+    try:
+        gravar()
+    except Exception:
+        logger.exception('Falha ao gravar as métricas no encerramento')
+
+
+def _somar(conteudo, contadores, histogramas, medidores):
+    for nome, rotulos, valor in conteudo['contadores']:
+        chave = _chave(nome, rotulos)
+        contadores[chave] = contadores.get(chave, 0) + valor
+    for nome, rotulos, buckets, soma, total in conteudo['histogramas']:
+        chave = _chave(nome, rotulos)
+        atual = histogramas.setdefault(chave, [[0] * (len(LIMITES) + 1), 0.0, 0])
+        atual[0] = [a + b for a, b in zip(atual[0], buckets)]
+        atual[1] += soma
+        atual[2] += total
+    for nome, rotulos, valor in conteudo.get('medidores', []):
+        chave = _chave(nome, rotulos)
+        medidores[chave] = medidores.get(chave, 0) + valor
+
+
+def _encerrado(caminho):
+    # Arquivos de processo se chamam <pid>-<sufixo>.json
+    try:
+        pid = int(os.path.basename(caminho).split('-', 1)[0])
+    except ValueError:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def _podar():
+    # Chamado com a trava da coleta. Soma os arquivos de processos encerrados
+    # em AGREGADO e os remove; os nomes já somados ficam em 'incorporados'
+    # até a remoção, para uma queda no meio do caminho não contar em dobro.
+    caminho_agregado = os.path.join(DIRETORIO, AGREGADO)
+    agregado = _ler(caminho_agregado) or {'contadores': [], 'histogramas': []}
+    incorporados = [nome for nome in agregado.get('incorporados', [])
+                    if os.path.exists(os.path.join(DIRETORIO, nome))]
+    encerrados = [caminho for caminho in glob.glob(os.path.join(DIRETORIO, '*.json'))
+                  if os.path.basename(caminho) not in incorporados and _encerrado(caminho)]
+    if not encerrados and not incorporados:
+        return
+
+    contadores, histogramas = {}, {}
+    _somar(agregado, contadores, histogramas, {})
+    for caminho in encerrados:
+        conteudo = _ler(caminho)
+        if conteudo is not None:
+            _somar(conteudo, contadores, histogramas, {})
+    incorporados += [os.path.basename(caminho) for caminho in encerrados]
+    _escrever(caminho_agregado, {**_serializar(contadores, histogramas, {}), 'incorporados': incorporados})
+
+    for nome in incorporados:
+        try:
+            os.remove(os.path.join(DIRETORIO, nome))
+        except FileNotFoundError:
+            pass
+    _escrever(caminho_agregado, _serializar(contadores, histogramas, {}))
+
+
+def coletar():
+    # Soma os arquivos de todos os processos, inclusive o atual
+    gravar()
+    os.makedirs(DIRETORIO, exist_ok=True)
+    with open(os.path.join(DIRETORIO, '.trava'), 'a') as trava:
+        # Uma coleta por vez na máquina: duas podas simultâneas somariam o
+        # mesmo arquivo duas vezes
+        fcntl.flock(trava, fcntl.LOCK_EX)
+        _podar()
+        contadores, histogramas, medidores = {}, {}, {}
+        for caminho in glob.glob(os.path.join(DIRETORIO, '*.json')):
+            conteudo = _ler(caminho)
+            if conteudo is not None:
+                _somar(conteudo, contadores, histogramas, medidores)
+    return contadores, histogramas, medidores
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(rotulos, **extras):
+    pares = list(rotulos) + list(extras.items())
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in pares) + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exposicao():
+    contadores, histogramas, medidores = coletar()
+
+    # Taxa de acerto derivada dos contadores, por cache
+    caches = {}
+    for (nome, rotulos), valor in contadores.items():
+        if nome == 'hub_cache_consultas_total':
+            rotulos = dict(rotulos)
+            acertos, total = caches.get(rotulos['cache'], (0, 0))
+            caches[rotulos['cache']] = (acertos + valor * (rotulos['resultado'] == 'acerto'), total + valor)
+    medidas = {**contadores, **medidores}
+    for cache, (acertos, total) in caches.items():
+        medidas[('hub_cache_taxa_acerto', (('cache', cache),))] = acertos / total if total else 0.0
+
+    linhas = []
+    for nome, (tipo, descricao) in DESCRICOES.items():
+        linhas += [f'# HELP {nome} {descricao}', f'# TYPE {nome} {tipo}']
+        if tipo == 'histogram':
+            for (chave_nome, rotulos), (buckets, soma, total) in sorted(histogramas.items()):
+                if chave_nome != nome:
+                    continue
+                acumulado = 0
+                for limite, quantidade in zip(LIMITES + ('+Inf',), buckets):
+                    acumulado += quantidade
+                    linhas.append(f'{nome}_bucket{_rotulos(rotulos, le=limite)} {acumulado}')
+                linhas.append(f'{nome}_sum{_rotulos(rotulos)} {_numero(soma)}')
+                linhas.append(f'{nome}_count{_rotulos(rotulos)} {total}')
+        else:
+            for (chave_nome, rotulos), valor in sorted(medidas.items()):
+                if chave_nome == nome:
+                    linhas.append(f'{nome}{_rotulos(rotulos)} {_numero(valor)}')
+    return '\n'.join(linhas) + '\n'
+
+
+if ATIVAS:
+    atexit.register(_encerrar)
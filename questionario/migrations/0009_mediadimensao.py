@@ -0,0 +1,61 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def preencher_medias(apps, schema_editor):
+    Dimensao = apps.get_model("questionario", "Dimensao")
+    MediaDimensao = apps.get_model("questionario", "MediaDimensao")
+    RespostaDimensao = apps.get_model("questionario", "RespostaDimensao")
+
+    somas = {pk: [0, 0] for pk in Dimensao.objects.values_list("id", flat=True)}
+    vistos = set()
+    for dimensao_id, usuario_id, valor in (
+        RespostaDimensao.objects.order_by("-dataResposta", "-id")
+        .values_list("dimensao_id", "usuario_id", "valorFinal")
+        .iterator()
+    ):
+        if (dimensao_id, usuario_id) in vistos:
+            continue
+        vistos.add((dimensao_id, usuario_id))
+        somas[dimensao_id][0] += valor
+        somas[dimensao_id][1] += 1
+
+    MediaDimensao.objects.bulk_create(
+        [
+            MediaDimensao(dimensao_id=pk, soma=soma, contagem=contagem)
+            for pk, (soma, contagem) in somas.items()
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questionario", "0008_respostamoduloincompleta"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MediaDimensao",
+            fields=[
+                (
+                    "dimensao",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="media",
+                        serialize=False,
+                        to="questionario.dimensao",
+                    ),
+                ),
+                ("soma", models.BigIntegerField(default=0)),
+                ("contagem", models.IntegerField(default=0)),
+            ],
+            options={
+                "verbose_name_plural": "Médias das Dimensões",
+            },
+        ),
+        migrations.RunPython(preencher_medias, migrations.RunPython.noop),
+    ]
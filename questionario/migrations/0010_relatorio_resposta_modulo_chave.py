@@ -0,0 +1,35 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questionario", "0009_mediadimensao"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="relatorio",
+            name="chave",
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="relatorio",
+            name="resposta_modulo",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="relatorios",
+                to="questionario.respostamodulo",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="relatorio",
+            name="PATH",
+            field=models.FileField(max_length=255, upload_to="relatorios/"),
+        ),
+    ]
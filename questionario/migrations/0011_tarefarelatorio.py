@@ -0,0 +1,73 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:07
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questionario", "0010_relatorio_resposta_modulo_chave"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TarefaRelatorio",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDENTE", "Pendente"),
+                            ("CONCLUIDA", "Concluída"),
+                            ("ERRO", "Erro"),
+                        ],
+                        default="PENDENTE",
+                        max_length=20,
+                    ),
+                ),
+                ("erro", models.TextField(blank=True)),
+                ("criada_em", models.DateTimeField(auto_now_add=True)),
+                ("atualizada_em", models.DateTimeField(auto_now=True)),
+                (
+                    "relatorio",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="questionario.relatorio",
+                    ),
+                ),
+                (
+                    "resposta_modulo",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tarefas",
+                        to="questionario.respostamodulo",
+                    ),
+                ),
+                (
+                    "usuario",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Tarefas de Relatório",
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questionario", "0011_tarefarelatorio"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChaveIdempotencia",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("chave", models.CharField(max_length=255)),
+                ("impressao", models.CharField(max_length=64)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PROCESSANDO", "Processando"),
+                            ("CONCLUIDA", "Concluída"),
+                        ],
+                        default="PROCESSANDO",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "status_http",
+                    models.PositiveSmallIntegerField(blank=True, null=True),
+                ),
+                ("resposta", models.JSONField(blank=True, null=True)),
+                ("criada_em", models.DateTimeField(auto_now_add=True)),
+                ("expira_em", models.DateTimeField(db_index=True)),
+                (
+                    "usuario",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Chaves de Idempotência",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("usuario", "chave"),
+                        name="chave_idempotencia_unica_por_usuario",
+                    )
+                ],
+            },
+        ),
+    ]
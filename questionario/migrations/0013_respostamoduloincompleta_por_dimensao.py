@@ -0,0 +1,124 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def separar_por_dimensao(apps, schema_editor):
+    # Cada blob {titulo: {"dimensao": titulo, "respostas": [...]}} vira uma
+    # linha por dimensão. Rascunhos duplicados do mesmo usuário e módulo são
+    # mesclados; em conflito vale o salvo por último.
+    RespostaModuloIncompleta = apps.get_model(
+        "questionario", "RespostaModuloIncompleta"
+    )
+    Dimensao = apps.get_model("questionario", "Dimensao")
+
+    dimensoes = {
+        (modulo_id, titulo): pk
+        for pk, modulo_id, titulo in Dimensao.objects.values_list(
+            "id", "modulo_id", "titulo"
+        )
+    }
+    rascunhos = {}
+    antigos = []
+    for rascunho in RespostaModuloIncompleta.objects.order_by("dataResposta", "id"):
+        antigos.append(rascunho.pk)
+        if not isinstance(rascunho.respostas, dict):
+            continue
+        for titulo, registro in rascunho.respostas.items():
+            dimensao_id = dimensoes.get((rascunho.modulo_id, titulo))
+            if dimensao_id is None:
+                continue
+            respostas = (
+                registro.get("respostas", []) if isinstance(registro, dict) else []
+            )
+            rascunhos[(rascunho.usuario_id, rascunho.modulo_id, dimensao_id)] = (
+                respostas
+            )
+
+    RespostaModuloIncompleta.objects.filter(pk__in=antigos).delete()
+    RespostaModuloIncompleta.objects.bulk_create(
+        [
+            RespostaModuloIncompleta(
+                usuario_id=usuario_id,
+                modulo_id=modulo_id,
+                dimensao_id=dimensao_id,
+                respostas=respostas,
+            )
+            for (usuario_id, modulo_id, dimensao_id), respostas in rascunhos.items()
+        ],
+        batch_size=500,
+    )
+
+
+def juntar_por_modulo(apps, schema_editor):
+    RespostaModuloIncompleta = apps.get_model(
+        "questionario", "RespostaModuloIncompleta"
+    )
+
+    blobs = {}
+    antigos = []
+    for rascunho in RespostaModuloIncompleta.objects.select_related(
+        "dimensao"
+    ).order_by("id"):
+        antigos.append(rascunho.pk)
+        titulo = rascunho.dimensao.titulo
+        blobs.setdefault((rascunho.usuario_id, rascunho.modulo_id), {})[titulo] = {
+            "dimensao": titulo,
+            "respostas": rascunho.respostas,
+        }
+
+    RespostaModuloIncompleta.objects.filter(pk__in=antigos).delete()
+    RespostaModuloIncompleta.objects.bulk_create(
+        [
+            RespostaModuloIncompleta(
+                usuario_id=usuario_id, modulo_id=modulo_id, respostas=respostas
+            )
+            for (usuario_id, modulo_id), respostas in blobs.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questionario", "0012_chaveidempotencia"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="respostamoduloincompleta",
+            name="dimensao",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="respostas_incompletas",
+                to="questionario.dimensao",
+            ),
+        ),
+        migrations.RunPython(separar_por_dimensao, juntar_por_modulo),
+        migrations.AlterField(
+            model_name="respostamoduloincompleta",
+            name="dimensao",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="respostas_incompletas",
+                to="questionario.dimensao",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="respostamoduloincompleta",
+            name="respostas",
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddConstraint(
+            model_name="respostamoduloincompleta",
+            constraint=models.UniqueConstraint(
+                fields=("usuario", "modulo", "dimensao"),
+                name="resposta_incompleta_unica_por_dimensao",
+            ),
+        ),
+    ]
@@ -0,0 +1,159 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def preencher_ultimas(apps, schema_editor):
+    # Mesmo critério de questionario.ultimas.recalcular_ultimas: a resposta de
+    # maior (dataResposta, id). Sem isso os agregados de média contariam de
+    # novo quem responde outra vez depois do deploy.
+    tabelas = [
+        ("RespostaModulo", "UltimaRespostaModulo", "modulo_id", "resposta_modulo_id"),
+        (
+            "RespostaDimensao",
+            "UltimaRespostaDimensao",
+            "dimensao_id",
+            "resposta_dimensao_id",
+        ),
+    ]
+    for origem, destino, campo, ponteiro in tabelas:
+        Origem = apps.get_model("questionario", origem)
+        Destino = apps.get_model("questionario", destino)
+        ultimas = {}
+        for pk, usuario_id, alvo_id in (
+            Origem.objects.order_by("usuario_id", campo, "-dataResposta", "-id")
+            .values_list("id", "usuario_id", campo)
+            .iterator(chunk_size=2000)
+        ):
+            ultimas.setdefault((usuario_id, alvo_id), pk)
+        Destino.objects.bulk_create(
+            [
+                Destino(**{"usuario_id": usuario_id, campo: alvo_id, ponteiro: pk})
+                for (usuario_id, alvo_id), pk in ultimas.items()
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questionario", "0013_respostamoduloincompleta_por_dimensao"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UltimaRespostaDimensao",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Últimas Respostas das Dimensões",
+            },
+        ),
+        migrations.CreateModel(
+            name="UltimaRespostaModulo",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Últimas Respostas dos Módulos",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="respostadimensao",
+            index=models.Index(
+                fields=["usuario", "dimensao", "-dataResposta"],
+                name="resposta_dimensao_usuario_data",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="respostamodulo",
+            index=models.Index(
+                fields=["usuario", "modulo", "-dataResposta"],
+                name="resposta_modulo_usuario_data",
+            ),
+        ),
+        migrations.AddField(
+            model_name="ultimarespostadimensao",
+            name="dimensao",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="questionario.dimensao",
+            ),
+        ),
+        migrations.AddField(
+            model_name="ultimarespostadimensao",
+            name="resposta_dimensao",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="questionario.respostadimensao",
+            ),
+        ),
+        migrations.AddField(
+            model_name="ultimarespostadimensao",
+            name="usuario",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL
+            ),
+        ),
+        migrations.AddField(
+            model_name="ultimarespostamodulo",
+            name="modulo",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="questionario.modulo",
+            ),
+        ),
+        migrations.AddField(
+            model_name="ultimarespostamodulo",
+            name="resposta_modulo",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="questionario.respostamodulo",
+            ),
+        ),
+        migrations.AddField(
+            model_name="ultimarespostamodulo",
+            name="usuario",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="ultimarespostadimensao",
+            constraint=models.UniqueConstraint(
+                fields=("usuario", "dimensao"), name="ultima_resposta_dimensao_unica"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="ultimarespostamodulo",
+            constraint=models.UniqueConstraint(
+                fields=("usuario", "modulo"), name="ultima_resposta_modulo_unica"
+            ),
+        ),
+        migrations.RunPython(preencher_ultimas, migrations.RunPython.noop),
+    ]
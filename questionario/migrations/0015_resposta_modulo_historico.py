@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questionario", "0014_ultimas_respostas"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="respostamodulo",
+            index=models.Index(
+                fields=["usuario", "dataResposta", "id"],
+                name="resposta_modulo_historico",
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:05
+
+import uuid
+
+from django.db import migrations, models
+
+
+def criar_versao(apps, schema_editor):
+    VersaoDistribuicoes = apps.get_model("questionario", "VersaoDistribuicoes")
+    VersaoDistribuicoes.objects.create(pk=1, versao=uuid.uuid4().hex)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questionario", "0016_versao_catalogo"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VersaoDistribuicoes",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("versao", models.CharField(max_length=32)),
+            ],
+            options={
+                "verbose_name_plural": "Versão das Distribuições",
+            },
+        ),
+        migrations.RunPython(criar_versao, migrations.RunPython.noop),
+    ]
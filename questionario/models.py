@@ -1,9 +1,14 @@
+import uuid
 from django.db import models
 from users.models import UserAccount
 
 class Relatorio(models.Model):
+    # PDF renderizado de uma RespostaModulo, guardado em MEDIA_ROOT
     data = models.DateTimeField(auto_now_add=True)
-    PATH = models.FileField(max_length=255)
+    PATH = models.FileField(max_length=255, upload_to='relatorios/')
+    resposta_modulo = models.ForeignKey(
+        'RespostaModulo', on_delete=models.CASCADE, related_name='relatorios', null=True, blank=True)
+    chave = models.CharField(max_length=64, blank=True, db_index=True)
 
     def __str__(self):
         return f"Relatório {self.id} - {self.data.strftime('%Y-%m-%d')}"
@@ -27,17 +32,26 @@ class RespostaModulo(models.Model):
 
     class Meta:
         verbose_name_plural = 'Respostas dos Módulos'
+        indexes = [
+            models.Index(fields=['usuario', 'modulo', '-dataResposta'], name='resposta_modulo_usuario_data'),
+            # Paginação por cursor do histórico (questionario/paginacao.py)
+            models.Index(fields=['usuario', 'dataResposta', 'id'], name='resposta_modulo_historico'),
+        ]
 
 class RespostaModuloIncompleta(models.Model):
+    # Rascunho de uma dimensão: uma linha por (usuário, módulo, dimensão)
     usuario = models.ForeignKey(UserAccount, on_delete=models.CASCADE)
     modulo = models.ForeignKey(Modulo, on_delete=models.CASCADE, related_name='respostas_incompletas', default=None)
-    respostas = models.JSONField(default=dict)
+    dimensao = models.ForeignKey('Dimensao', on_delete=models.CASCADE, related_name='respostas_incompletas')
+    respostas = models.JSONField(default=list)
     dataResposta = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = 'Respostas Incompletas dos Módulos'
-
-    unique_together = (('usuario', 'modulo'),)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['usuario', 'modulo', 'dimensao'], name='resposta_incompleta_unica_por_dimensao'),
+        ]
 
 
 class Dimensao(models.Model):
@@ -69,10 +83,117 @@ class RespostaDimensao(models.Model):
 
     class Meta:
         verbose_name_plural = 'Respostas das Dimensões'
+        indexes = [
+            models.Index(fields=['usuario', 'dimensao', '-dataResposta'], name='resposta_dimensao_usuario_data'),
+        ]
+
+class UltimaRespostaModulo(models.Model):
+    # Ponteiro para a RespostaModulo mais recente do usuário no módulo
+    # (ver questionario/ultimas.py)
+    usuario = models.ForeignKey(UserAccount, on_delete=models.CASCADE)
+    modulo = models.ForeignKey(Modulo, on_delete=models.CASCADE, related_name='+')
+    resposta_modulo = models.ForeignKey(RespostaModulo, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        verbose_name_plural = 'Últimas Respostas dos Módulos'
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'modulo'], name='ultima_resposta_modulo_unica'),
+        ]
+
+class UltimaRespostaDimensao(models.Model):
+    # Ponteiro para a RespostaDimensao mais recente do usuário na dimensão
+    usuario = models.ForeignKey(UserAccount, on_delete=models.CASCADE)
+    dimensao = models.ForeignKey(Dimensao, on_delete=models.CASCADE, related_name='+')
+    resposta_dimensao = models.ForeignKey(RespostaDimensao, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        verbose_name_plural = 'Últimas Respostas das Dimensões'
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'dimensao'], name='ultima_resposta_dimensao_unica'),
+        ]
+
+class MediaDimensao(models.Model):
+    # Agregado da última resposta de cada usuário na dimensão, mantido
+    # incrementalmente a cada submissão (ver questionario/medias.py)
+    dimensao = models.OneToOneField(
+        Dimensao, on_delete=models.CASCADE, related_name='media', primary_key=True)
+    soma = models.BigIntegerField(default=0)
+    contagem = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Médias das Dimensões'
 
 class Pergunta(models.Model):
+    # Escala de concordância de 1 a 5 usada em todas as perguntas
+    VALOR_MINIMO = 1
+    VALOR_MAXIMO = 5
+
     id = models.AutoField(primary_key=True)
     pergunta = models.TextField()
     peso = models.IntegerField(default=1)
     dimensao = models.ForeignKey(
         Dimensao, on_delete=models.CASCADE, related_name='perguntas', default=None)
+
+class TarefaRelatorio(models.Model):
+    # Geração assíncrona de um relatório PDF (ver questionario/tarefas.py)
+    STATUS_CHOICES = [
+        ('PENDENTE', 'Pendente'),
+        ('CONCLUIDA', 'Concluída'),
+        ('ERRO', 'Erro'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    usuario = models.ForeignKey(UserAccount, on_delete=models.CASCADE)
+    resposta_modulo = models.ForeignKey(RespostaModulo, on_delete=models.CASCADE, related_name='tarefas')
+    relatorio = models.ForeignKey(Relatorio, on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDENTE')
+    erro = models.TextField(blank=True)
+    criada_em = models.DateTimeField(auto_now_add=True)
+    atualizada_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Tarefas de Relatório'
+
+
+class ChaveIdempotencia(models.Model):
+    # Resultado da primeira requisição com um Idempotency-Key, repetido para
+    # as retentativas (ver questionario/idempotencia.py)
+    STATUS_CHOICES = [
+        ('PROCESSANDO', 'Processando'),
+        ('CONCLUIDA', 'Concluída'),
+    ]
+
+    usuario = models.ForeignKey(UserAccount, on_delete=models.CASCADE)
+    chave = models.CharField(max_length=255)
+    impressao = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PROCESSANDO')
+    status_http = models.PositiveSmallIntegerField(null=True, blank=True)
+    resposta = models.JSONField(null=True, blank=True)
+    criada_em = models.DateTimeField(auto_now_add=True)
+    expira_em = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name_plural = 'Chaves de Idempotência'
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'chave'], name='chave_idempotencia_unica_por_usuario'),
+        ]
+
+
+class VersaoCatalogo(models.Model):
+    # Linha única com a versão atual do catálogo (módulos, dimensões e
+    # perguntas), trocada a cada edição. Fica no banco para que todos os
+    # workers a vejam, qualquer que seja o backend de cache.
+    versao = models.CharField(max_length=32)
+
+    class Meta:
+        verbose_name_plural = 'Versão do Catálogo'
+
+
+class VersaoDistribuicoes(models.Model):
+    # Como VersaoCatalogo, para as distribuições de pontuação em
+    # questionario/distribuicoes.py: trocada a cada mudança nos ponteiros de
+    # última resposta.
+    versao = models.CharField(max_length=32)
+
+    class Meta:
+        verbose_name_plural = 'Versão das Distribuições'
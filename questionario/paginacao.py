@@ -0,0 +1,91 @@
+import base64
+import json
+from datetime import datetime
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+# Paginação por cursor (keyset) sobre (dataResposta, id): a página seguinte
+# começa logo depois da última linha entregue, então o custo de cada página
+# não cresce com a profundidade, ao contrário de OFFSET.
+LIMITE_PADRAO = getattr(settings, 'RELATORIOS_PAGINA', 50)
+LIMITE_MAXIMO = getattr(settings, 'RELATORIOS_PAGINA_MAXIMA', 500)
+
+ERRO_DATA = 'Formato de data inválido. Use YYYY-MM-DD.'
+
+
+def converter_data(valor, fim_do_dia=False):
+    try:
+        data_obj = datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(ERRO_DATA)
+    hora = datetime.max.time() if fim_do_dia else datetime.min.time()
+    return timezone.make_aware(datetime.combine(data_obj, hora))
+
+
+def data_parametro(request, *nomes, fim_do_dia=False):
+    # Primeiro parâmetro presente entre `nomes` (ex.: 'de' ou 'from'), ou None
+    for nome in nomes:
+        valor = request.GET.get(nome)
+        if valor:
+            return converter_data(valor, fim_do_dia)
+    return None
+
+
+def filtrar_modulo(queryset, identificador):
+    if not identificador:
+        return queryset
+    if identificador.isdigit():
+        return queryset.filter(modulo_id=int(identificador))
+    return queryset.filter(modulo__nome=identificador)
+
+
+def pedido_paginado(request):
+    # Paginação é opcional nas rotas de histórico: sem ?limite= nem ?cursor=
+    # a resposta mantém o formato e o conteúdo completos de antes
+    return 'limite' in request.GET or 'cursor' in request.GET
+
+
+def limite_pagina(request):
+    valor = request.GET.get('limite')
+    if not valor:
+        return LIMITE_PADRAO
+    if not valor.isdigit() or not 1 <= int(valor) <= LIMITE_MAXIMO:
+        raise ValueError(f'limite deve ser um inteiro entre 1 e {LIMITE_MAXIMO}.')
+    return int(valor)
+
+
+def codificar_cursor(data, pk):
+    conteudo = json.dumps([data.isoformat(), pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(conteudo.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        data, pk = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(data), int(pk)
+    except (ValueError, TypeError):
+        raise ValueError('Cursor inválido.')
+
+
+def _campo(item, nome):
+    return item[nome] if isinstance(item, dict) else getattr(item, nome)
+
+
+def paginar(queryset, cursor, limite):
+    # (itens, cursor da próxima página ou None). `queryset` pode ser de
+    # instâncias ou de .values(), desde que traga dataResposta e id.
+    queryset = queryset.order_by('dataResposta', 'id')
+    if cursor is not None:
+        data, pk = cursor
+        # >= na data mantém a busca como intervalo no índice; o OR só
+        # desempata as linhas com a mesma data
+        queryset = queryset.filter(Q(dataResposta__gte=data) & (Q(dataResposta__gt=data) | Q(id__gt=pk)))
+
+    itens = list(queryset[:limite + 1])
+    if len(itens) <= limite:
+        return itens, None
+    itens = itens[:limite]
+    return itens, codificar_cursor(_campo(itens[-1], 'dataResposta'), _campo(itens[-1], 'id'))
@@ -0,0 +1,224 @@
+# Renderização do PDF do relatório. Não importa nada do Django: roda também
+# nos processos do pool de renderização (ver questionario/tarefas.py).
+# O reportlab só é importado na primeira renderização (ou em aquecer()), para
+# que workers que servem apenas JSON não paguem esse custo.
+import io
+import math
+import time
+
+# Incrementar sempre que o layout do PDF mudar, para invalidar os arquivos salvos
+VERSAO_TEMPLATE = 2
+
+COR_RADAR = '#058aff'
+
+FAIXAS_MODULO = [
+    (142, 175, "Excelente"),
+    (106, 141, "Ótimo"),
+    (71, 105, "Médio"),
+    (35, 70, "Insuficiente"),
+]
+
+FAIXAS_DIMENSAO = [
+    (21, 25, "Excelente"),
+    (16, 20, "Ótimo"),
+    (11, 15, "Médio"),
+    (5, 10, "Insuficiente"),
+]
+
+
+def _avaliar(faixas, pontuacao):
+    for minimo, maximo, avaliacao in faixas:
+        if minimo <= pontuacao <= maximo:
+            return avaliacao
+    return "Fora da faixa de avaliação"
+
+
+def avaliar_modulo(pontuacao):
+    return _avaliar(FAIXAS_MODULO, pontuacao)
+
+
+def avaliar_dimensao(pontuacao):
+    return _avaliar(FAIXAS_DIMENSAO, pontuacao)
+
+
+def _escala_radar(valores):
+    # Raio máximo arredondado para cima em múltiplos de 5
+    maior = max(valores + [1])
+    return max(5, int(math.ceil(maior / 5.0)) * 5)
+
+
+def desenhar_radar(c, labels, values, x, y, largura, altura):
+    # Gráfico "Desempenho por Dimensão" em vetor, desenhado direto no canvas
+    from reportlab.lib import colors
+    from reportlab.lib.units import cm
+    from reportlab.graphics import renderPDF
+    from reportlab.graphics.shapes import Circle, Drawing, Line, Polygon, String
+
+    cor = colors.HexColor(COR_RADAR)
+    d = Drawing(largura, altura)
+    altura_titulo = 0.9*cm
+    cx = largura / 2
+    cy = (altura - altura_titulo) / 2
+    raio = min(largura, altura - altura_titulo) / 2 - 1.2*cm
+    escala = _escala_radar(values)
+    num_vars = len(labels)
+    angles = [2 * math.pi * i / num_vars for i in range(num_vars)]
+
+    d.add(String(cx, altura - 0.5*cm, 'Desempenho por Dimensão',
+                 fontName='Helvetica', fontSize=12, textAnchor='middle'))
+
+    for i in range(1, 5):
+        d.add(Circle(cx, cy, raio * i / 4, fillColor=None,
+                     strokeColor=colors.lightgrey, strokeWidth=0.5))
+    d.add(Circle(cx, cy, raio, fillColor=None, strokeColor=colors.black, strokeWidth=0.8))
+
+    for angle, label in zip(angles, labels):
+        cos, sin = math.cos(angle), math.sin(angle)
+        d.add(Line(cx, cy, cx + raio * cos, cy + raio * sin,
+                   strokeColor=colors.lightgrey, strokeWidth=0.5))
+        if cos > 0.1:
+            anchor = 'start'
+        elif cos < -0.1:
+            anchor = 'end'
+        else:
+            anchor = 'middle'
+        distancia = raio + 0.3*cm
+        d.add(String(cx + distancia * cos, cy + distancia * sin - 3 + 4 * sin, label,
+                     fontName='Helvetica', fontSize=9, textAnchor=anchor))
+
+    pontos = []
+    for angle, valor in zip(angles, values):
+        r = raio * valor / escala
+        pontos += [cx + r * math.cos(angle), cy + r * math.sin(angle)]
+    d.add(Polygon(pontos, fillColor=colors.Color(cor.red, cor.green, cor.blue, alpha=0.25),
+                  strokeColor=cor, strokeWidth=2))
+
+    renderPDF.draw(d, c, x, y)
+
+
+def renderizar_pdf(dados, desenhar_grafico=desenhar_radar):
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    styles = getSampleStyleSheet()
+    width, height = A4
+
+    y_position = height - 1.5*cm
+    margin_left = 1.5*cm
+    content_width = width - 2*margin_left
+
+    style_title = styles['h1']
+    style_h2 = styles['h2']
+    style_body = styles['BodyText']
+    style_body.leading = 14
+
+    usuario = dados['usuario']
+    modulo = dados['modulo']
+
+    p = Paragraph("Relatório de Desempenho", style_title)
+    p.wrapOn(c, content_width, height)
+    p_height = p.height
+    p.drawOn(c, margin_left, y_position - p_height)
+    y_position -= (p_height + 0.5*cm)
+
+    p = Paragraph(f"<b>Usuário:</b> {usuario['username']} ({usuario['email']})", style_body)
+    p.wrapOn(c, content_width, height)
+    p_height = p.height
+    p.drawOn(c, margin_left, y_position - p_height)
+    y_position -= (p_height + 0.2*cm)
+
+    p = Paragraph(f"<b>Módulo:</b> {modulo['nome']}", style_h2)
+    p.wrapOn(c, content_width, height)
+    p_height = p.height
+    p.drawOn(c, margin_left, y_position - p_height)
+    y_position -= (p_height + 0.1*cm)
+
+    p = Paragraph(f"<i>Descrição:</i> {modulo['descricao']}", style_body)
+    p.wrapOn(c, content_width, height)
+    p_height = p.height
+    p.drawOn(c, margin_left, y_position - p_height)
+    y_position -= (p_height + 0.5*cm)
+
+    pontuacao_modulo = dados['valorFinal']
+    avaliacao_modulo = avaliar_modulo(pontuacao_modulo)
+    p = Paragraph(f"<b>Resultado Geral do Módulo:</b> {pontuacao_modulo} pontos - <b>{avaliacao_modulo}</b>", style_body)
+    p.wrapOn(c, content_width, height)
+    p_height = p.height
+    p.drawOn(c, margin_left, y_position - p_height)
+    y_position -= (p_height + 0.7*cm)
+
+    p = Paragraph("Resultados por Dimensão:", style_h2)
+    p.wrapOn(c, content_width, height)
+    p_height = p.height
+    p.drawOn(c, margin_left, y_position - p_height)
+    y_position -= (p_height + 0.3*cm)
+
+    for titulo, pontuacao_dimensao in dados['dimensoes']:
+        avaliacao_dimensao = avaliar_dimensao(pontuacao_dimensao)
+
+        p = Paragraph(f"<b>{titulo}:</b>", style_body)
+        p.wrapOn(c, content_width, height)
+        p_height = p.height
+        p.drawOn(c, margin_left, y_position - p_height)
+        y_position -= p_height
+
+        p = Paragraph(f"    Pontuação: {pontuacao_dimensao} - <b>{avaliacao_dimensao}</b>", style_body)
+        p.wrapOn(c, content_width, height)
+        p_height = p.height
+        p.drawOn(c, margin_left, y_position - p_height)
+        y_position -= (p_height + 0.3*cm)
+
+        if y_position < 3*cm:
+            c.showPage()
+            y_position = height - 1.5*cm
+
+    img_width = 10 * cm
+    img_height = 10 * cm
+    x_center = (width - img_width) / 2
+    if y_position - img_height < 2*cm:
+        c.showPage()
+        y_position = height - 2*cm
+
+    labels = [titulo for titulo, _ in dados['dimensoes']]
+    values = [valor for _, valor in dados['dimensoes']]
+    if len(labels) < 3:
+        labels += [''] * (3 - len(labels))
+        values += [0] * (3 - len(values))
+
+    desenhar_grafico(c, labels, values, x_center, y_position - img_height, img_width, img_height)
+    y_position -= (img_height + 0.5*cm)
+
+    c.save()
+    return buffer.getvalue()
+
+
+def renderizar_pdf_medido(dados):
+    # Como renderizar_pdf, mas devolve também os segundos gastos no gráfico
+    # ('chart') e no resto do layout ('pdf'), para a instrumentação
+    tempos = {'chart': 0.0}
+
+    def desenhar_grafico(*args):
+        inicio = time.perf_counter()
+        desenhar_radar(*args)
+        tempos['chart'] += time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    conteudo = renderizar_pdf(dados, desenhar_grafico)
+    tempos['pdf'] = time.perf_counter() - inicio - tempos['chart']
+    return conteudo, tempos
+
+
+def aquecer():
+    # Importa o reportlab e renderiza um relatório mínimo (fontes, estilos)
+    renderizar_pdf({
+        'respostaId': 0,
+        'usuario': {'username': '', 'email': ''},
+        'modulo': {'nome': '', 'descricao': ''},
+        'valorFinal': 0,
+        'dimensoes': [],
+    })
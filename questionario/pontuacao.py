@@ -0,0 +1,153 @@
+import threading
+from .catalogo import versao_catalogo
+from .metricas import contar_cache
+from .models import Dimensao, Modulo, Pergunta
+
+# Planos compilados por processo, válidos enquanto a versão do catálogo não muda
+_planos = {'versao': None, 'modulos': {}}
+_lock = threading.Lock()
+
+# Limites do int64 dos vetores: ids e valores fora deles nem chegam ao NumPy
+INT64_MINIMO, INT64_MAXIMO = -2 ** 63, 2 ** 63 - 1
+
+
+class PlanoPontuacao:
+    # Perguntas do módulo em vetores alinhados: ids ordenados, pesos e o
+    # índice da dimensão de cada pergunta. A validação e as somas por
+    # dimensão de uma submissão viram poucas operações do NumPy.
+
+    def __init__(self, modulo, perguntas, dimensoes):
+        import numpy as np
+
+        self.modulo_id = modulo.id
+        self.nome = modulo.nome
+        # Todas as dimensões do módulo, inclusive as ainda sem perguntas
+        self.dimensoes_por_titulo = {titulo: pk for pk, titulo in dimensoes}
+        perguntas = sorted(perguntas)
+        self.dimensao_ids = sorted({dimensao_id for _, _, dimensao_id in perguntas})
+        posicao_dimensao = {pk: i for i, pk in enumerate(self.dimensao_ids)}
+
+        self.ids = np.array([pk for pk, _, _ in perguntas], dtype=np.int64)
+        self.pesos = np.array([peso for _, peso, _ in perguntas], dtype=np.int64)
+        self.dimensoes = np.array(
+            [posicao_dimensao[dimensao_id] for _, _, dimensao_id in perguntas], dtype=np.int64)
+        self.valor_minimo = Pergunta.VALOR_MINIMO
+        self.valor_maximo = Pergunta.VALOR_MAXIMO
+
+    def pontuar(self, respostasData):
+        # Retorna (somasPorDimensao, erros). somasPorDimensao segue a ordem em
+        # que cada dimensão aparece pela primeira vez no payload.
+        import numpy as np
+
+        erros = []
+        itens, ids, valores = [], [], []
+
+        # Estrutura de cada item ainda é verificada em Python
+        for idx, resposta_info in enumerate(respostasData):
+            if not isinstance(resposta_info, dict):
+                erros.append((idx, f"Item {idx+1}: Não é um objeto JSON válido."))
+                continue
+
+            perguntaId = resposta_info.get('id')
+            valor = resposta_info.get('valor')
+
+            if perguntaId is None:
+                erros.append((idx, f"Item {idx+1}: Chave 'id' ausente."))
+                continue
+            if valor is None:
+                erros.append((idx, f"Item {idx+1} (ID {perguntaId}): Chave 'valor' ausente."))
+                continue
+
+            try:
+                valor_int = int(valor)
+            except (ValueError, TypeError):
+                erros.append((idx,
+                    f"Item {idx+1} (ID {perguntaId}): 'valor' deve ser um número inteiro (recebeu '{valor}')."))
+                continue
+
+            if type(perguntaId) is not int or not INT64_MINIMO <= perguntaId <= INT64_MAXIMO:
+                erros.append((idx, self._erro_nao_encontrada(idx, perguntaId)))
+                continue
+
+            if not INT64_MINIMO <= valor_int <= INT64_MAXIMO:
+                erros.append((idx, self._erro_fora_da_escala(idx, perguntaId, valor_int)))
+                continue
+
+            itens.append(idx)
+            ids.append(perguntaId)
+            valores.append(valor_int)
+
+        itens = np.array(itens, dtype=np.int64)
+        ids = np.array(ids, dtype=np.int64)
+        valores = np.array(valores, dtype=np.int64)
+
+        posicoes = np.searchsorted(self.ids, ids)
+        posicoes = np.minimum(posicoes, max(len(self.ids) - 1, 0))
+        encontradas = (self.ids[posicoes] == ids) if len(self.ids) else np.zeros(len(ids), dtype=bool)
+        for i in np.flatnonzero(~encontradas):
+            erros.append((int(itens[i]), self._erro_nao_encontrada(int(itens[i]), int(ids[i]))))
+
+        # Só a primeira resposta de cada pergunta vale
+        validas = np.flatnonzero(encontradas)
+        _, primeiras = np.unique(ids[validas], return_index=True)
+        duplicadas = np.ones(len(validas), dtype=bool)
+        duplicadas[primeiras] = False
+        for i in validas[duplicadas]:
+            erros.append((int(itens[i]),
+                f"Item {int(itens[i])+1}: Resposta duplicada para a pergunta com ID {int(ids[i])} nesta requisição."))
+        validas = validas[~duplicadas]
+
+        fora_da_escala = (valores[validas] < self.valor_minimo) | (valores[validas] > self.valor_maximo)
+        for i in validas[fora_da_escala]:
+            erros.append((int(itens[i]), self._erro_fora_da_escala(int(itens[i]), int(ids[i]), int(valores[i]))))
+
+        if erros:
+            return {}, [mensagem for _, mensagem in sorted(erros, key=lambda erro: erro[0])]
+
+        validas = validas[np.argsort(itens[validas], kind='stable')]
+        posicoes = posicoes[validas]
+        dimensoes = self.dimensoes[posicoes]
+        somas = np.bincount(
+            dimensoes, weights=valores[validas] * self.pesos[posicoes], minlength=len(self.dimensao_ids)
+        ).round().astype(np.int64)
+
+        _, primeira_ocorrencia = np.unique(dimensoes, return_index=True)
+        ordem = dimensoes[np.sort(primeira_ocorrencia)]
+        return {self.dimensao_ids[i]: int(somas[i]) for i in ordem}, []
+
+    def _erro_fora_da_escala(self, idx, perguntaId, valor):
+        return (f"Item {idx+1} (ID {perguntaId}): 'valor' deve estar entre "
+                f"{self.valor_minimo} e {self.valor_maximo} (recebeu '{valor}').")
+
+    def _erro_nao_encontrada(self, idx, perguntaId):
+        return (f"Item {idx+1}: Pergunta com ID {perguntaId} não encontrada ou "
+                f"não pertence ao módulo '{self.nome}'.")
+
+
+def _compilar(nomeModulo):
+    modulo = Modulo.objects.filter(nome=nomeModulo).first()
+    if modulo is None:
+        return None
+    perguntas = Pergunta.objects.filter(dimensao__modulo=modulo).values_list('id', 'peso', 'dimensao_id')
+    dimensoes = Dimensao.objects.filter(modulo=modulo).values_list('id', 'titulo')
+    return PlanoPontuacao(modulo, list(perguntas), list(dimensoes))
+
+
+def plano_pontuacao(nomeModulo):
+    # Plano do módulo ou None se ele não existe. Recompilado quando o
+    # catálogo muda (perguntas, pesos, dimensões ou módulos editados).
+    versao = versao_catalogo()
+    with _lock:
+        if _planos['versao'] != versao:
+            _planos['versao'] = versao
+            _planos['modulos'] = {}
+        plano = _planos['modulos'].get(nomeModulo)
+
+    contar_cache('plano_pontuacao', plano is not None)
+    if plano is None:
+        plano = _compilar(nomeModulo)
+        if plano is not None:
+            with _lock:
+                if _planos['versao'] == versao:
+                    _planos['modulos'][nomeModulo] = plano
+    return plano
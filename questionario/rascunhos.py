@@ -0,0 +1,146 @@
+import atexit
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from .models import RespostaModuloIncompleta
+
+logger = logging.getLogger(__name__)
+
+# Write-behind dos rascunhos: o autosave grava só no cache e uma thread
+# descarrega no banco a cada INTERVALO segundos, uma escrita por dimensão
+# alterada. Com vários workers exige um cache compartilhado (Redis, Memcached);
+# o check questionario.E001 recusa LocMemCache com o buffer ligado.
+#
+# A lista do que falta gravar fica na memória do worker. Se ele morre sem
+# passar pelo atexit (SIGKILL, OOM, timeout do gunicorn), os autosaves dos
+# últimos INTERVALO segundos só existem no cache: continuam aparecendo na
+# leitura e vão para o banco na submissão final, que lê do cache, mas um
+# rascunho abandonado some quando a cópia no cache expira (RETENCAO).
+BUFFER = getattr(settings, 'RASCUNHO_BUFFER', False)
+INTERVALO = getattr(settings, 'RASCUNHO_INTERVALO', 5)
+# A cópia no cache continua valendo para leituras mesmo depois de gravada
+RETENCAO = getattr(settings, 'RASCUNHO_RETENCAO', 60 * 60)
+
+_lock = threading.Lock()
+_lock_gravacao = threading.Lock()
+_pendentes = set()
+_parar = threading.Event()
+_thread = None
+
+
+def _chave(usuario_id, modulo_id, dimensao_id):
+    return f'questionario:rascunho:{usuario_id}:{modulo_id}:{dimensao_id}'
+
+
+def gravar_rascunhos(itens):
+    # itens: [(usuario_id, modulo_id, dimensao_id, respostas)], numa única instrução
+    if not itens:
+        return
+    RespostaModuloIncompleta.objects.bulk_create(
+        [
+            RespostaModuloIncompleta(
+                usuario_id=usuario_id,
+                modulo_id=modulo_id,
+                dimensao_id=dimensao_id,
+                respostas=respostas
+            )
+            for usuario_id, modulo_id, dimensao_id, respostas in itens
+        ],
+        update_conflicts=True,
+        # MySQL resolve o conflito por qualquer chave única, sem alvo explícito
+        unique_fields=['usuario', 'modulo', 'dimensao']
+        if connection.features.supports_update_conflicts_with_target else None,
+        update_fields=['respostas', 'dataResposta']
+    )
+
+
+def salvar_rascunho(usuario_id, modulo_id, dimensao_id, titulo, respostas):
+    if not BUFFER:
+        gravar_rascunhos([(usuario_id, modulo_id, dimensao_id, respostas)])
+        return
+
+    cache.set(
+        _chave(usuario_id, modulo_id, dimensao_id),
+        {'dimensao_id': dimensao_id, 'titulo': titulo, 'respostas': respostas, 'salvo_em': time.time()},
+        RETENCAO
+    )
+    with _lock:
+        _pendentes.add((usuario_id, modulo_id, dimensao_id))
+    _iniciar_thread()
+
+
+def rascunhos_em_buffer(usuario_id, modulo_id, dimensao_ids):
+    # Rascunhos ainda no cache, inclusive os de outros workers, do mais antigo ao mais novo
+    if not BUFFER:
+        return []
+    valores = cache.get_many([_chave(usuario_id, modulo_id, pk) for pk in dimensao_ids])
+    return sorted(valores.values(), key=lambda valor: valor['salvo_em'])
+
+
+def descarregar(chaves=None):
+    # Grava no banco o que está no cache: tudo o que este processo tem
+    # pendente ou só as (usuario_id, modulo_id, dimensao_id) informadas
+    if not BUFFER:
+        return
+    with _lock_gravacao:
+        with _lock:
+            if chaves is None:
+                lote = set(_pendentes)
+                _pendentes.clear()
+            else:
+                lote = set(chaves)
+                _pendentes.difference_update(lote)
+        if not lote:
+            return
+
+        valores = cache.get_many([_chave(*chave) for chave in lote])
+        itens = [
+            (*chave, valores[_chave(*chave)]['respostas'])
+            for chave in lote if _chave(*chave) in valores
+        ]
+        try:
+            gravar_rascunhos(itens)
+        except Exception:
+            # Fica para a próxima rodada
+            with _lock:
+                _pendentes.update(lote)
+            raise
+
+
+def descarregar_modulo(usuario_id, modulo_id, dimensao_ids):
+    # Antes da submissão final: o banco precisa refletir o último rascunho
+    descarregar([(usuario_id, modulo_id, pk) for pk in dimensao_ids])
+
+
+def _laco():
+    while not _parar.wait(INTERVALO):
+        try:
+            descarregar()
+        except Exception:
+            logger.exception('Falha ao gravar rascunhos em buffer')
+        finally:
+            close_old_connections()
+
+
+def _iniciar_thread():
+    global _thread
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_laco, name='rascunhos-write-behind', daemon=True)
+            _thread.start()
+
+
+def _encerrar():
+    # Desligamento normal do worker: não perde o que ainda está no buffer
+    _parar.set()
+    try:
+        descarregar()
+    except Exception:
+        logger.exception('Falha ao gravar rascunhos em buffer no encerramento')
+
+
+if BUFFER:
+    atexit.register(_encerrar)
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import uuid
+from django.core.files.base import ContentFile
+from .models import Relatorio, RespostaDimensao
+from .pdf import VERSAO_TEMPLATE, FAIXAS_MODULO, FAIXAS_DIMENSAO
+
+
+def _dados_relatorio(resposta_modulo, usuario, dimensoes):
+    modulo = resposta_modulo.modulo
+    return {
+        'respostaId': resposta_modulo.id,
+        'usuario': {'username': usuario.username, 'email': usuario.email},
+        'modulo': {'nome': modulo.nome, 'descricao': modulo.descricao},
+        'valorFinal': resposta_modulo.valorFinal,
+        'dimensoes': dimensoes,
+    }
+
+
+def coletar_dados_relatorio(resposta_modulo, usuario):
+    # Tudo o que o PDF exibe, em tipos simples: a renderização não toca no banco
+    respostas_dimensoes = RespostaDimensao.objects.filter(
+        usuario=usuario,
+        resposta_modulo=resposta_modulo
+    ).order_by('dimensao__titulo').values_list('dimensao__titulo', 'valorFinal')
+
+    return _dados_relatorio(resposta_modulo, usuario, [list(item) for item in respostas_dimensoes])
+
+
+def coletar_dados_relatorios(respostas_modulo):
+    # Versão em lote: uma consulta de dimensões para todas as respostas.
+    # As respostas devem vir com select_related('usuario', 'modulo').
+    dimensoes = {resposta.id: [] for resposta in respostas_modulo}
+    for resposta_id, titulo, valor in RespostaDimensao.objects.filter(
+            resposta_modulo_id__in=list(dimensoes)
+    ).order_by('resposta_modulo_id', 'dimensao__titulo').values_list(
+            'resposta_modulo_id', 'dimensao__titulo', 'valorFinal'):
+        dimensoes[resposta_id].append([titulo, valor])
+
+    return [
+        _dados_relatorio(resposta, resposta.usuario, dimensoes[resposta.id])
+        for resposta in respostas_modulo
+    ]
+
+
+def chave_relatorio(dados):
+    # Muda quando a resposta, o questionário, as faixas ou o template mudam
+    conteudo = json.dumps(
+        [VERSAO_TEMPLATE, FAIXAS_MODULO, FAIXAS_DIMENSAO, dados],
+        sort_keys=True, separators=(',', ':')
+    )
+    return hashlib.sha256(conteudo.encode()).hexdigest()
+
+
+def _arquivo_existe(relatorio):
+    return bool(relatorio.PATH) and relatorio.PATH.storage.exists(relatorio.PATH.name)
+
+
+def relatorio_salvo(dados):
+    chave = chave_relatorio(dados)
+    relatorio = Relatorio.objects.filter(
+        resposta_modulo_id=dados['respostaId'], chave=chave
+    ).order_by('-data').first()
+    if relatorio and _arquivo_existe(relatorio):
+        return relatorio
+    return None
+
+
+def relatorios_salvos(lista_dados):
+    # {respostaId: Relatorio} dos PDFs ainda válidos, numa única consulta
+    chaves = {dados['respostaId']: chave_relatorio(dados) for dados in lista_dados}
+    salvos = {}
+    for relatorio in Relatorio.objects.filter(
+            resposta_modulo_id__in=list(chaves), chave__in=list(chaves.values())
+    ).order_by('data'):
+        if chaves.get(relatorio.resposta_modulo_id) == relatorio.chave and _arquivo_existe(relatorio):
+            salvos[relatorio.resposta_modulo_id] = relatorio
+    return salvos
+
+
+def abrir_relatorio(relatorio):
+    # Arquivo aberto para leitura, ou None se ele sumiu entre a consulta e a
+    # leitura (resposta editada, versão antiga removida)
+    try:
+        return relatorio.PATH.open('rb')
+    except FileNotFoundError:
+        return None
+
+
+def salvar_relatorio(dados, conteudo):
+    # O novo arquivo é gravado antes de qualquer remoção, e só saem as versões
+    # com outra chave ou sem arquivo: um PDF desta chave que outra requisição
+    # (renderização concorrente, exportação) já encontrou continua no lugar.
+    chave = chave_relatorio(dados)
+    relatorio = Relatorio(resposta_modulo_id=dados['respostaId'], chave=chave)
+    # Nome único: um arquivo novo nunca reaproveita o nome de um removido,
+    # que ainda pode estar referenciado por uma linha a ser apagada
+    nome = f"relatorio_{dados['respostaId']}_{chave[:12]}_{uuid.uuid4().hex[:8]}.pdf"
+    relatorio.PATH.save(nome, ContentFile(conteudo))
+
+    for antigo in Relatorio.objects.filter(resposta_modulo_id=dados['respostaId']).exclude(pk=relatorio.pk):
+        if antigo.chave != chave or not _arquivo_existe(antigo):
+            antigo.delete()
+    return relatorio
+
+
+def remover_relatorios(resposta_modulo_id):
+    for relatorio in Relatorio.objects.filter(resposta_modulo_id=resposta_modulo_id):
+        relatorio.delete()
@@ -0,0 +1,37 @@
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # opcional: sem ele o JSONRenderer do DRF é usado
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+def _padrao(obj):
+    # Tipos que o orjson não conhece (ou que repassamos, como datetime) saem
+    # exatamente como no encoder do DRF: datetime em ms com 'Z', Decimal, lazy strings
+    return _encoder.default(obj)
+
+
+class RenderizadorJSONRapido(JSONRenderer):
+    # Mesmo JSON do JSONRenderer (compacto, UTF-8), codificado com orjson
+    # quando instalado. Pedidos com indentação (?format=json com indent no
+    # Accept) e ambientes sem orjson seguem pelo caminho padrão do DRF.
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(
+            data, default=_padrao,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        )
+        # Como o DRF: U+2028/U+2029 escapados, seguros dentro de <script>
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+# Para views que optam pelo caminho rápido e mantêm a API navegável
+RENDERIZADORES_RAPIDOS = [RenderizadorJSONRapido, BrowsableAPIRenderer]
@@ -0,0 +1,54 @@
+from django.db import connection, transaction
+from .medias import atualizar_medias_dimensoes
+from .models import RespostaDimensao, RespostaModulo
+from .ultimas import apontar_ultimas
+
+
+def salvar_respostas(usuario, submissoes):
+    # submissoes: [(plano, somasPorDimensao)] já validadas. Grava tudo com um
+    # INSERT em lote de RespostaModulo e outro de RespostaDimensao, depois de
+    # atualizar os agregados de média, e aponta as últimas respostas para
+    # elas. Retorna as RespostaModulo criadas.
+    with transaction.atomic():
+        # Se a mesma dimensão aparece mais de uma vez, vale a última submissão
+        ultimas = {}
+        for _, somasPorDimensao in submissoes:
+            ultimas.update(somasPorDimensao)
+        atualizar_medias_dimensoes(usuario, ultimas)
+
+        respostasModulo = [
+            RespostaModulo(
+                usuario=usuario,
+                modulo_id=plano.modulo_id,
+                valorFinal=sum(somasPorDimensao.values())
+            )
+            for plano, somasPorDimensao in submissoes
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            RespostaModulo.objects.bulk_create(respostasModulo)
+        else:
+            # MySQL não devolve as chaves geradas num INSERT em lote
+            for respostaModulo in respostasModulo:
+                respostaModulo.save(force_insert=True)
+
+        respostasDimensao = RespostaDimensao.objects.bulk_create([
+            RespostaDimensao(
+                usuario=usuario,
+                dimensao_id=dimensaoPk,
+                valorFinal=somaTotal,
+                resposta_modulo=respostaModulo
+            )
+            for respostaModulo, (_, somasPorDimensao) in zip(respostasModulo, submissoes)
+            for dimensaoPk, somaTotal in somasPorDimensao.items()
+        ])
+        if not connection.features.can_return_rows_from_bulk_insert:
+            ids = {
+                (respostaModuloId, dimensaoId): pk
+                for pk, respostaModuloId, dimensaoId in RespostaDimensao.objects.filter(
+                    resposta_modulo__in=respostasModulo
+                ).values_list('id', 'resposta_modulo_id', 'dimensao_id')
+            }
+            for respostaDimensao in respostasDimensao:
+                respostaDimensao.pk = ids[(respostaDimensao.resposta_modulo_id, respostaDimensao.dimensao_id)]
+        apontar_ultimas(usuario.id, respostasModulo, respostasDimensao)
+    return respostasModulo
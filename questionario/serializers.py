@@ -1,7 +1,49 @@
+from django.db.models import Prefetch, QuerySet
+from django.utils import timezone
 from rest_framework import serializers
 from .models import RespostaModulo, RespostaDimensao, Modulo, Dimensao
 
-class RelatorioSerializer(serializers.ModelSerializer):
+# Serializadores que declaram as relações que leem: `relacoes` vira
+# select_related e `prefetch` (lookup -> serializador do filho) vira um
+# Prefetch já preparado pelo filho. A view chama preparar_queryset(); com
+# many=True sobre um QuerySet ainda não avaliado isso é feito sozinho. Assim
+# serializar N respostas custa um número fixo de consultas, não 1 + N.
+
+def _nao_avaliado(dados):
+  return isinstance(dados, QuerySet) and dados._result_cache is None
+
+class RelacoesMixin:
+  relacoes = ()
+  prefetch = {}
+
+  @classmethod
+  def preparar_queryset(cls, queryset):
+    if cls.relacoes:
+      queryset = queryset.select_related(*cls.relacoes)
+    for lookup, serializer in cls.prefetch.items():
+      filhos = serializer.preparar_queryset(serializer.Meta.model._default_manager.order_by('pk'))
+      queryset = queryset.prefetch_related(Prefetch(lookup, queryset=filhos))
+    return queryset
+
+  @classmethod
+  def many_init(cls, *args, **kwargs):
+    if args and _nao_avaliado(args[0]):
+      args = (cls.preparar_queryset(args[0]),) + args[1:]
+    elif _nao_avaliado(kwargs.get('instance')):
+      kwargs['instance'] = cls.preparar_queryset(kwargs['instance'])
+    return super().many_init(*args, **kwargs)
+
+def relacionados(obj, lookup):
+  # Lê do cache do prefetch; numa instância avulsa, sem prefetch, devolve o
+  # QuerySet ainda não avaliado, que o many_init do filho prepara
+  gerenciador = getattr(obj, lookup)
+  if lookup in getattr(obj, '_prefetched_objects_cache', {}):
+    return gerenciador.all()
+  return gerenciador.order_by('pk')
+
+class RelatorioSerializer(RelacoesMixin, serializers.ModelSerializer):
+  relacoes = ('usuario', 'modulo')
+
   usuario = serializers.CharField(source='usuario.username', read_only=True)
   nome_modulo = serializers.CharField(source='modulo.nome', read_only=True)
   valorFinal = serializers.IntegerField()
@@ -11,12 +53,14 @@ class RelatorioSerializer(serializers.ModelSerializer):
     model = RespostaModulo
     fields = ['id', 'usuario', 'nome_modulo', 'valorFinal', 'dataResposta']
 
-class DimensaoSerializer(serializers.ModelSerializer):
+class DimensaoSerializer(RelacoesMixin, serializers.ModelSerializer):
   class Meta:
     model = Dimensao
     fields = ['id', 'titulo']
 
-class RespostaDimensaoSerializer(serializers.ModelSerializer):
+class RespostaDimensaoSerializer(RelacoesMixin, serializers.ModelSerializer):
+  relacoes = ('dimensao',)
+
   dimensao = DimensaoSerializer()
 
   class Meta:
@@ -29,7 +73,10 @@ class RespostaDimensaoSerializer(serializers.ModelSerializer):
       'valorFinal': obj.resposta_modulo.valorFinal,
     }
 
-class RespostaModuloSerializer(serializers.ModelSerializer):
+class RespostaModuloSerializer(RelacoesMixin, serializers.ModelSerializer):
+  relacoes = ('usuario', 'modulo')
+  prefetch = {'respostadimensao_set': RespostaDimensaoSerializer}
+
   modulo = serializers.SerializerMethodField()
   usuario = serializers.SerializerMethodField()
   dimensoes = serializers.SerializerMethodField()
@@ -51,7 +98,7 @@ class RespostaModuloSerializer(serializers.ModelSerializer):
     }
 
   def get_dimensoes(self, obj):
-    resposta_dimensoes = RespostaDimensao.objects.filter(resposta_modulo=obj)
+    resposta_dimensoes = relacionados(obj, 'respostadimensao_set')
     serializer = RespostaDimensaoSerializer(resposta_dimensoes, many=True)
     return serializer.data
   
@@ -64,3 +111,47 @@ class RespostaModuloSerializer(serializers.ModelSerializer):
       data['media_dimensoes'] = media_dimensoes
 
     return data
+
+# Serializadores "por valores": só leitura, montam dicts direto das linhas
+# de .values(), sem instanciar modelos nem passar pela maquinaria de campos
+# do DRF. Cada um declara saída -> (coluna do .values(), conversão ou None);
+# a conversão recebe o valor e o contexto, resolvido uma vez por chamada.
+
+def data_local(valor, contexto):
+  # Igual a DateTimeField(format='%Y-%m-%d'): no fuso atual antes de formatar
+  return valor.astimezone(contexto['fuso']).date().isoformat() if valor else None
+
+class ValoresSerializer:
+  campos = {}
+
+  def __init__(self, linhas, many=True):
+    self.linhas = linhas
+    self.many = many
+
+  @classmethod
+  def colunas(cls):
+    return [coluna for coluna, _ in cls.campos.values()]
+
+  def representar(self, linha, contexto):
+    return {
+      saida: converter(linha[coluna], contexto) if converter else linha[coluna]
+      for saida, (coluna, converter) in self.campos.items()
+    }
+
+  @property
+  def data(self):
+    # get_current_timezone() custa mais que o resto da linha: uma vez só
+    contexto = {'fuso': timezone.get_current_timezone()}
+    if not self.many:
+      return self.representar(self.linhas, contexto)
+    return [self.representar(linha, contexto) for linha in self.linhas]
+
+class RelatorioValoresSerializer(ValoresSerializer):
+  # Mesma saída de RelatorioSerializer
+  campos = {
+    'id': ('id', None),
+    'usuario': ('usuario__username', None),
+    'nome_modulo': ('modulo__nome', None),
+    'valorFinal': ('valorFinal', None),
+    'dataResposta': ('dataResposta', data_local),
+  }
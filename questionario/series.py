@@ -0,0 +1,63 @@
+from datetime import timezone as dt_timezone
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from django.db.models import Avg, Count, DateTimeField, ExpressionWrapper, F, Max, Min
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from .models import RespostaModulo
+
+# Agregação do histórico de pontuações em buckets de calendário. Os limites
+# dos buckets seguem o fuso de settings.TIME_ZONE (America/Sao_Paulo), não
+# UTC: uma resposta às 22h do último dia do mês fica naquele mês.
+#
+# O fuso entra como deslocamento fixo somado no SQL, e o Trunc é feito em UTC,
+# sem conversão de fuso no banco: no MySQL, Trunc(tzinfo=America/Sao_Paulo)
+# vira CONVERT_TZ, que devolve NULL se as tabelas de fuso não foram carregadas
+# (mysql_tzinfo_to_sql). Exige um fuso sem horário de verão, caso de São Paulo
+# desde 2019; respostas anteriores perto da meia-noite podem cair no dia vizinho.
+BUCKETS = {
+    'dia': 'day', 'day': 'day',
+    'semana': 'week', 'week': 'week',
+    'mes': 'month', 'month': 'month',
+}
+
+
+def agregar_historico(respostas, usuario, bucket):
+    # Uma consulta agrupada por (bucket, módulo) sobre `respostas`, já
+    # filtradas pelo usuário, e outra, do tamanho do resultado, para o
+    # valorFinal da resposta mais recente de cada bucket ('ultimo').
+    deslocamento = timezone.now().astimezone(ZoneInfo(settings.TIME_ZONE)).utcoffset()
+    grupos = list(respostas.annotate(
+        data_local=ExpressionWrapper(F('dataResposta') + deslocamento, output_field=DateTimeField())
+    ).annotate(
+        periodo=Trunc('data_local', BUCKETS[bucket], tzinfo=dt_timezone.utc)
+    ).values('periodo', 'modulo_id').annotate(
+        minimo=Min('valorFinal'),
+        maximo=Max('valorFinal'),
+        media=Avg('valorFinal'),
+        quantidade=Count('id'),
+        ultima_data=Max('dataResposta'),
+    ).order_by('periodo', 'modulo_id'))
+
+    # Subconsulta correlacionada com Max() não é suportada pelo ORM no
+    # agrupamento; as datas máximas localizam as linhas pelo índice
+    # (usuario, dataResposta, id). Empate na data: vale o maior id.
+    ultimos = {}
+    for modulo_id, data, valor in RespostaModulo.objects.filter(
+            usuario=usuario, dataResposta__in={grupo['ultima_data'] for grupo in grupos}
+    ).order_by('id').values_list('modulo_id', 'dataResposta', 'valorFinal'):
+        ultimos[(modulo_id, data)] = valor
+
+    return [
+        {
+            # Meia-noite local já deslocada: a data em UTC é a data local
+            'data': grupo['periodo'].astimezone(dt_timezone.utc).date().isoformat(),
+            'modulo': grupo['modulo_id'],
+            'minimo': grupo['minimo'],
+            'maximo': grupo['maximo'],
+            'media': round(grupo['media'], 2),
+            'ultimo': ultimos.get((grupo['modulo_id'], grupo['ultima_data'])),
+            'quantidade': grupo['quantidade'],
+        }
+        for grupo in grupos
+    ]
@@ -0,0 +1,84 @@
+import threading
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Dimensao, Modulo, Pergunta, Relatorio, RespostaDimensao, RespostaModulo
+from .medias import recalcular_medias_dimensoes
+from .catalogo import invalidar_catalogo
+from .relatorios import remover_relatorios
+from .ultimas import recalcular_ultimas
+
+_pendentes = threading.local()
+
+
+def _agendar_recalculo(dimensao_id):
+    # Agrupa as remoções em cascata de uma mesma transação num único recálculo
+    if not hasattr(_pendentes, 'dimensoes'):
+        _pendentes.dimensoes = set()
+    _pendentes.dimensoes.add(dimensao_id)
+    transaction.on_commit(_recalcular_pendentes)
+
+
+def _recalcular_pendentes():
+    dimensao_ids = list(_pendentes.dimensoes)
+    _pendentes.dimensoes.clear()
+    if dimensao_ids:
+        recalcular_medias_dimensoes(dimensao_ids)
+
+
+def _agendar_ultimas(usuario_id):
+    # Edições mudam dataResposta e remoções apagam o ponteiro em cascata
+    if not hasattr(_pendentes, 'usuarios'):
+        _pendentes.usuarios = set()
+    _pendentes.usuarios.add(usuario_id)
+    transaction.on_commit(_recalcular_ultimas_pendentes)
+
+
+def _recalcular_ultimas_pendentes():
+    usuario_ids = list(_pendentes.usuarios)
+    _pendentes.usuarios.clear()
+    if usuario_ids:
+        recalcular_ultimas(usuario_ids)
+
+
+@receiver(post_save, sender=RespostaDimensao)
+def resposta_dimensao_editada(sender, instance, created, **kwargs):
+    # Submissões novas já atualizam o agregado incrementalmente
+    if not created:
+        _agendar_recalculo(instance.dimensao_id)
+        _agendar_ultimas(instance.usuario_id)
+        remover_relatorios(instance.resposta_modulo_id)
+
+
+@receiver(post_save, sender=RespostaModulo)
+def resposta_modulo_editada(sender, instance, created, **kwargs):
+    if not created:
+        _agendar_ultimas(instance.usuario_id)
+        remover_relatorios(instance.id)
+
+
+@receiver(post_delete, sender=RespostaDimensao)
+def resposta_dimensao_removida(sender, instance, **kwargs):
+    _agendar_recalculo(instance.dimensao_id)
+    _agendar_ultimas(instance.usuario_id)
+
+
+@receiver(post_delete, sender=RespostaModulo)
+def resposta_modulo_removida(sender, instance, **kwargs):
+    _agendar_ultimas(instance.usuario_id)
+
+
+@receiver([post_save, post_delete], sender=Modulo)
+@receiver([post_save, post_delete], sender=Dimensao)
+@receiver([post_save, post_delete], sender=Pergunta)
+def catalogo_alterado(sender, **kwargs):
+    # Inclui as edições feitas pelo admin
+    transaction.on_commit(invalidar_catalogo)
+
+
+@receiver(post_delete, sender=Relatorio)
+def relatorio_removido(sender, instance, **kwargs):
+    # Remove o arquivo só depois do commit, para não perder o PDF num rollback
+    if instance.PATH:
+        storage, nome = instance.PATH.storage, instance.PATH.name
+        transaction.on_commit(lambda: storage.delete(nome))
@@ -0,0 +1,211 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from functools import partial
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from .models import TarefaRelatorio
+from . import pdf
+from .instrumentacao import registrar_span, span
+from .metricas import contar_cache, definir, incrementar
+from .relatorios import abrir_relatorio, coletar_dados_relatorio, relatorio_salvo, salvar_relatorio
+
+logger = logging.getLogger(__name__)
+
+# Número de processos renderizando PDFs; 0 renderiza na própria requisição
+PROCESSOS = getattr(settings, 'RELATORIO_PROCESSOS', min(os.cpu_count() or 1, 4))
+# Renderizações aguardando um processo livre além das que já estão rodando
+FILA_MAXIMA = getattr(settings, 'RELATORIO_FILA_MAXIMA', 32)
+# Tempo máximo de espera da rota síncrona e de uma tarefa pendente
+TEMPO_LIMITE = getattr(settings, 'RELATORIO_TEMPO_LIMITE', 120)
+
+
+class FilaCheia(Exception):
+    pass
+
+
+_lock = threading.Lock()
+_executor = None
+_vagas = threading.BoundedSemaphore(PROCESSOS + FILA_MAXIMA) if PROCESSOS else None
+_pendentes = 0
+# PDFs prontos esperando ser salvos; consumidos por _thread_conclusoes
+_conclusoes = queue.Queue()
+_thread_conclusoes = None
+
+
+def _obter_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # spawn: os filhos não herdam conexões de banco nem threads do worker
+            _executor = ProcessPoolExecutor(
+                max_workers=PROCESSOS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=pdf.aquecer
+            )
+        return _executor
+
+
+def aquecer_relatorios():
+    # Gancho opcional para workers que geram relatórios: carrega o reportlab
+    # neste processo e já sobe o pool, com os filhos também aquecidos.
+    # Ex. no gunicorn.conf.py:
+    #   def post_worker_init(worker):
+    #       from questionario.tarefas import aquecer_relatorios
+    #       aquecer_relatorios()
+    pdf.aquecer()
+    if PROCESSOS:
+        executor = _obter_executor()
+        for future in [executor.submit(pdf.aquecer) for _ in range(PROCESSOS)]:
+            future.result()
+
+
+def profundidade_fila():
+    # Renderizações submetidas ao pool e ainda não concluídas
+    return _pendentes
+
+
+def _liberar_vaga(future):
+    global _pendentes, _executor
+    with _lock:
+        _pendentes -= 1
+        pendentes = _pendentes
+        # Um filho morto quebra o pool inteiro; o próximo submit cria outro
+        if future is not None and not future.cancelled() \
+                and isinstance(future.exception(), BrokenProcessPool):
+            _executor = None
+    _vagas.release()
+    definir('hub_relatorios_fila', pendentes)
+
+
+def submeter_renderizacao(dados, renderizar=pdf.renderizar_pdf):
+    global _pendentes
+    if PROCESSOS and not _vagas.acquire(blocking=False):
+        logger.warning('Fila de relatórios cheia (%d pendentes)', _pendentes)
+        raise FilaCheia()
+
+    incrementar('hub_relatorios_renderizados_total')
+    if not PROCESSOS:
+        future = Future()
+        try:
+            future.set_result(renderizar(dados))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    with _lock:
+        _pendentes += 1
+        pendentes = _pendentes
+    definir('hub_relatorios_fila', pendentes)
+    try:
+        future = _obter_executor().submit(renderizar, dados)
+    except Exception:
+        _liberar_vaga(None)
+        raise
+    future.add_done_callback(_liberar_vaga)
+    return future
+
+
+def gerar_relatorio(resposta_modulo, usuario):
+    # Caminho síncrono: reaproveita o PDF salvo ou espera o pool renderizar
+    dados = coletar_dados_relatorio(resposta_modulo, usuario)
+    if not dados['dimensoes']:
+        return None
+
+    relatorio = relatorio_salvo(dados)
+    contar_cache('relatorio_pdf', relatorio is not None)
+    if relatorio is None:
+        # 'render' inclui a espera na fila do pool; 'chart' e 'pdf' vêm do processo que renderizou
+        with span('render'):
+            conteudo, tempos = submeter_renderizacao(dados, pdf.renderizar_pdf_medido).result(timeout=TEMPO_LIMITE)
+        for nome, segundos in tempos.items():
+            registrar_span(nome, segundos)
+        with span('storage'):
+            relatorio = salvar_relatorio(dados, conteudo)
+    return relatorio
+
+
+def abrir_relatorio_gerado(resposta_modulo, usuario):
+    # Arquivo do PDF aberto, ou None se não há dimensões respondidas. Se o
+    # arquivo sumir antes da leitura, a segunda volta renderiza de novo.
+    for _ in range(2):
+        relatorio = gerar_relatorio(resposta_modulo, usuario)
+        if relatorio is None:
+            return None
+        arquivo = abrir_relatorio(relatorio)
+        if arquivo is not None:
+            return arquivo
+    raise FileNotFoundError(relatorio.PATH.name)
+
+
+def _concluir_tarefa(tarefa_id, dados, future):
+    try:
+        relatorio = salvar_relatorio(dados, future.result())
+        TarefaRelatorio.objects.filter(pk=tarefa_id).update(
+            status='CONCLUIDA', relatorio=relatorio, atualizada_em=timezone.now())
+    except Exception as e:
+        logger.exception('Falha ao gerar o relatório da tarefa %s', tarefa_id)
+        TarefaRelatorio.objects.filter(pk=tarefa_id).update(
+            status='ERRO', erro=str(e), atualizada_em=timezone.now())
+
+
+def _laco_conclusoes():
+    # Fora do ciclo de requisição: ninguém mais fecha a conexão desta thread
+    while True:
+        tarefa_id, dados, future = _conclusoes.get()
+        close_old_connections()
+        try:
+            _concluir_tarefa(tarefa_id, dados, future)
+        finally:
+            close_old_connections()
+
+
+def _enfileirar_conclusao(tarefa_id, dados, future):
+    # Callback do pool: só entrega o resultado, sem banco nem arquivo nesta thread
+    global _thread_conclusoes
+    _conclusoes.put((tarefa_id, dados, future))
+    with _lock:
+        if _thread_conclusoes is None or not _thread_conclusoes.is_alive():
+            _thread_conclusoes = threading.Thread(
+                target=_laco_conclusoes, name='relatorios-conclusao', daemon=True)
+            _thread_conclusoes.start()
+
+
+def iniciar_tarefa(resposta_modulo, usuario):
+    dados = coletar_dados_relatorio(resposta_modulo, usuario)
+    if not dados['dimensoes']:
+        return None
+
+    relatorio = relatorio_salvo(dados)
+    contar_cache('relatorio_pdf', relatorio is not None)
+    if relatorio is not None:
+        return TarefaRelatorio.objects.create(
+            usuario=usuario, resposta_modulo=resposta_modulo,
+            relatorio=relatorio, status='CONCLUIDA'
+        )
+
+    future = submeter_renderizacao(dados)
+    tarefa = TarefaRelatorio.objects.create(usuario=usuario, resposta_modulo=resposta_modulo)
+    if not PROCESSOS:
+        # Renderizado na própria requisição: conclui aqui, na conexão dela
+        _concluir_tarefa(tarefa.pk, dados, future)
+    else:
+        future.add_done_callback(partial(_enfileirar_conclusao, tarefa.pk, dados))
+    tarefa.refresh_from_db()
+    return tarefa
+
+
+def expirar_se_abandonada(tarefa):
+    # Tarefas de um worker que morreu ficariam pendentes para sempre
+    if tarefa.status == 'PENDENTE' and \
+            timezone.now() - tarefa.criada_em > timedelta(seconds=TEMPO_LIMITE * 2):
+        tarefa.status = 'ERRO'
+        tarefa.erro = 'Tempo limite de geração excedido.'
+        tarefa.save(update_fields=['status', 'erro', 'atualizada_em'])
+    return tarefa
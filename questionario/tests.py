@@ -0,0 +1,1071 @@
+import os
+import re
+import shutil
+import tempfile
+import time
+from functools import partial
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from users.models import UserAccount
+from .models import Dimensao, Modulo, Pergunta, RespostaModulo, TarefaRelatorio
+from .pontuacao import plano_pontuacao
+from .respostas import salvar_respostas
+from . import urls as questionario_urls
+
+# (usuários, submissões por usuário e módulo, dimensões por módulo). O número
+# de consultas de cada rota tem de ser o mesmo nas duas escalas.
+ESCALAS = [(2, 1, 2), (6, 4, 5)]
+MODULOS = 2
+PERGUNTAS_POR_DIMENSAO = 3
+
+# Tabelas que crescem com o uso: consultas nelas não podem varrer a tabela
+TABELAS_RESPOSTA = (
+    'questionario_respostamodulo',
+    'questionario_respostadimensao',
+    'questionario_respostamoduloincompleta',
+    'questionario_ultimarespostamodulo',
+    'questionario_ultimarespostadimensao',
+)
+
+
+def semear(usuarios, submissoes, dimensoes):
+    modulos = []
+    for m in range(MODULOS):
+        modulo = Modulo.objects.create(nome=f'Módulo {m}', descricao=f'Descrição do módulo {m}')
+        for d in range(dimensoes):
+            dimensao = Dimensao.objects.create(
+                titulo=f'Dimensão {m}.{d}', descricao='Descrição', tipo='OBRIGATORIO', modulo=modulo)
+            Pergunta.objects.bulk_create([
+                Pergunta(pergunta=f'Pergunta {m}.{d}.{p}', dimensao=dimensao)
+                for p in range(PERGUNTAS_POR_DIMENSAO)
+            ])
+        modulos.append(modulo)
+
+    contas = [
+        UserAccount.objects.create_user(
+            f'empresa{i}@exemplo.com', password='senha', username=f'empresa{i}',
+            cnpj=f'{i:014d}', is_staff=(i == 0)
+        )
+        for i in range(usuarios)
+    ]
+    for conta in contas:
+        for modulo in modulos:
+            plano = plano_pontuacao(modulo.nome)
+            for s in range(submissoes):
+                somas, _ = plano.pontuar(respostas_modulo(modulo, s))
+                salvar_respostas(conta, [(plano, somas)])
+    return contas, modulos
+
+
+def respostas_modulo(modulo, semente=0):
+    plano = plano_pontuacao(modulo.nome)
+    return [{'id': int(pk), 'valor': 1 + (semente + i) % 5} for i, pk in enumerate(plano.ids)]
+
+
+def cliente(conta):
+    # Autenticação real por JWT, para as consultas do usuário entrarem na conta
+    cliente = APIClient()
+    cliente.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(conta).access_token}')
+    return cliente
+
+
+def consumir(response):
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def _tarefa(ctx):
+    return TarefaRelatorio.objects.filter(usuario=ctx['conta']).latest('criada_em')
+
+
+# nome da rota -> requisição. As rotas são chamadas duas vezes e só a segunda
+# é medida, com caches (catálogo, planos, PDFs, distribuições) já aquecidos.
+ROTAS = {
+    'obter_modulo': lambda c, ctx: c.get(reverse('obter_modulo', args=[ctx['modulo'].nome])),
+    'obter-questionario': lambda c, ctx: c.get(reverse('obter-questionario')),
+    'salvar_respostas_lote': lambda c, ctx: c.post(reverse('salvar_respostas_lote'), {
+        'submissoes': [
+            {'nomeModulo': modulo.nome, 'respostas': respostas_modulo(modulo)} for modulo in ctx['modulos']
+        ]}, format='json'),
+    'salvar_respostas_modulo': lambda c, ctx: c.post(
+        reverse('salvar_respostas_modulo', args=[ctx['modulo'].nome]),
+        {'respostas': respostas_modulo(ctx['modulo'])}, format='json'),
+    'salvar_resposta_incompleta': lambda c, ctx: c.post(reverse('salvar_resposta_incompleta'), {
+        'nomeModulo': ctx['modulo'].nome,
+        'dimensaoTitulo': ctx['modulo'].dimensoes.first().titulo,
+        'respostas': respostas_modulo(ctx['modulo'])[:PERGUNTAS_POR_DIMENSAO],
+    }, format='json'),
+    'modulo-relatorio.pdf': lambda c, ctx: c.get(reverse('modulo-relatorio.pdf', args=[ctx['modulo'].nome])),
+    'criar-tarefa-relatorio': lambda c, ctx: c.post(
+        reverse('criar-tarefa-relatorio', args=[ctx['modulo'].id])),
+    'tarefa-relatorio': lambda c, ctx: c.get(reverse('tarefa-relatorio', args=[_tarefa(ctx).id])),
+    'tarefa-relatorio-pdf': lambda c, ctx: c.get(reverse('tarefa-relatorio-pdf', args=[_tarefa(ctx).id])),
+    'exportar-relatorios': lambda c, ctx: c.get(reverse('exportar-relatorios'), {'modulo': ctx['modulo'].id}),
+    'relatorios': lambda c, ctx: c.get(reverse('relatorios'), {'data': ctx['data']}),
+    'check-deadline': lambda c, ctx: c.get(reverse('check-deadline', args=[ctx['modulo'].id])),
+    'all-dates-relatorios': lambda c, ctx: c.get(reverse('all-dates-relatorios')),
+    'all-dimensoes': lambda c, ctx: c.get(reverse('all-dimensoes')),
+    'relatorio-modulo': lambda c, ctx: c.get(reverse('relatorio-modulo'), {'modulo_id': ctx['resposta'].id}),
+    'modulo-benchmark': lambda c, ctx: c.get(reverse('modulo-benchmark', args=[ctx['modulo'].id])),
+    'metricas': lambda c, ctx: c.get(reverse('metricas')),
+}
+
+# Rotas que leem todas as respostas do filtro por definição
+VARREDURA_PERMITIDA = {'exportar-relatorios'}
+
+# Depende de uma tarefa criada antes
+PREPARAR = {
+    'tarefa-relatorio': 'criar-tarefa-relatorio',
+    'tarefa-relatorio-pdf': 'criar-tarefa-relatorio',
+}
+
+
+def varreduras(consultas):
+    # (sql, plano) das consultas que fazem SCAN completo numa tabela de respostas
+    encontradas = []
+    with connection.cursor() as cursor:
+        for consulta in consultas:
+            sql = consulta['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            if not any(tabela in sql for tabela in TABELAS_RESPOSTA):
+                continue
+            apelidos = dict(re.findall(r'"(questionario_\w+)" (U\d+)', sql))
+            nomes = set(TABELAS_RESPOSTA) | {
+                apelido for tabela, apelido in apelidos.items() if tabela in TABELAS_RESPOSTA}
+
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plano = [linha[-1] for linha in cursor.fetchall()]
+            if any(re.match(r'SCAN (\S+)', passo) and re.match(r'SCAN (\S+)', passo).group(1) in nomes
+                   for passo in plano):
+                encontradas.append((sql, plano))
+    return encontradas
+
+
+class MediasDimensoesTests(TestCase):
+
+    def _agregado(self):
+        from .models import MediaDimensao
+        return {pk: (soma, contagem) for pk, soma, contagem in
+                MediaDimensao.objects.filter(contagem__gt=0).values_list('dimensao_id', 'soma', 'contagem')}
+
+    def _do_historico(self):
+        # Recontagem direta: última resposta de cada usuário em cada dimensão
+        from .models import RespostaDimensao
+        ultimas = {}
+        for resposta in RespostaDimensao.objects.order_by('dataResposta', 'id'):
+            ultimas[(resposta.dimensao_id, resposta.usuario_id)] = resposta.valorFinal
+        agregado = {}
+        for (dimensao_id, _), valor in ultimas.items():
+            soma, contagem = agregado.get(dimensao_id, (0, 0))
+            agregado[dimensao_id] = (soma + valor, contagem + 1)
+        return agregado
+
+    def test_incremental_igual_ao_recalculo(self):
+        from .medias import recalcular_medias_dimensoes
+        cache.clear()
+        contas, modulos = semear(3, 3, 2)
+        # Mais uma rodada, com valores diferentes, para alguns usuários
+        plano = plano_pontuacao(modulos[0].nome)
+        for semente, conta in enumerate(contas[:2], start=7):
+            salvar_respostas(conta, [(plano, plano.pontuar(respostas_modulo(modulos[0], semente))[0])])
+        self.assertEqual(self._agregado(), self._do_historico())
+
+        recalcular_medias_dimensoes()
+        self.assertEqual(self._agregado(), self._do_historico())
+
+        # Remoção da última resposta de um usuário: volta a valer a anterior
+        with self.captureOnCommitCallbacks(execute=True):
+            RespostaModulo.objects.filter(usuario=contas[0]).latest('id').delete()
+        self.assertEqual(self._agregado(), self._do_historico())
+
+    def test_ponteiros_lidos_com_lock_depois_das_medias(self):
+        # SQLite serializa as escritas e omite o FOR UPDATE: aqui só a ordem e
+        # o pedido de lock são verificáveis
+        from . import medias
+        cache.clear()
+        contas, modulos = semear(1, 1, 2)
+        plano = plano_pontuacao(modulos[0].nome)
+        somas = plano.pontuar(respostas_modulo(modulos[0], 3))[0]
+        with mock.patch.object(medias, 'ultimas_respostas_usuario',
+                               wraps=medias.ultimas_respostas_usuario) as leitura:
+            with CaptureQueriesContext(connection) as consultas:
+                salvar_respostas(contas[0], [(plano, somas)])
+        self.assertTrue(leitura.call_args.kwargs.get('travar'))
+        sql = [consulta['sql'] for consulta in consultas.captured_queries]
+        trava = next(i for i, q in enumerate(sql) if q.startswith('SELECT') and 'questionario_mediadimensao' in q)
+        ponteiros = next(i for i, q in enumerate(sql) if 'questionario_ultimarespostadimensao' in q)
+        self.assertLess(trava, ponteiros)
+
+
+class PreencherUltimasRespostasTests(TestCase):
+
+    def test_backfill_aponta_a_ultima_de_cada_usuario_com_empates(self):
+        import io
+        from django.core.management import call_command
+        from django.utils import timezone
+        from .models import RespostaDimensao, UltimaRespostaDimensao, UltimaRespostaModulo
+        contas, modulos = semear(2, 3, 2)
+        # Empate em dataResposta na última submissão: vale o maior id
+        data = timezone.now()
+        for conta in contas:
+            ids = list(RespostaModulo.objects.filter(usuario=conta, modulo=modulos[0])
+                       .order_by('id').values_list('id', flat=True))
+            RespostaModulo.objects.filter(id__in=ids[:2]).update(dataResposta=data)
+            RespostaDimensao.objects.filter(resposta_modulo_id__in=ids[:2]).update(dataResposta=data)
+        UltimaRespostaModulo.objects.all().delete()
+        UltimaRespostaDimensao.objects.all().delete()
+
+        call_command('preencher_ultimas_respostas', lote=1, stdout=io.StringIO())
+
+        def ultimas(respostas, campo):
+            esperadas = {}
+            for pk, usuario_id, chave, data in respostas.values_list('id', 'usuario_id', campo, 'dataResposta'):
+                atual = esperadas.get((usuario_id, chave))
+                if atual is None or (data, pk) > atual:
+                    esperadas[(usuario_id, chave)] = (data, pk)
+            return {chave: pk for chave, (_, pk) in esperadas.items()}
+
+        esperadas_modulo = ultimas(RespostaModulo.objects.all(), 'modulo_id')
+        self.assertEqual(len(esperadas_modulo), 2 * MODULOS)
+        self.assertEqual(
+            {(p.usuario_id, p.modulo_id): p.resposta_modulo_id for p in UltimaRespostaModulo.objects.all()},
+            esperadas_modulo)
+        self.assertEqual(
+            {(p.usuario_id, p.dimensao_id): p.resposta_dimensao_id for p in UltimaRespostaDimensao.objects.all()},
+            ultimas(RespostaDimensao.objects.all(), 'dimensao_id'))
+        # O empate ficou com a segunda das duas submissões, não com a terceira
+        for conta in contas:
+            ids = list(RespostaModulo.objects.filter(usuario=conta, modulo=modulos[0])
+                       .order_by('id').values_list('id', flat=True))
+            self.assertEqual(esperadas_modulo[(conta.id, modulos[0].id)], ids[1])
+
+
+class CatalogoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        _, modulos = semear(1, 0, 2)
+        self.modulo = modulos[0]
+        self.c = APIClient()
+
+    def test_304_com_if_none_match(self):
+        for url in (reverse('obter-questionario'), reverse('obter_modulo', args=[self.modulo.nome])):
+            with self.subTest(url=url):
+                etag = self.c.get(url)['ETag']
+                response = self.c.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(self.c.get(url, HTTP_IF_NONE_MATCH='"outra"').status_code, 200)
+
+    def test_edicoes_trocam_a_versao_em_todos_os_workers(self):
+        from . import catalogo
+        url = reverse('obter_modulo', args=[self.modulo.nome])
+        dimensao = self.modulo.dimensoes.first()
+        pergunta = dimensao.perguntas.first()
+        for objeto, campo, valor in ((pergunta, 'pergunta', 'Pergunta editada'),
+                                     (dimensao, 'titulo', 'Dimensão editada')):
+            with self.subTest(campo=campo):
+                etag = self.c.get(url)['ETag']
+                setattr(objeto, campo, valor)
+                with self.captureOnCommitCallbacks(execute=True):
+                    objeto.save()
+                # Outro worker: cache e cópia locais próprios, só o banco em comum
+                cache.clear()
+                catalogo._local.update(versao=None, itens={})
+                response = self.c.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+                self.assertIn(valor, str(response.data))
+
+    def test_versao_nao_depende_do_cache(self):
+        from .catalogo import versao_catalogo
+        versao = versao_catalogo()
+        cache.clear()
+        self.assertEqual(versao_catalogo(), versao)
+
+
+@mock.patch('questionario.tarefas.PROCESSOS', 0)
+class RelatoriosSalvosTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+        contas, modulos = semear(1, 1, 2)
+        self.conta, self.modulo = contas[0], modulos[0]
+        self.c = cliente(self.conta)
+        self.url = reverse('modulo-relatorio.pdf', args=[self.modulo.nome])
+
+    def _baixar(self):
+        from . import pdf
+        with mock.patch('questionario.pdf.renderizar_pdf_medido', wraps=pdf.renderizar_pdf_medido) as render:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = consumir(self.c.get(self.url))
+        self.assertEqual(response.status_code, 200)
+        return render.call_count
+
+    def test_reaproveita_o_pdf_e_renderiza_quando_a_chave_muda(self):
+        from .models import Relatorio
+        self.assertEqual(self._baixar(), 1)
+        self.assertEqual(self._baixar(), 0)
+        primeiro = Relatorio.objects.get()
+
+        with mock.patch('questionario.relatorios.VERSAO_TEMPLATE', 'outra'):
+            self.assertEqual(self._baixar(), 1)
+        self.conta.username = 'renomeada'
+        self.conta.save()
+        self.assertEqual(self._baixar(), 1)
+
+        # Só a versão atual fica, e a antiga sai do storage
+        relatorio = Relatorio.objects.get()
+        self.assertFalse(primeiro.PATH.storage.exists(primeiro.PATH.name))
+        self.assertTrue(relatorio.PATH.storage.exists(relatorio.PATH.name))
+
+    def test_mesma_chave_nao_apaga_o_arquivo_ja_encontrado(self):
+        from .relatorios import coletar_dados_relatorio, salvar_relatorio
+        resposta = RespostaModulo.objects.get(usuario=self.conta, modulo=self.modulo)
+        dados = coletar_dados_relatorio(resposta, self.conta)
+        primeiro = salvar_relatorio(dados, b'%PDF-1')
+        with self.captureOnCommitCallbacks(execute=True):
+            salvar_relatorio(dados, b'%PDF-2')
+        self.assertTrue(primeiro.PATH.storage.exists(primeiro.PATH.name))
+
+    def test_arquivo_sumido_e_renderizado_de_novo(self):
+        from .models import Relatorio
+        self._baixar()
+        relatorio = Relatorio.objects.get()
+        relatorio.PATH.storage.delete(relatorio.PATH.name)
+        self.assertEqual(self._baixar(), 1)
+
+        import io
+        import zipfile
+        relatorio = Relatorio.objects.get()
+        relatorio.PATH.storage.delete(relatorio.PATH.name)
+        response = self.c.get(reverse('exportar-relatorios'), {'modulo': self.modulo.id})
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as arquivo_zip:
+            conteudos = [arquivo_zip.read(nome) for nome in arquivo_zip.namelist()]
+        self.assertTrue(conteudos)
+        self.assertTrue(all(conteudo.startswith(b'%PDF') for conteudo in conteudos))
+
+
+    def test_exportacao_com_fila_cheia_renderiza_aqui_depois_do_prazo(self):
+        from . import exportacao
+        from .tarefas import FilaCheia
+        with mock.patch.object(exportacao, 'submeter_renderizacao', side_effect=FilaCheia), \
+                mock.patch.object(exportacao, 'ESPERA_FILA', 1), \
+                mock.patch.object(exportacao.time, 'sleep') as dormir, \
+                mock.patch.object(exportacao.time, 'monotonic', side_effect=[0, 0, 0.5, 1, 10, 10, 10]):
+            pdfs = list(exportacao.gerar_pdfs(exportacao.selecionar_respostas(modulo=self.modulo)))
+        self.assertEqual(len(pdfs), 1)
+        self.assertTrue(pdfs[0][1].startswith(b'%PDF'))
+        self.assertEqual(dormir.call_count, 2)
+
+    def test_radar_vetorial_com_um_eixo_por_dimensao(self):
+        import base64
+        import zlib
+        from reportlab.graphics import renderPDF
+        from reportlab.graphics.shapes import Line
+        from . import pdf
+        from .relatorios import coletar_dados_relatorio
+        resposta = RespostaModulo.objects.get(usuario=self.conta, modulo=self.modulo)
+        dados = coletar_dados_relatorio(resposta, self.conta)
+
+        # Duas dimensões viram um triângulo, com o terceiro eixo vazio
+        for dimensoes, esperados in [(dados['dimensoes'], 3), ([(f'D{i}', i) for i in range(6)], 6)]:
+            with mock.patch.object(renderPDF, 'draw', wraps=renderPDF.draw) as desenhar:
+                conteudo = pdf.renderizar_pdf({**dados, 'dimensoes': dimensoes})
+
+            # Nenhuma imagem raster: nem XObject de imagem, nem imagem inline
+            # (BI ... EI) no conteúdo da página, que o reportlab comprime
+            self.assertNotIn(b'/Subtype /Image', conteudo)
+            self.assertNotIn(b'/XObject', conteudo)
+            paginas = [zlib.decompress(base64.a85decode(stream.strip().removesuffix(b'~>')))
+                       for stream in re.findall(rb'stream\r?\n(.*?)endstream', conteudo, re.S)]
+            self.assertTrue(paginas)
+            self.assertFalse([pagina for pagina in paginas if re.search(rb'(^|\s)BI\s', pagina)])
+
+            desenho = desenhar.call_args.args[0]
+            eixos = [forma for forma in desenho.contents if isinstance(forma, Line)]
+            self.assertEqual(len(eixos), esperados)
+
+
+class TarefasRelatorioTests(TestCase):
+
+    def setUp(self):
+        diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, diretorio, ignore_errors=True)
+        self.enterContext(mock.patch('questionario.metricas.DIRETORIO', diretorio))
+        self.enterContext(mock.patch.dict('questionario.metricas._estado', {
+            'pid': os.getpid(), 'arquivo': os.path.join(diretorio, f'{os.getpid()}-teste.json'),
+            'contadores': {}, 'histogramas': {}, 'medidores': {}, 'alterado': False,
+        }))
+
+    def test_conclusao_fora_da_thread_do_callback_e_fila_exportada(self):
+        import threading
+        from concurrent.futures import Future
+        from . import tarefas
+        from .metricas import exposicao
+
+        future = Future()
+        executor = mock.Mock(**{'submit.return_value': future})
+        concluidas = []
+        with mock.patch.multiple(tarefas, PROCESSOS=1, _pendentes=0,
+                                 _vagas=threading.BoundedSemaphore(1)), \
+                mock.patch.object(tarefas, '_obter_executor', return_value=executor), \
+                mock.patch.object(tarefas, 'close_old_connections') as fechar, \
+                mock.patch.object(tarefas, '_concluir_tarefa', side_effect=lambda *args: concluidas.append(
+                    (threading.current_thread().name, fechar.call_count))):
+            self.assertIs(tarefas.submeter_renderizacao({}), future)
+            self.assertIn('hub_relatorios_fila 1\n', exposicao())
+
+            future.add_done_callback(partial(tarefas._enfileirar_conclusao, 7, {}))
+            future.set_result(b'%PDF')
+            for _ in range(100):
+                if fechar.call_count == 2:
+                    break
+                time.sleep(0.01)
+
+        # Banco e arquivo só na thread dedicada, com as conexões fechadas antes e depois
+        self.assertEqual(concluidas, [('relatorios-conclusao', 1)])
+        self.assertEqual(fechar.call_count, 2)
+        self.assertIn('hub_relatorios_fila 0\n', exposicao())
+
+
+class MetricasTests(TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.diretorio, ignore_errors=True)
+        self.enterContext(mock.patch('questionario.metricas.DIRETORIO', self.diretorio))
+        self.enterContext(mock.patch.dict('questionario.metricas._estado', {
+            'pid': os.getpid(), 'arquivo': os.path.join(self.diretorio, f'{os.getpid()}-teste.json'),
+            'contadores': {}, 'histogramas': {}, 'medidores': {}, 'alterado': False,
+        }))
+
+    def _amostras(self):
+        from .metricas import DESCRICOES, exposicao
+        tipos, amostras = {}, {}
+        for linha in exposicao().splitlines():
+            if linha.startswith('# HELP '):
+                self.assertIn(linha.split()[2], DESCRICOES)
+            elif linha.startswith('# TYPE '):
+                _, _, nome, tipo = linha.split()
+                tipos[nome] = tipo
+            else:
+                serie, valor = linha.rsplit(' ', 1)
+                amostras[serie] = float(valor)
+        self.assertEqual(tipos, {nome: tipo for nome, (tipo, _) in DESCRICOES.items()})
+        return amostras
+
+    def test_exposicao_e_poda_dos_processos_encerrados(self):
+        import json
+        import subprocess
+        from .metricas import incrementar, observar
+
+        # Arquivo de um worker que já saiu
+        encerrado = subprocess.Popen(['true'])
+        encerrado.wait()
+        arquivo = os.path.join(self.diretorio, f'{encerrado.pid}-antigo.json')
+        with open(arquivo, 'w') as saida:
+            json.dump({
+                'contadores': [['hub_relatorios_renderizados_total', {}, 2]],
+                'histogramas': [['hub_requisicao_segundos', {'rota': 'a'}, [1] + [0] * 11, 0.004, 1]],
+                'medidores': [['hub_relatorios_fila', {}, 5]],
+            }, saida)
+
+        incrementar('hub_relatorios_renderizados_total')
+        observar('hub_requisicao_segundos', 0.3, rota='a')
+        observar('hub_requisicao_segundos', 60, rota='a')
+
+        for _ in range(2):
+            amostras = self._amostras()
+            self.assertEqual(amostras['hub_relatorios_renderizados_total'], 3)
+            self.assertEqual(amostras['hub_requisicao_segundos_bucket{rota="a",le="0.005"}'], 1)
+            self.assertEqual(amostras['hub_requisicao_segundos_bucket{rota="a",le="0.5"}'], 2)
+            self.assertEqual(amostras['hub_requisicao_segundos_bucket{rota="a",le="10.0"}'], 2)
+            self.assertEqual(amostras['hub_requisicao_segundos_bucket{rota="a",le="+Inf"}'], 3)
+            self.assertEqual(amostras['hub_requisicao_segundos_count{rota="a"}'], 3)
+            self.assertAlmostEqual(amostras['hub_requisicao_segundos_sum{rota="a"}'], 60.304)
+            # Medidor do processo encerrado não conta mais
+            self.assertNotIn('hub_relatorios_fila', amostras)
+            self.assertFalse(os.path.exists(arquivo))
+
+
+class PlanoPontuacaoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        contas, modulos = semear(1, 0, 2)
+        self.conta, self.modulo = contas[0], modulos[0]
+        self.perguntas = list(Pergunta.objects.filter(dimensao__modulo=self.modulo).order_by('id'))
+        self.perguntas[0].peso = 3
+        with self.captureOnCommitCallbacks(execute=True):
+            self.perguntas[0].save()
+
+    def test_somas_iguais_ao_laco_por_pergunta(self):
+        respostas = [{'id': p.id, 'valor': 1 + i % 5} for i, p in enumerate(reversed(self.perguntas))]
+        esperado = {}
+        for resposta in respostas:
+            pergunta = Pergunta.objects.get(pk=resposta['id'])
+            esperado[pergunta.dimensao_id] = esperado.get(pergunta.dimensao_id, 0) + resposta['valor'] * pergunta.peso
+        somas, erros = plano_pontuacao(self.modulo.nome).pontuar(respostas)
+        self.assertEqual(erros, [])
+        self.assertEqual(somas, esperado)
+        # Ordem de primeira aparição no payload
+        self.assertEqual(list(somas), list(esperado))
+
+    def test_erros_de_validacao(self):
+        primeira, segunda = self.perguntas[0].id, self.perguntas[1].id
+        _, erros = plano_pontuacao(self.modulo.nome).pontuar([
+            {'id': primeira, 'valor': 1},
+            {'id': 999999, 'valor': 1},
+            {'id': primeira, 'valor': 2},
+            {'id': segunda, 'valor': 6},
+            {'id': 10 ** 30, 'valor': 3},
+            {'id': segunda, 'valor': 10 ** 30},
+        ])
+        self.assertEqual(len(erros), 5)
+        self.assertIn('ID 999999 não encontrada', erros[0])
+        self.assertIn('Resposta duplicada', erros[1])
+        self.assertIn("deve estar entre 1 e 5 (recebeu '6')", erros[2])
+        self.assertIn(f'ID {10 ** 30} não encontrada', erros[3])
+        self.assertIn(f"deve estar entre 1 e 5 (recebeu '{10 ** 30}')", erros[4])
+
+    def test_inteiros_gigantes_viram_400_nas_duas_rotas(self):
+        c = cliente(self.conta)
+        for item in ({'id': 10 ** 30, 'valor': 3}, {'id': self.perguntas[0].id, 'valor': 10 ** 30}):
+            response = c.post(reverse('salvar_respostas_modulo', args=[self.modulo.nome]),
+                              {'respostas': [item]}, format='json')
+            self.assertEqual(response.status_code, 400)
+            response = c.post(reverse('salvar_respostas_lote'), {
+                'submissoes': [{'nomeModulo': self.modulo.nome, 'respostas': [item]}]}, format='json')
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(RespostaModulo.objects.exists())
+
+    def test_recompila_quando_o_catalogo_muda(self):
+        pergunta = self.perguntas[1]
+        respostas = [{'id': pergunta.id, 'valor': 2}]
+        plano = plano_pontuacao(self.modulo.nome)
+        self.assertIs(plano_pontuacao(self.modulo.nome), plano)
+        self.assertEqual(plano.pontuar(respostas)[0], {pergunta.dimensao_id: 2})
+
+        pergunta.peso = 4
+        with self.captureOnCommitCallbacks(execute=True):
+            pergunta.save()
+        novo = plano_pontuacao(self.modulo.nome)
+        self.assertIsNot(novo, plano)
+        self.assertEqual(novo.pontuar(respostas)[0], {pergunta.dimensao_id: 8})
+
+
+class RespostasLoteTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        contas, self.modulos = semear(1, 0, 2)
+        self.conta = contas[0]
+        self.c = cliente(self.conta)
+
+    def _lote(self, submissoes, modo=None):
+        dados = {'submissoes': submissoes}
+        if modo:
+            dados['modo'] = modo
+        return self.c.post(reverse('salvar_respostas_lote'), dados, format='json')
+
+    def _submissao(self, modulo, semente=0):
+        return {'nomeModulo': modulo.nome, 'respostas': respostas_modulo(modulo, semente)}
+
+    def _ponteiros(self):
+        from .models import UltimaRespostaDimensao, UltimaRespostaModulo
+        return (
+            dict(UltimaRespostaModulo.objects.filter(usuario=self.conta).values_list('modulo_id', 'resposta_modulo_id')),
+            dict(UltimaRespostaDimensao.objects.filter(usuario=self.conta).values_list('dimensao_id', 'resposta_dimensao_id')),
+        )
+
+    def test_tudo_ou_nada_desfaz_o_lote_inteiro(self):
+        primeiro, segundo = self.modulos
+        invalida = {'nomeModulo': segundo.nome, 'respostas': [{'id': 999999, 'valor': 1}]}
+        for submissoes in ([self._submissao(primeiro), invalida],
+                           [self._submissao(primeiro), {'nomeModulo': 'Inexistente', 'respostas': []}]):
+            response = self._lote(submissoes)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual([r['status'] for r in response.data['resultados']], ['Não salva', 'Erro'])
+        self.assertFalse(RespostaModulo.objects.exists())
+        self.assertEqual(self._ponteiros(), ({}, {}))
+
+    def test_falha_ao_gravar_nao_deixa_nada(self):
+        with mock.patch('questionario.respostas.apontar_ultimas', side_effect=RuntimeError('falhou')):
+            response = self._lote([self._submissao(modulo) for modulo in self.modulos])
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(RespostaModulo.objects.exists())
+
+    def test_por_item_salva_as_validas_com_207(self):
+        primeiro, segundo = self.modulos
+        response = self._lote([
+            self._submissao(primeiro),
+            {'nomeModulo': segundo.nome, 'respostas': [{'id': 999999, 'valor': 1}]},
+        ], modo='por_item')
+        self.assertEqual(response.status_code, 207)
+        criada, erro = response.data['resultados']
+        self.assertEqual(criada['status'], 'Criada')
+        self.assertEqual(erro['status'], 'Erro')
+        self.assertIn('999999', erro['detalhes'][0])
+        self.assertEqual(list(RespostaModulo.objects.values_list('id', flat=True)), [criada['respostaModuloId']])
+        self.assertEqual(self._ponteiros()[0], {primeiro.id: criada['respostaModuloId']})
+
+        # Nome que não é texto vira erro do item
+        response = self._lote([
+            self._submissao(primeiro), {'nomeModulo': ['x'], 'respostas': []}, {'nomeModulo': {'a': 1}},
+        ], modo='por_item')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([r['status'] for r in response.data['resultados']], ['Criada', 'Erro', 'Erro'])
+
+        # Sem nenhuma válida, nada é salvo mesmo por item
+        response = self._lote([{'nomeModulo': 'Inexistente', 'respostas': []}], modo='por_item')
+        self.assertEqual(response.status_code, 400)
+
+    def test_ponteiros_vao_para_a_ultima_submissao_de_cada_modulo(self):
+        from .models import RespostaDimensao
+        primeiro, segundo = self.modulos
+        self._lote([self._submissao(primeiro)])
+        response = self._lote([
+            self._submissao(primeiro, 1), self._submissao(segundo), self._submissao(primeiro, 2)])
+        self.assertEqual(response.status_code, 200)
+        ids = [r['respostaModuloId'] for r in response.data['resultados']]
+
+        modulos, dimensoes = self._ponteiros()
+        self.assertEqual(modulos, {primeiro.id: ids[2], segundo.id: ids[1]})
+        esperadas = dict(RespostaDimensao.objects.filter(
+            resposta_modulo_id__in=[ids[1], ids[2]]).values_list('dimensao_id', 'id'))
+        self.assertEqual(dimensoes, esperadas)
+
+
+@mock.patch('questionario.idempotencia.ESPERA', 0)
+class IdempotenciaTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        contas, modulos = semear(1, 0, 2)
+        self.conta, self.modulo = contas[0], modulos[0]
+        self.c = cliente(self.conta)
+
+    def _enviar(self, chave, semente=0):
+        return self.c.post(reverse('salvar_respostas_modulo', args=[self.modulo.nome]),
+                           {'respostas': respostas_modulo(self.modulo, semente)}, format='json',
+                           HTTP_IDEMPOTENCY_KEY=chave)
+
+    def test_repete_a_resposta_guardada(self):
+        primeira = self._enviar('chave-1')
+        repetida = self._enviar('chave-1')
+        self.assertEqual(repetida.status_code, primeira.status_code)
+        self.assertEqual(repetida.data, primeira.data)
+        self.assertEqual(repetida['Idempotent-Replayed'], 'true')
+        self.assertEqual(RespostaModulo.objects.count(), 1)
+
+    def test_outro_payload_e_chave_longa(self):
+        self._enviar('chave-1')
+        self.assertEqual(self._enviar('chave-1', semente=1).status_code, 422)
+        self.assertEqual(self._enviar('x' * 256).status_code, 400)
+        self.assertEqual(RespostaModulo.objects.count(), 1)
+
+    def test_conflito_em_processamento_e_concessao_vencida(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .idempotencia import CONCESSAO
+        from .models import ChaveIdempotencia
+        from .respostas import salvar_respostas as salvar
+        durante = []
+
+        def salvar_observando(*args):
+            durante.append(ChaveIdempotencia.objects.get().expira_em)
+            return salvar(*args)
+
+        with mock.patch('questionario.views.salvar_respostas', salvar_observando):
+            self._enviar('chave-1')
+        # Enquanto executa, só a concessão curta; concluída, o TTL inteiro
+        self.assertLessEqual(durante[0], timezone.now() + timedelta(seconds=CONCESSAO))
+        self.assertGreater(ChaveIdempotencia.objects.get().expira_em, timezone.now() + timedelta(hours=1))
+
+        # Original ainda executando: a retentativa recebe 409
+        ChaveIdempotencia.objects.update(
+            status='PROCESSANDO', expira_em=timezone.now() + timedelta(seconds=30))
+        response = self._enviar('chave-1')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '5')
+
+        # Worker morto no meio: passada a concessão, a retentativa executa
+        ChaveIdempotencia.objects.update(expira_em=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self._enviar('chave-1').status_code, 200)
+        self.assertEqual(RespostaModulo.objects.count(), 2)
+        self.assertEqual(ChaveIdempotencia.objects.get().status, 'CONCLUIDA')
+
+
+@mock.patch('questionario.rascunhos.BUFFER', True)
+@mock.patch('questionario.views.RASCUNHO_BUFFER', True)
+@mock.patch('questionario.rascunhos._iniciar_thread', lambda: None)
+class RascunhosBufferTests(TestCase):
+
+    def setUp(self):
+        from . import rascunhos
+        cache.clear()
+        rascunhos._pendentes.clear()
+        self.addCleanup(rascunhos._pendentes.clear)
+        contas, modulos = semear(1, 0, 2)
+        self.conta, self.modulo = contas[0], modulos[0]
+        self.dimensao = self.modulo.dimensoes.order_by('id').first()
+        self.c = cliente(self.conta)
+
+    def _rascunho(self, semente):
+        respostas = respostas_modulo(self.modulo, semente)[:PERGUNTAS_POR_DIMENSAO]
+        response = self.c.post(reverse('salvar_resposta_incompleta'), {
+            'nomeModulo': self.modulo.nome, 'dimensaoTitulo': self.dimensao.titulo, 'respostas': respostas,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        return respostas
+
+    def _gravados(self):
+        from .models import RespostaModuloIncompleta
+        return list(RespostaModuloIncompleta.objects.filter(usuario=self.conta).values_list('respostas', flat=True))
+
+    def test_leitura_mostra_o_rascunho_ainda_no_buffer(self):
+        from .rascunhos import descarregar
+        self._rascunho(0)
+        descarregar()
+        ultimo = self._rascunho(1)
+        self.assertNotEqual(self._gravados(), [ultimo])
+
+        response = self.c.get(reverse('obter_modulo', args=[self.modulo.nome]))
+        self.assertEqual(response.data['respostasIncompletas'][self.dimensao.titulo]['respostas'], ultimo)
+        self.assertEqual(response.data['respondidads'], [self.dimensao.titulo])
+
+    def test_descarga_grava_uma_vez_por_dimensao(self):
+        from .rascunhos import descarregar
+        for semente in range(3):
+            ultimo = self._rascunho(semente)
+        self.assertEqual(self._gravados(), [])
+        with CaptureQueriesContext(connection) as consultas:
+            descarregar()
+        self.assertEqual(len(consultas), 1)
+        self.assertEqual(self._gravados(), [ultimo])
+        # Nada pendente: a próxima rodada não escreve
+        with CaptureQueriesContext(connection) as consultas:
+            descarregar()
+        self.assertEqual(len(consultas), 0)
+
+    def test_submissao_descarrega_o_modulo_antes(self):
+        from . import rascunhos
+        ultimo = self._rascunho(0)
+        # Autosave de outro worker: está no cache, não na lista deste processo
+        rascunhos._pendentes.clear()
+        response = self.c.post(reverse('salvar_respostas_modulo', args=[self.modulo.nome]),
+                               {'respostas': respostas_modulo(self.modulo)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._gravados(), [ultimo])
+
+    def test_check_recusa_cache_local(self):
+        from .checks import rascunhos_exigem_cache_compartilhado
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        compartilhado = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}
+        with override_settings(RASCUNHO_BUFFER=True, CACHES=local):
+            self.assertEqual([e.id for e in rascunhos_exigem_cache_compartilhado(None)], ['questionario.E001'])
+        with override_settings(RASCUNHO_BUFFER=True, CACHES=compartilhado):
+            self.assertEqual(rascunhos_exigem_cache_compartilhado(None), [])
+        with override_settings(RASCUNHO_BUFFER=False, CACHES=local):
+            self.assertEqual(rascunhos_exigem_cache_compartilhado(None), [])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+@mock.patch('questionario.tarefas.PROCESSOS', 0)
+@mock.patch('users.revogacao.INTERVALO', 10 ** 6)
+class OrcamentoConsultasTests(TestCase):
+    # Protege contra N+1: cada rota faz o mesmo número de consultas com poucos
+    # e com muitos dados, e nenhuma varre as tabelas de respostas no SQLite.
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def medir(self, escala):
+        # {rota: consultas capturadas} numa escala; os dados são desfeitos no fim
+        medidas = {}
+        with transaction.atomic():
+            cache.clear()
+            contas, modulos = semear(*escala)
+            conta = contas[0]
+            resposta = RespostaModulo.objects.filter(usuario=conta, modulo=modulos[0]).latest('id')
+            ctx = {
+                'conta': conta,
+                'modulos': modulos,
+                'modulo': modulos[0],
+                'resposta': resposta,
+                'data': resposta.dataResposta.date().isoformat(),
+            }
+            c = cliente(conta)
+            for nome, requisicao in ROTAS.items():
+                if nome in PREPARAR:
+                    consumir(ROTAS[PREPARAR[nome]](c, ctx))
+                consumir(requisicao(c, ctx))
+                with CaptureQueriesContext(connection) as consultas:
+                    response = consumir(requisicao(c, ctx))
+                self.assertLess(response.status_code, 400, f'{nome}: {getattr(response, "data", "")}')
+                medidas[nome] = consultas.captured_queries
+            transaction.set_rollback(True)
+        return medidas
+
+    def test_todas_as_rotas_tem_orcamento(self):
+        nomes = {padrao.name for padrao in questionario_urls.urlpatterns}
+        self.assertEqual(nomes, set(ROTAS))
+
+    def test_consultas_constantes_com_o_volume(self):
+        pequena, grande = (self.medir(escala) for escala in ESCALAS)
+        for nome in ROTAS:
+            with self.subTest(rota=nome):
+                self.assertEqual(
+                    len(pequena[nome]), len(grande[nome]),
+                    '\n'.join(consulta['sql'] for consulta in grande[nome])
+                )
+
+    def test_sem_varredura_das_tabelas_de_respostas(self):
+        medidas = self.medir(ESCALAS[-1])
+        for nome, consultas in medidas.items():
+            if nome in VARREDURA_PERMITIDA:
+                continue
+            with self.subTest(rota=nome):
+                encontradas = varreduras(consultas)
+                self.assertFalse(encontradas, '\n\n'.join(
+                    f'{sql}\n  ' + '\n  '.join(plano) for sql, plano in encontradas))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+                   INSTRUMENTACAO_LENTA_MS=0)
+@mock.patch('questionario.tarefas.PROCESSOS', 0)
+class InstrumentacaoTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+        contas, modulos = semear(1, 1, 3)
+        self.conta, self.modulo = contas[0], modulos[0]
+
+    def test_spans_do_relatorio_no_server_timing_e_no_log(self):
+        with self.assertLogs('questionario.instrumentacao', 'WARNING') as logs:
+            response = consumir(cliente(self.conta).get(
+                reverse('modulo-relatorio.pdf', args=[self.modulo.nome])))
+        self.assertEqual(response.status_code, 200)
+        spans = [parte.split(';')[0] for parte in response['Server-Timing'].split(', ')]
+        self.assertEqual(spans, ['total', 'db', 'render', 'chart', 'pdf', 'storage'])
+        self.assertIn('"caminho": "/api/modulos/', logs.output[0])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class PaginacaoHistoricoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        contas, modulos = semear(1, 4, 2)
+        self.conta = contas[0]
+        # Datas repetidas: o id desempata
+        respostas = list(RespostaModulo.objects.filter(usuario=self.conta).order_by('id'))
+        RespostaModulo.objects.filter(id__in=[r.id for r in respostas[:5]]).update(
+            dataResposta=respostas[0].dataResposta)
+        self.esperado = list(RespostaModulo.objects.filter(usuario=self.conta)
+                             .order_by('dataResposta', 'id').values_list('id', flat=True))
+
+    def percorrer(self, url, parametros):
+        c = cliente(self.conta)
+        ids, consultas, cursor = [], [], None
+        while True:
+            with CaptureQueriesContext(connection) as capturadas:
+                response = c.get(url, {**parametros, 'limite': 3, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200, getattr(response, 'data', ''))
+            consultas.append(len(capturadas))
+            ids += [item.get('id') for item in response.data['resultados']]
+            cursor = response.data['proximo']
+            if cursor is None:
+                return ids, consultas
+
+    def test_cursor_percorre_tudo_sem_repetir(self):
+        ids, consultas = self.percorrer(reverse('relatorios'), {'de': '2000-01-01'})
+        self.assertEqual(ids, self.esperado)
+        # A primeira página também carrega usuário e revogações
+        self.assertEqual(len(set(consultas[1:])), 1)
+
+    def test_historico_paginado_e_filtrado(self):
+        ids, _ = self.percorrer(reverse('all-dates-relatorios'), {'modulo': 'Módulo 1'})
+        self.assertEqual(len(ids), RespostaModulo.objects.filter(usuario=self.conta, modulo__nome='Módulo 1').count())
+        self.assertIsInstance(cliente(self.conta).get(reverse('all-dates-relatorios')).data, list)
+
+    def test_sem_limite_nem_cursor_as_duas_rotas_devolvem_tudo(self):
+        c = cliente(self.conta)
+        with mock.patch('questionario.paginacao.LIMITE_PADRAO', 2):
+            relatorios = c.get(reverse('relatorios'), {'de': '2000-01-01'}).data
+            datas = c.get(reverse('all-dates-relatorios')).data
+        # Formato de antes: sem 'proximo' e sem corte na página padrão
+        self.assertEqual(list(relatorios), ['resultados'])
+        self.assertEqual([item['id'] for item in relatorios['resultados']], self.esperado)
+        self.assertEqual(len(datas), len(self.esperado))
+
+    def test_cursor_invalido(self):
+        response = cliente(self.conta).get(reverse('relatorios'), {'data': '2024-01-01', 'cursor': 'xyz'})
+        self.assertEqual(response.status_code, 400)
+
+
+class HistoricoAgregadoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        contas, modulos = semear(1, 0, 2)
+        self.conta, self.modulo = contas[0], modulos[0]
+        plano = plano_pontuacao(self.modulo.nome)
+        # 29/02 às 23h em São Paulo já é 01/03 em UTC: o bucket é fevereiro
+        datas_valores = [
+            ('2024-02-10T12:00:00+00:00', 10), ('2024-03-01T02:00:00+00:00', 30),
+            ('2024-03-01T02:00:00+00:00', 20), ('2024-03-15T12:00:00+00:00', 40),
+        ]
+        for data, valor in datas_valores:
+            resposta = salvar_respostas(self.conta, [(plano, {plano.dimensao_ids[0]: valor})])[0]
+            RespostaModulo.objects.filter(pk=resposta.pk).update(dataResposta=data)
+
+    def test_buckets_por_mes_no_fuso_de_sao_paulo(self):
+        c = cliente(self.conta)
+        c.get(reverse('all-dates-relatorios'), {'bucket': 'mes'})
+        with CaptureQueriesContext(connection) as consultas:
+            response = c.get(reverse('all-dates-relatorios'), {'bucket': 'mes'})
+        # Agrupamento + busca do último valor de cada bucket
+        self.assertEqual(len(consultas), 2)
+        # Sem conversão de fuso nomeado no banco (CONVERT_TZ no MySQL)
+        self.assertNotIn('America/Sao_Paulo', consultas[0]['sql'])
+        self.assertEqual(response.data, [
+            {'data': '2024-02-01', 'modulo': self.modulo.id, 'minimo': 10, 'maximo': 30,
+             'media': 20.0, 'ultimo': 20, 'quantidade': 3},
+            {'data': '2024-03-01', 'modulo': self.modulo.id, 'minimo': 40, 'maximo': 40,
+             'media': 40.0, 'ultimo': 40, 'quantidade': 1},
+        ])
+
+
+class DistribuicoesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.contas, modulos = semear(3, 0, 2)
+        self.modulo = modulos[0]
+        self.plano = plano_pontuacao(self.modulo.nome)
+        for conta, valor in zip(self.contas, (5, 10, 15)):
+            self._submeter(conta, valor)
+
+    def _submeter(self, conta, valor):
+        with self.captureOnCommitCallbacks(execute=True):
+            salvar_respostas(conta, [(self.plano, {self.plano.dimensao_ids[0]: valor})])
+
+    def _dimensao(self):
+        response = cliente(self.contas[0]).get(reverse('modulo-benchmark', args=[self.modulo.id]))
+        self.assertEqual(response.status_code, 200)
+        dados = response.data['dimensoes'][0]
+        return dados['valorFinal'], dados['percentil'], dados['quartis'], dados['histograma']['contagens']
+
+    def test_nova_submissao_muda_percentil_e_histograma(self):
+        # Limites de 3 a 15 em 10 faixas de 1,2
+        self.assertEqual(self._dimensao(), (
+            5, 16.67, {'q1': 7.5, 'mediana': 10.0, 'q3': 12.5}, [0, 1, 0, 0, 0, 1, 0, 0, 0, 1]))
+
+        self._submeter(self.contas[0], 15)
+        self.assertEqual(self._dimensao(), (
+            15, 66.67, {'q1': 12.5, 'mediana': 15.0, 'q3': 15.0}, [0, 0, 0, 0, 0, 1, 0, 0, 0, 2]))
+
+    def test_recalculo_dos_ponteiros_atualiza_a_distribuicao(self):
+        from .models import RespostaDimensao
+        from .ultimas import recalcular_ultimas
+        self._dimensao()
+        # .update() não dispara sinais; como no backfill, o recálculo dos
+        # ponteiros é que troca a versão
+        RespostaDimensao.objects.filter(usuario=self.contas[1]).update(valorFinal=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            recalcular_ultimas([self.contas[1].id])
+        self.assertEqual(self._dimensao()[3], [1, 1, 0, 0, 0, 0, 0, 0, 0, 1])
+
+
+class InicializacaoTests(SimpleTestCase):
+
+    def test_urls_e_views_nao_carregam_bibliotecas_pesadas(self):
+        # Interpretador novo: nesta suíte outros testes já importaram tudo
+        import subprocess
+        import sys
+        from django.conf import settings
+        script = (
+            'import sys, django\n'
+            'django.setup()\n'
+            'from django.urls import get_resolver\n'
+            'get_resolver().url_patterns\n'
+            'import questionario.views, users.views\n'
+            'print(" ".join(sorted(m for m in ("numpy", "reportlab", "matplotlib") if m in sys.modules)))\n'
+        )
+        resultado = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'backend.settings', 'RELATORIO_AQUECER': 'False'}
+        )
+        self.assertEqual(resultado.returncode, 0, resultado.stderr)
+        self.assertEqual(resultado.stdout.strip(), '')
+
+
+class RenderizacaoRapidaTests(TestCase):
+
+    def test_mesmo_json_do_drf(self):
+        from decimal import Decimal
+        from django.utils import timezone
+        from django.utils.translation import gettext_lazy
+        from rest_framework.renderers import JSONRenderer
+        from .renderers import RenderizadorJSONRapido
+        dados = {
+            'data': timezone.now(), 'valor': Decimal('1.50'), 'mensagem': gettext_lazy('Não encontrado.'),
+            'texto': 'linha\u2028nova', 'lista': [1, 2.5, None, True], 1: 'chave inteira',
+        }
+        self.assertEqual(RenderizadorJSONRapido().render(dados), JSONRenderer().render(dados))
+        with mock.patch('questionario.renderers.orjson', None):
+            self.assertEqual(RenderizadorJSONRapido().render(dados), JSONRenderer().render(dados))
+
+    def test_serializador_por_valores_igual_ao_model_serializer(self):
+        from .management.commands.benchmark_serializacao import gerar_linhas
+        from .serializers import RelatorioSerializer, RelatorioValoresSerializer
+        instancias, valores = gerar_linhas(30)
+        self.assertEqual(
+            [dict(item) for item in RelatorioSerializer(instancias, many=True).data],
+            RelatorioValoresSerializer(valores).data
+        )
+
+
+class SerializadoresPrefetchTests(TestCase):
+
+    def _serializar(self, respostas):
+        from .serializers import RespostaModuloSerializer
+        with CaptureQueriesContext(connection) as consultas:
+            dados = RespostaModuloSerializer(respostas, many=True).data
+        return len(consultas), dados
+
+    def test_consultas_fixas_com_many_e_mesma_saida_da_instancia_avulsa(self):
+        from .serializers import RespostaModuloSerializer
+        contas, _ = semear(*ESCALAS[1])
+        respostas = RespostaModulo.objects.filter(usuario=contas[0]).order_by('pk')
+        # usuario e modulo no select_related, dimensões num único prefetch
+        uma, _ = self._serializar(respostas[:1])
+        todas, dados = self._serializar(respostas)
+        self.assertEqual(uma, 2)
+        self.assertEqual(todas, uma)
+        self.assertEqual(len(dados), respostas.count())
+        self.assertEqual(RespostaModuloSerializer(respostas.first()).data, dados[0])
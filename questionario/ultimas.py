@@ -0,0 +1,76 @@
+from django.db import connection, transaction
+from .distribuicoes import invalidar_distribuicoes
+from .models import RespostaDimensao, RespostaModulo, UltimaRespostaDimensao, UltimaRespostaModulo
+
+# "Última resposta" é a de maior (dataResposta, id), o mesmo critério dos
+# order_by('-dataResposta', '-id') que os ponteiros substituem.
+
+
+def _upsert(modelo, objetos, unique_fields, update_fields):
+    modelo.objects.bulk_create(
+        objetos,
+        update_conflicts=True,
+        # MySQL resolve o conflito por qualquer chave única, sem alvo explícito
+        unique_fields=unique_fields if connection.features.supports_update_conflicts_with_target else None,
+        update_fields=update_fields
+    )
+
+
+def apontar_ultimas(usuario_id, respostasModulo, respostasDimensao):
+    # Na transação da submissão, com as respostas recém-criadas em ordem:
+    # se um módulo ou dimensão se repete, a última criada é a que vale
+    ultimasModulo = {resposta.modulo_id: resposta for resposta in respostasModulo}
+    ultimasDimensao = {resposta.dimensao_id: resposta for resposta in respostasDimensao}
+
+    if ultimasModulo:
+        _upsert(UltimaRespostaModulo, [
+            UltimaRespostaModulo(usuario_id=usuario_id, modulo_id=modulo_id, resposta_modulo=resposta)
+            for modulo_id, resposta in ultimasModulo.items()
+        ], ['usuario', 'modulo'], ['resposta_modulo'])
+    if ultimasDimensao:
+        _upsert(UltimaRespostaDimensao, [
+            UltimaRespostaDimensao(usuario_id=usuario_id, dimensao_id=dimensao_id, resposta_dimensao=resposta)
+            for dimensao_id, resposta in ultimasDimensao.items()
+        ], ['usuario', 'dimensao'], ['resposta_dimensao'])
+    transaction.on_commit(invalidar_distribuicoes)
+
+
+def recalcular_ultimas(usuario_ids=None):
+    # Reconstrói os ponteiros a partir do histórico: backfill e remoções ou
+    # edições manuais de respostas
+    respostasModulo = RespostaModulo.objects.all()
+    respostasDimensao = RespostaDimensao.objects.all()
+    ponteirosModulo = UltimaRespostaModulo.objects.all()
+    ponteirosDimensao = UltimaRespostaDimensao.objects.all()
+    if usuario_ids is not None:
+        usuario_ids = list(usuario_ids)
+        respostasModulo = respostasModulo.filter(usuario_id__in=usuario_ids)
+        respostasDimensao = respostasDimensao.filter(usuario_id__in=usuario_ids)
+        ponteirosModulo = ponteirosModulo.filter(usuario_id__in=usuario_ids)
+        ponteirosDimensao = ponteirosDimensao.filter(usuario_id__in=usuario_ids)
+
+    ultimasModulo = {}
+    for pk, usuario_id, modulo_id in respostasModulo.order_by(
+            'usuario_id', 'modulo_id', '-dataResposta', '-id'
+    ).values_list('id', 'usuario_id', 'modulo_id').iterator(chunk_size=2000):
+        ultimasModulo.setdefault((usuario_id, modulo_id), pk)
+
+    ultimasDimensao = {}
+    for pk, usuario_id, dimensao_id in respostasDimensao.order_by(
+            'usuario_id', 'dimensao_id', '-dataResposta', '-id'
+    ).values_list('id', 'usuario_id', 'dimensao_id').iterator(chunk_size=2000):
+        ultimasDimensao.setdefault((usuario_id, dimensao_id), pk)
+
+    with transaction.atomic():
+        ponteirosModulo.delete()
+        ponteirosDimensao.delete()
+        UltimaRespostaModulo.objects.bulk_create([
+            UltimaRespostaModulo(usuario_id=usuario_id, modulo_id=modulo_id, resposta_modulo_id=pk)
+            for (usuario_id, modulo_id), pk in ultimasModulo.items()
+        ], batch_size=1000)
+        UltimaRespostaDimensao.objects.bulk_create([
+            UltimaRespostaDimensao(usuario_id=usuario_id, dimensao_id=dimensao_id, resposta_dimensao_id=pk)
+            for (usuario_id, dimensao_id), pk in ultimasDimensao.items()
+        ], batch_size=1000)
+        # Edições de valorFinal também passam por aqui, mesmo sem trocar o ponteiro
+        transaction.on_commit(invalidar_distribuicoes)
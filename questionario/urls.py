@@ -2,6 +2,7 @@ from django.urls import path
 from .views import (
     QuestionarioView,
     SalvarRespostasModuloView,
+    SalvarRespostasLoteView,
     ModuloView,
     GerarRelatorioModuloView,
     SearchRelatorio,
@@ -9,18 +10,31 @@ from .views import (
     SearchAllDatesRelatorio,
     SearchLastDimensaoResultados,
     RespostaModuloViewSet,
-    SalvarRespostaIncompletaView
+    SalvarRespostaIncompletaView,
+    BenchmarkModuloView,
+    CriarTarefaRelatorioView,
+    StatusTarefaRelatorioView,
+    BaixarTarefaRelatorioView,
+    ExportarRelatoriosView,
+    MetricasView,
 )
 
 urlpatterns = [
     path('questionario/modulos/<str:nomeModulo>/', ModuloView.as_view(), name='obter_modulo'),
     path('questionario/', QuestionarioView.as_view(), name='obter-questionario'),
+    path('modulos/respostas/lote/', SalvarRespostasLoteView.as_view(), name='salvar_respostas_lote'),
     path('modulos/<str:nomeModulo>/respostas/', SalvarRespostasModuloView.as_view(), name='salvar_respostas_modulo'),
     path('questionario/salvar-incompleta/', SalvarRespostaIncompletaView.as_view(), name='salvar_resposta_incompleta'),
     path('modulos/<str:identificador>/relatorio/', GerarRelatorioModuloView.as_view(), name='modulo-relatorio.pdf'),
+    path('modulos/<str:identificador>/relatorio/tarefas/', CriarTarefaRelatorioView.as_view(), name='criar-tarefa-relatorio'),
+    path('relatorios/tarefas/<uuid:tarefa_id>/', StatusTarefaRelatorioView.as_view(), name='tarefa-relatorio'),
+    path('relatorios/tarefas/<uuid:tarefa_id>/pdf/', BaixarTarefaRelatorioView.as_view(), name='tarefa-relatorio-pdf'),
+    path('relatorios/exportar/', ExportarRelatoriosView.as_view(), name='exportar-relatorios'),
     path('relatorios/', SearchRelatorio.as_view(), name='relatorios'),
     path('questionario/<str:identificador>/check_deadline/', CheckDeadlineResponde.as_view(), name='check-deadline'),
     path('relatorios/datas/', SearchAllDatesRelatorio.as_view(), name='all-dates-relatorios'),
     path('relatorios/dimensoes/', SearchLastDimensaoResultados.as_view(), name='all-dimensoes'),
     path('relatorio/modulo/', RespostaModuloViewSet.as_view(), name='relatorio-modulo'),
+    path('modulos/<str:identificador>/benchmark/', BenchmarkModuloView.as_view(), name='modulo-benchmark'),
+    path('metricas/', MetricasView.as_view(), name='metricas'),
 ]
\ No newline at end of file
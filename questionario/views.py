@@ -1,63 +1,53 @@
-import io
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import inch, cm
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import Paragraph
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from django.conf import settings
 from django.db import transaction
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
 from django.utils import timezone
-from django.db.models import Max
-from .models import Modulo, Dimensao, Pergunta, RespostaDimensao, RespostaModulo, RespostaModuloIncompleta
-from .serializers import RelatorioSerializer, RespostaModuloSerializer
+from .models import Modulo, Dimensao, Pergunta, RespostaDimensao, RespostaModulo, RespostaModuloIncompleta, TarefaRelatorio, UltimaRespostaDimensao, UltimaRespostaModulo
+from .serializers import RelatorioValoresSerializer, RespostaModuloSerializer
+from .renderers import RENDERIZADORES_RAPIDOS
+from .medias import medias_outros_usuarios
+from .distribuicoes import distribuicoes, limites_histograma
+from .catalogo import calcular_etag, catalogo_modulo, catalogo_questionario
+from .pontuacao import plano_pontuacao
+from .respostas import salvar_respostas
+from .idempotencia import idempotente
+from .rascunhos import BUFFER as RASCUNHO_BUFFER, descarregar_modulo, rascunhos_em_buffer, salvar_rascunho
+from django.db.models import Sum
 from datetime import datetime, timedelta
 from django.shortcuts import get_object_or_404
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import numpy as np
-from reportlab.lib.utils import ImageReader
+from .tarefas import FilaCheia, abrir_relatorio_gerado, expirar_se_abandonada, iniciar_tarefa, profundidade_fila
+from django.urls import reverse
+from .exportacao import gerar_zip, selecionar_respostas
+from .relatorios import abrir_relatorio
+from .metricas import exposicao
+from .series import BUCKETS, agregar_historico
+from .paginacao import converter_data, data_parametro, decodificar_cursor, filtrar_modulo, limite_pagina, paginar, pedido_paginado
+
+def resposta_com_etag(request, dados, etag, privada=False):
+    # 304 quando o cliente já tem a versão atual
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = Response(dados)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache' if privada else 'no-cache'
+    if privada:
+        patch_vary_headers(response, ['Cookie', 'Authorization'])
+    return response
 
 class QuestionarioView(APIView):
     # Permite não estar autenticado para testes
     permission_classes = [AllowAny]
+    renderer_classes = RENDERIZADORES_RAPIDOS
 
     def get(self, request):
         try:
-
-            modulos = Modulo.objects.prefetch_related(
-                'dimensoes__perguntas').all()
-
-            dadosQuestionario = []
-
-            for modulo in modulos:
-                dimensoesDoModulo = modulo.dimensoes.all()
-                dadosDimensoes = []
-
-                for dimensao in dimensoesDoModulo:
-
-                    dadosDimensao = {
-                        'dimensaoTitulo': dimensao.titulo,
-                        'descricao': dimensao.descricao,
-                        'tipo': dimensao.get_tipo_display(),
-                        'explicacao': dimensao.explicacao,
-                    }
-                    dadosDimensoes.append(dadosDimensao)
-
-                dadosModulo = {
-                    'nome': modulo.nome,
-                    'descricao': modulo.descricao,
-                    'tempo': modulo.tempo,
-                    'perguntasQntd': modulo.perguntasQntd,
-                    'dimensoes': dadosDimensoes
-                }
-                dadosQuestionario.append(dadosModulo)
-
-            return Response({'modulos': dadosQuestionario})
+            dadosQuestionario, etag = catalogo_questionario()
+            return resposta_com_etag(request, {'modulos': dadosQuestionario}, etag)
 
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -66,57 +56,54 @@ class ModuloView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, nomeModulo):
+        dadosModulo, etagModulo = catalogo_modulo(nomeModulo)
+        if dadosModulo is None:
+            raise Http404
+
         try:
             usuario = request.user if request.user.is_authenticated else None
-            moduloObj = get_object_or_404(
-                Modulo.objects.prefetch_related('dimensoes__perguntas'),
-                nome=nomeModulo
-            )
+            dadosDimensoes = dadosModulo['dimensoes']
 
-            dadosDimensoes = []
-
-            for dimensao in moduloObj.dimensoes.all():
-                perguntasData = []
-                for p in dimensao.perguntas.all():
-                    perguntasData.append({
-                        'id': p.id,
-                        'pergunta': p.pergunta,
-                    })
-
-                dados_dimensao = {
-                    'dimensaoTitulo': dimensao.titulo,
-                    'descricao': dimensao.descricao,
-                    'tipo': dimensao.get_tipo_display(),
-                    'explicacao': dimensao.explicacao,
-                    'perguntas': perguntasData
-                }
-                dadosDimensoes.append(dados_dimensao)
-            
-            nextDimensionIndex = 0
+            # Só o rascunho do usuário é calculado por requisição
+            respostasIncompletas = {}
             if usuario:
-                resposta_incompleta = RespostaModuloIncompleta.objects.filter(usuario=usuario, modulo=moduloObj).first()
-                if resposta_incompleta and resposta_incompleta.respostas:
-                    respondidas = list(resposta_incompleta.respostas.keys())
-                    for idx, dim in enumerate(dadosDimensoes):
-                        if dim['dimensaoTitulo'] not in respondidas:
-                            nextDimensionIndex = idx
-                            break
-                    else:
-                        nextDimensionIndex = len(dadosDimensoes)
-            
-            respondidas = []
-            if resposta_incompleta and resposta_incompleta.respostas:
-                respondidas = list(resposta_incompleta.respostas.keys())
-
-            response_data = {
-                'nomeModulo': moduloObj.nome,
-                'dimensoes': dadosDimensoes,
+                for titulo, respostas in RespostaModuloIncompleta.objects.filter(
+                        usuario=usuario, modulo_id=dadosModulo['id']
+                ).order_by('id').values_list('dimensao__titulo', 'respostas'):
+                    respostasIncompletas[titulo] = {'dimensao': titulo, 'respostas': respostas}
+
+                # Autosaves ainda não gravados no banco prevalecem
+                plano = plano_pontuacao(nomeModulo) if RASCUNHO_BUFFER else None
+                if plano:
+                    for rascunho in rascunhos_em_buffer(
+                            usuario.id, plano.modulo_id, plano.dimensoes_por_titulo.values()):
+                        respostasIncompletas.pop(rascunho['titulo'], None)
+                        respostasIncompletas[rascunho['titulo']] = {
+                            'dimensao': rascunho['titulo'], 'respostas': rascunho['respostas']}
+
+            respondidas = list(respostasIncompletas)
+            nextDimensionIndex = 0
+            if respondidas:
+                for idx, dim in enumerate(dadosDimensoes):
+                    if dim['dimensaoTitulo'] not in respostasIncompletas:
+                        nextDimensionIndex = idx
+                        break
+                else:
+                    nextDimensionIndex = len(dadosDimensoes)
+
+            rascunho = {
                 'nextDimensionIndex': nextDimensionIndex,
                 'respondidads': respondidas,
-                'respostasIncompletas': resposta_incompleta.respostas if resposta_incompleta else {},
+                'respostasIncompletas': respostasIncompletas,
+            }
+            response_data = {
+                'nomeModulo': dadosModulo['nomeModulo'],
+                'dimensoes': dadosDimensoes,
+                **rascunho,
             }
 
-            return Response(response_data, status=status.HTTP_200_OK)
+            etag = calcular_etag([etagModulo, rascunho])
+            return resposta_com_etag(request, response_data, etag, privada=True)
 
         except Exception as e:
             return Response(
@@ -127,12 +114,12 @@ class ModuloView(APIView):
 class SalvarRespostasModuloView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @idempotente
     @transaction.atomic
     def post(self, request, nomeModulo):
         usuario = request.user
-        try:
-            modulo = get_object_or_404(Modulo, nome=nomeModulo)
-        except Modulo.DoesNotExist:
+        plano = plano_pontuacao(nomeModulo)
+        if plano is None:
             return Response(
                 {'error': f'Módulo com nome "{nomeModulo}" não encontrado.'},
                 status=status.HTTP_404_NOT_FOUND
@@ -156,61 +143,7 @@ class SalvarRespostasModuloView(APIView):
                 status=status.HTTP_200_OK
             )
 
-        erros = []
-        perguntasRespondidasId = set()
-        somasPorDimensao = {}
-
-        try:
-            perguntasDoModulo = Pergunta.objects.filter(
-                dimensao__modulo=modulo
-            ).select_related('dimensao')
-            mapa_perguntas_validas = {p.id: p for p in perguntasDoModulo}
-        except Exception as e:
-            return Response(
-                {'error': f'Erro crítico ao buscar perguntas do módulo: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-
-        for idx, resposta_info in enumerate(respostasData):
-            if not isinstance(resposta_info, dict):
-                erros.append(f"Item {idx+1}: Não é um objeto JSON válido.")
-                continue
-
-            perguntaId = resposta_info.get('id')
-            valor = resposta_info.get('valor')
-
-            if perguntaId is None:
-                erros.append(f"Item {idx+1}: Chave 'id' ausente.")
-                continue
-            if valor is None:
-                erros.append(
-                    f"Item {idx+1} (ID {perguntaId}): Chave 'valor' ausente.")
-                continue
-
-            try:
-                valor_int = int(valor)
-            except (ValueError, TypeError):
-                erros.append(
-                    f"Item {idx+1} (ID {perguntaId}): 'valor' deve ser um número inteiro (recebeu '{valor}').")
-                continue
-
-            perguntaObj = mapa_perguntas_validas.get(perguntaId)
-            if not perguntaObj:
-                erros.append(
-                    f"Item {idx+1}: Pergunta com ID {perguntaId} não encontrada ou não pertence ao módulo '{nomeModulo}'.")
-                continue
-
-            if perguntaId in perguntasRespondidasId:
-                erros.append(
-                    f"Item {idx+1}: Resposta duplicada para a pergunta com ID {perguntaId} nesta requisição.")
-                continue
-            perguntasRespondidasId.add(perguntaId)
-
-            dimensaoObj = perguntaObj.dimensao
-            dimensaoPk = dimensaoObj.pk
-            valorPonderado = valor_int * perguntaObj.peso
-            somasPorDimensao[dimensaoPk] = somasPorDimensao.get(
-                dimensaoPk, 0) + valorPonderado
+        somasPorDimensao, erros = plano.pontuar(respostasData)
 
         if erros:
             return Response({
@@ -218,48 +151,28 @@ class SalvarRespostasModuloView(APIView):
                 'detalhes': erros,
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        dimensoesCriadas = []
-        respostaModuloStatus = None
-        valorFinalModulo = 0
-
         try:
-
-            respostaModuloObj = RespostaModulo.objects.create(
-                usuario=usuario,
-                modulo=modulo,
-                valorFinal=valorFinalModulo
-            )
-            respostaModuloStatus = 'Criada'
-        
-            for dimensaoPk, somaTotal in somasPorDimensao.items():
-                RespostaDimensao.objects.create(
-                    usuario=usuario,
-                    dimensao_id=dimensaoPk,
-                    valorFinal=somaTotal,
-                    resposta_modulo=respostaModuloObj
-                )
-                dimensoesCriadas.append({
-                    'dimensaoId': dimensaoPk,
-                    'valorFinal': somaTotal,
-                    'status': 'Criada'
-                })
-
-            valorFinalModulo = sum(somasPorDimensao.values())
-            respostaModuloObj.valorFinal = valorFinalModulo
-            respostaModuloObj.save()
-
+            descarregar_modulo(usuario.id, plano.modulo_id, plano.dimensoes_por_titulo.values())
+            salvar_respostas(usuario, [(plano, somasPorDimensao)])
         except Exception as e:
             return Response(
                 {'error': f'Erro ao salvar respostas no banco de dados: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+        valorFinalModulo = sum(somasPorDimensao.values())
+        respostaModuloStatus = 'Criada'
+        dimensoesCriadas = [
+            {'dimensaoId': dimensaoPk, 'valorFinal': somaTotal, 'status': 'Criada'}
+            for dimensaoPk, somaTotal in somasPorDimensao.items()
+        ]
+
         return Response(
             {
                 'message': f'Respostas para o módulo "{nomeModulo}" processadas e salvas com sucesso.',
                 'modulo': {
-                    'moduloId': modulo.id,
-                    'nomeModulo': modulo.nome,
+                    'moduloId': plano.modulo_id,
+                    'nomeModulo': plano.nome,
                     'valorFinal': valorFinalModulo,
                     'status': respostaModuloStatus
                 },
@@ -268,6 +181,106 @@ class SalvarRespostasModuloView(APIView):
             status=status.HTTP_200_OK
         )
 
+MODOS_LOTE = ('tudo_ou_nada', 'por_item')
+
+def erro_lista_respostas(respostasData):
+    if respostasData is None:
+        return 'Payload deve conter a chave "respostas".'
+    if not isinstance(respostasData, list):
+        return '"respostas" deve ser uma lista.'
+    if not respostasData:
+        return 'A lista "respostas" está vazia.'
+    return None
+
+class SalvarRespostasLoteView(APIView):
+    # Várias submissões de módulo numa requisição, para quem coleta offline.
+    # modo=tudo_ou_nada não salva nada se alguma falhar; modo=por_item salva
+    # as válidas e devolve o erro das demais.
+    permission_classes = [IsAuthenticated]
+
+    @idempotente
+    def post(self, request):
+        usuario = request.user
+        modo = request.data.get('modo', 'tudo_ou_nada')
+        submissoes = request.data.get('submissoes')
+
+        if modo not in MODOS_LOTE:
+            return Response(
+                {'error': f'"modo" deve ser um de: {", ".join(MODOS_LOTE)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not isinstance(submissoes, list) or not submissoes:
+            return Response(
+                {'error': 'Payload deve conter a lista não vazia "submissoes".'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(submissoes) > settings.RESPOSTAS_LOTE_MAXIMO:
+            return Response(
+                {'error': f'No máximo {settings.RESPOSTAS_LOTE_MAXIMO} submissões por lote.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        resultados = []
+        validas = []
+        for idx, submissao in enumerate(submissoes):
+            nomeModulo = submissao.get('nomeModulo') if isinstance(submissao, dict) else None
+            # Lista ou objeto no lugar do nome: erro do item, não do lote
+            if not isinstance(nomeModulo, str):
+                nomeModulo = None
+            resultado = {'indice': idx, 'nomeModulo': nomeModulo}
+            resultados.append(resultado)
+
+            plano = plano_pontuacao(nomeModulo) if nomeModulo else None
+            erro = erro_lista_respostas(submissao.get('respostas')) if plano else None
+            if not nomeModulo:
+                erros = ['Submissão deve ser um objeto com "nomeModulo" e "respostas".']
+            elif plano is None:
+                erros = [f'Módulo com nome "{nomeModulo}" não encontrado.']
+            elif erro:
+                erros = [erro]
+            else:
+                somasPorDimensao, erros = plano.pontuar(submissao['respostas'])
+
+            if erros:
+                resultado.update({'status': 'Erro', 'detalhes': erros})
+            else:
+                validas.append((resultado, plano, somasPorDimensao))
+
+        if len(validas) < len(submissoes) and (modo == 'tudo_ou_nada' or not validas):
+            for resultado, _, _ in validas:
+                resultado['status'] = 'Não salva'
+            return Response({
+                'error': 'Falha na validação das submissões. Nenhuma resposta foi salva.',
+                'resultados': resultados,
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            for _, plano, _ in validas:
+                descarregar_modulo(usuario.id, plano.modulo_id, plano.dimensoes_por_titulo.values())
+            respostasModulo = salvar_respostas(
+                usuario, [(plano, somasPorDimensao) for _, plano, somasPorDimensao in validas])
+        except Exception as e:
+            return Response(
+                {'error': f'Erro ao salvar respostas no banco de dados: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        for (resultado, _, somasPorDimensao), respostaModulo in zip(validas, respostasModulo):
+            resultado.update({
+                'status': 'Criada',
+                'respostaModuloId': respostaModulo.id,
+                'valorFinal': respostaModulo.valorFinal,
+                'dimensoesCriadas': [
+                    {'dimensaoId': dimensaoPk, 'valorFinal': somaTotal}
+                    for dimensaoPk, somaTotal in somasPorDimensao.items()
+                ],
+            })
+
+        return Response({
+            'message': f'{len(validas)} de {len(submissoes)} submissões salvas.',
+            'resultados': resultados,
+        }, status=status.HTTP_200_OK if len(validas) == len(submissoes) else status.HTTP_207_MULTI_STATUS)
+
 class SalvarRespostaIncompletaView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -280,256 +293,234 @@ class SalvarRespostaIncompletaView(APIView):
         if not nome_modulo or not dimensao_titulo or not isinstance(respostas, list):
             return Response({'error': 'Dados insuficientes.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        modulo = get_object_or_404(Modulo, nome=nome_modulo)
-        dimensao = get_object_or_404(Dimensao, titulo=dimensao_titulo, modulo=modulo)
+        plano = plano_pontuacao(nome_modulo)
+        dimensao_id = plano.dimensoes_por_titulo.get(dimensao_titulo) if plano else None
+        if dimensao_id is None:
+            raise Http404
 
-        registro_dimensao = {
-            'dimensao': dimensao.titulo,
-            'respostas': respostas
-        }
-        obj, created = RespostaModuloIncompleta.objects.get_or_create(
-            usuario=usuario,
-            modulo=modulo,
-            defaults={'respostas': {}}
-        )
-        dados = obj.respostas or {}
-        dados[dimensao.titulo] = registro_dimensao
-        obj.respostas = dados
-        obj.save()
+        salvar_rascunho(usuario.id, plano.modulo_id, dimensao_id, dimensao_titulo, respostas)
 
         return Response({'message': 'Respostas incompletas salvas com sucesso.'}, status=status.HTTP_200_OK)
     
+def resolver_resposta_modulo(usuario, identificador):
+    # Id de uma RespostaModulo do usuário ou nome do módulo (última resposta)
+    if identificador.isdigit():
+        resposta_modulo = get_object_or_404(
+            RespostaModulo.objects.select_related('modulo'), id=int(identificador), usuario=usuario
+        )
+        return resposta_modulo.modulo, resposta_modulo
+
+    modulo = get_object_or_404(
+        Modulo, nome=identificador
+    )
+
+    ponteiro = UltimaRespostaModulo.objects.filter(
+        usuario=usuario, modulo=modulo
+    ).select_related('resposta_modulo__modulo').first()
+    return modulo, ponteiro.resposta_modulo if ponteiro else None
+
+def resposta_fila_cheia():
+    response = Response(
+        {'error': 'Muitos relatórios em geração no momento. Tente novamente em instantes.'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = '10'
+    return response
+
 class GerarRelatorioModuloView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def _avaliar_modulo(self, pontuacao):
-        if 142 <= pontuacao <= 175:
-            return "Excelente"
-        elif 106 <= pontuacao <= 141:
-            return "Ótimo"
-        elif 71 <= pontuacao <= 105:
-            return "Médio"
-        elif 35 <= pontuacao <= 70:
-            return "Insuficiente"
-        else:
-            return "Fora da faixa de avaliação"
-
-    def _avaliar_dimensao(self, pontuacao):
-        if 21 <= pontuacao <= 25:
-            return "Excelente"
-        elif 16 <= pontuacao <= 20:
-            return "Ótimo"
-        elif 11 <= pontuacao <= 15:
-            return "Médio"
-        elif 5 <= pontuacao <= 10:
-            return "Insuficiente"
-        else:
-            return "Fora da faixa de avaliação"
-
     def get(self, request, identificador):
         usuario = request.user
 
         try:
+            modulo, resposta_modulo = resolver_resposta_modulo(usuario, identificador)
 
-            if identificador.isdigit():
-                resposta_modulo = get_object_or_404(
-                    RespostaModulo, id=int(identificador), usuario=usuario
-                )
-                modulo = resposta_modulo.modulo
-            else:
-                modulo = get_object_or_404(
-                    Modulo, nome=identificador
-                )
-
-                resposta_modulo = RespostaModulo.objects.filter(
-                    usuario=usuario, modulo=modulo
-                ).order_by('-dataResposta').first()
-
-        
-            respostas_dimensoes = RespostaDimensao.objects.filter(
-                usuario=usuario,
-                resposta_modulo=resposta_modulo
-            ).select_related('dimensao').order_by('dimensao__titulo')
+            # PDF já salvo é servido direto; senão espera o pool de renderização
+            arquivo = abrir_relatorio_gerado(resposta_modulo, usuario) if resposta_modulo else None
 
-            if not respostas_dimensoes.exists():
+            if arquivo is None:
                 return Response(
                     {'error': f'Respostas das dimensões para o módulo "{modulo.nome}" não encontradas para este usuário.'},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            buffer = io.BytesIO()
-            c = canvas.Canvas(buffer, pagesize=A4)
-            styles = getSampleStyleSheet()
-            width, height = A4
-
-            y_position = height - 1.5*cm
-            margin_left = 1.5*cm
-            content_width = width - 2*margin_left
-
-            style_title = styles['h1']
-            style_h2 = styles['h2']
-            style_body = styles['BodyText']
-            style_body.leading = 14
-
-            p = Paragraph("Relatório de Desempenho", style_title)
-            p.wrapOn(c, content_width, height)
-            p_height = p.height
-            p.drawOn(c, margin_left, y_position - p_height)
-            y_position -= (p_height + 0.5*cm)
-
-            p = Paragraph(f"<b>Usuário:</b> {usuario.username} ({usuario.email})", style_body)
-            p.wrapOn(c, content_width, height)
-            p_height = p.height
-            p.drawOn(c, margin_left, y_position - p_height)
-            y_position -= (p_height + 0.2*cm)
-
-            p = Paragraph(f"<b>Módulo:</b> {modulo.nome}", style_h2)
-            p.wrapOn(c, content_width, height)
-            p_height = p.height
-            p.drawOn(c, margin_left, y_position - p_height)
-            y_position -= (p_height + 0.1*cm)
-
-            p = Paragraph(f"<i>Descrição:</i> {modulo.descricao}", style_body)
-            p.wrapOn(c, content_width, height)
-            p_height = p.height
-            p.drawOn(c, margin_left, y_position - p_height)
-            y_position -= (p_height + 0.5*cm)
-
-            pontuacao_modulo = resposta_modulo.valorFinal
-            avaliacao_modulo = self._avaliar_modulo(pontuacao_modulo)
-            p = Paragraph(f"<b>Resultado Geral do Módulo:</b> {pontuacao_modulo} pontos - <b>{avaliacao_modulo}</b>", style_body)
-            p.wrapOn(c, content_width, height)
-            p_height = p.height
-            p.drawOn(c, margin_left, y_position - p_height)
-            y_position -= (p_height + 0.7*cm)
-
-            p = Paragraph("Resultados por Dimensão:", style_h2)
-            p.wrapOn(c, content_width, height)
-            p_height = p.height
-            p.drawOn(c, margin_left, y_position - p_height)
-            y_position -= (p_height + 0.3*cm)
-
-            for resp_dim in respostas_dimensoes:
-                dimensao = resp_dim.dimensao
-                pontuacao_dimensao = resp_dim.valorFinal
-                avaliacao_dimensao = self._avaliar_dimensao(pontuacao_dimensao)
-
-                p = Paragraph(f"<b>{dimensao.titulo}:</b>", style_body)
-                p.wrapOn(c, content_width, height)
-                p_height = p.height
-                p.drawOn(c, margin_left, y_position - p_height)
-                y_position -= p_height
-
-                p = Paragraph(f"    Pontuação: {pontuacao_dimensao} - <b>{avaliacao_dimensao}</b>", style_body)
-                p.wrapOn(c, content_width, height)
-                p_height = p.height
-                p.drawOn(c, margin_left, y_position - p_height)
-                y_position -= (p_height + 0.3*cm)
-
-                if y_position < 3*cm:
-                    c.showPage() 
-                    y_position = height - 1.5*cm
-
-            img_width = 10 * cm
-            img_height = 10 * cm
-            x_center = (width - img_width) / 2
-            if y_position - img_height < 2*cm:
-                c.showPage()
-                y_position = height - 2*cm
-
-            labels = [resp.dimensao.titulo for resp in respostas_dimensoes]
-            values = [resp.valorFinal for resp in respostas_dimensoes]
-            if len(labels) < 3:
-                labels += [''] * (3 - len(labels))
-                values += [0] * (3 - len(values))
-            num_vars = len(labels)
-
-            angles = np.linspace(0, 2 * np.pi, num_vars, endpoint=False).tolist()
-            values += values[:1]
-            angles += angles[:1]
-
-            fig, ax = plt.subplots(figsize=(5, 5), subplot_kw=dict(polar=True))
-            ax.plot(angles, values, color='#058aff', linewidth=2)
-            ax.fill(angles, values, color='#058aff', alpha=0.25)
-            ax.set_xticks(angles[:-1])
-            ax.set_xticklabels(labels, fontsize=10)
-            ax.set_yticklabels([])
-            ax.set_title('Desempenho por Dimensão', y=1.08)
-            plt.tight_layout()
-
-            img_buffer = io.BytesIO()
-            plt.savefig(img_buffer, format='PNG', bbox_inches='tight', dpi=120)
-            plt.close(fig)
-            img_buffer.seek(0)
-            radar_img = ImageReader(img_buffer)
-
-            c.drawImage(radar_img, x_center, y_position - img_height, width=img_width, height=img_height)
-            y_position -= (img_height + 0.5*cm)
-
-            c.save()
-
-            buffer.seek(0)
-            response = HttpResponse(buffer, content_type='application/pdf')
             filename = f"relatorio_{identificador.replace(' ', '_')}_{usuario.username}.pdf"
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-            return response
-
-        except Modulo.DoesNotExist:
-            return Response(
-                {'error': f'Módulo com nome "{modulo.nome}" não encontrado.'},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        except RespostaModulo.DoesNotExist:
-             return Response(
-                {'error': f'O usuário {usuario.username} ainda não respondeu ao módulo "{modulo.nome}".'},
-                status=status.HTTP_404_NOT_FOUND
+            return FileResponse(
+                arquivo,
+                as_attachment=True,
+                filename=filename,
+                content_type='application/pdf'
             )
+
+        except Http404:
+            raise
+        except FilaCheia:
+            return resposta_fila_cheia()
         except Exception as e:
             return Response(
                 {'error': f'Erro ao gerar o relatório PDF: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class CriarTarefaRelatorioView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, identificador):
+        usuario = request.user
+        modulo, resposta_modulo = resolver_resposta_modulo(usuario, identificador)
+
+        try:
+            tarefa = iniciar_tarefa(resposta_modulo, usuario) if resposta_modulo else None
+        except FilaCheia:
+            return resposta_fila_cheia()
+
+        if tarefa is None:
+            return Response(
+                {'error': f'Respostas das dimensões para o módulo "{modulo.nome}" não encontradas para este usuário.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        return Response(dados_tarefa(tarefa), status=status.HTTP_202_ACCEPTED)
+
+def dados_tarefa(tarefa):
+    return {
+        'id': str(tarefa.id),
+        'status': tarefa.status,
+        'erro': tarefa.erro or None,
+        'respostaModuloId': tarefa.resposta_modulo_id,
+        'fila': profundidade_fila(),
+        'download': reverse('tarefa-relatorio-pdf', args=[tarefa.id]) if tarefa.status == 'CONCLUIDA' else None,
+    }
+
+class StatusTarefaRelatorioView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, tarefa_id):
+        tarefa = get_object_or_404(TarefaRelatorio, id=tarefa_id, usuario=request.user)
+        return Response(dados_tarefa(expirar_se_abandonada(tarefa)))
+
+class BaixarTarefaRelatorioView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, tarefa_id):
+        tarefa = get_object_or_404(
+            TarefaRelatorio.objects.select_related('relatorio', 'resposta_modulo__modulo'),
+            id=tarefa_id, usuario=request.user
+        )
+        if tarefa.status != 'CONCLUIDA' or tarefa.relatorio is None:
+            return Response(dados_tarefa(tarefa), status=status.HTTP_409_CONFLICT)
+
+        arquivo = abrir_relatorio(tarefa.relatorio)
+        if arquivo is None:
+            # Removido depois da conclusão da tarefa: renderiza de novo
+            try:
+                arquivo = abrir_relatorio_gerado(tarefa.resposta_modulo, request.user)
+            except FilaCheia:
+                return resposta_fila_cheia()
+            if arquivo is None:
+                raise Http404
+
+        nome_modulo = tarefa.resposta_modulo.modulo.nome
+        filename = f"relatorio_{nome_modulo.replace(' ', '_')}_{request.user.username}.pdf"
+        return FileResponse(
+            arquivo,
+            as_attachment=True,
+            filename=filename,
+            content_type='application/pdf'
+        )
+
 class SearchRelatorio(APIView):
     permission_classes = [IsAuthenticated]
+    renderer_classes = RENDERIZADORES_RAPIDOS
 
+    # ?data=YYYY-MM-DD (um dia) ou ?de=&ate= (também from/to), mais ?modulo=
+    # (id ou nome). Sem ?limite= nem ?cursor= devolve todos os resultados,
+    # como antes; com eles, uma página e o 'proximo' cursor, como em
+    # SearchAllDatesRelatorio.
     def get(self, request):
         data_str = request.GET.get('data')  # espera "YYYY-MM-DD"
 
-        if not data_str:
+        try:
+            if data_str:
+                start_datetime = converter_data(data_str)
+                end_datetime = converter_data(data_str, fim_do_dia=True)
+            else:
+                start_datetime = data_parametro(request, 'de', 'from')
+                end_datetime = data_parametro(request, 'ate', 'to', fim_do_dia=True)
+            limite = limite_pagina(request)
+            cursor = decodificar_cursor(request.GET.get('cursor'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if start_datetime is None and end_datetime is None:
             return Response({'error': 'Data não informada.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            data_obj = datetime.strptime(data_str, '%Y-%m-%d').date()
-        except ValueError:
-            return Response({'error': 'Formato de data inválido. Use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        relatorios = RespostaModulo.objects.filter(usuario=request.user)
+        if start_datetime is not None:
+            relatorios = relatorios.filter(dataResposta__gte=start_datetime)
+        if end_datetime is not None:
+            relatorios = relatorios.filter(dataResposta__lte=end_datetime)
+        relatorios = filtrar_modulo(relatorios, request.GET.get('modulo'))
 
-        start_datetime = timezone.make_aware(datetime.combine(data_obj, datetime.min.time()))
-        end_datetime = timezone.make_aware(datetime.combine(data_obj, datetime.max.time()))
+        relatorios = relatorios.values(*RelatorioValoresSerializer.colunas())
+        if not pedido_paginado(request):
+            serializer = RelatorioValoresSerializer(relatorios.order_by('dataResposta', 'id'), many=True)
+            return Response({'resultados': serializer.data})
 
-        relatorios = RespostaModulo.objects.filter(
-            usuario=request.user,
-            dataResposta__range=(start_datetime, end_datetime)
-        )
-        serializer = RelatorioSerializer(relatorios, many=True)
-        return Response({'resultados': serializer.data})
+        pagina, proximo = paginar(relatorios, cursor, limite)
+        serializer = RelatorioValoresSerializer(pagina, many=True)
+        return Response({'resultados': serializer.data, 'proximo': proximo})
 
 class SearchAllDatesRelatorio(APIView):
     permission_classes = [IsAuthenticated]
+    renderer_classes = RENDERIZADORES_RAPIDOS
     
+    # Filtros opcionais ?de=&ate= (também from/to) e ?modulo=. Sem ?limite=
+    # nem ?cursor= devolve a lista inteira, como antes; com eles, uma página
+    # {'resultados', 'proximo'} como em SearchRelatorio. Com ?bucket=dia,
+    # semana ou mes devolve um ponto agregado por bucket e módulo.
     def get(self, request):
         user = request.user
-        registros = RespostaModulo.objects.filter(usuario=user) \
-            .order_by('dataResposta') \
-            .values('dataResposta', 'valorFinal')
-        
+        paginado = pedido_paginado(request)
+        bucket = request.GET.get('bucket')
+        if bucket and bucket not in BUCKETS:
+            return Response({'error': 'bucket deve ser dia, semana ou mes.'}, status=status.HTTP_400_BAD_REQUEST)
+        if bucket and paginado:
+            return Response({'error': 'bucket não pode ser combinado com limite ou cursor.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            de = data_parametro(request, 'de', 'from')
+            ate = data_parametro(request, 'ate', 'to', fim_do_dia=True)
+            limite = limite_pagina(request)
+            cursor = decodificar_cursor(request.GET.get('cursor'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        registros = RespostaModulo.objects.filter(usuario=user)
+        if de is not None:
+            registros = registros.filter(dataResposta__gte=de)
+        if ate is not None:
+            registros = registros.filter(dataResposta__lte=ate)
+        registros = filtrar_modulo(registros, request.GET.get('modulo'))
+        if bucket:
+            return Response(agregar_historico(registros, user, bucket))
+        registros = registros.values('id', 'dataResposta', 'valorFinal')
+
+        proximo = None
+        if paginado:
+            registros, proximo = paginar(registros, cursor, limite)
+        else:
+            registros = registros.order_by('dataResposta', 'id')
+
         dados = [
             {
                 "data": item['dataResposta'].date().isoformat(),
                 "valorFinal": item['valorFinal']
             } for item in registros
         ]
+        if paginado:
+            return Response({'resultados': dados, 'proximo': proximo})
         return Response(dados)
 
 class CheckDeadlineResponde(APIView):
@@ -544,9 +535,10 @@ class CheckDeadlineResponde(APIView):
             else:
                 modulo = get_object_or_404(Modulo, nome=identificador)
 
-            ultima_resposta = RespostaModulo.objects.filter(
+            ponteiro = UltimaRespostaModulo.objects.filter(
                 usuario=usuario, modulo=modulo
-            ).order_by('-dataResposta').first()
+            ).select_related('resposta_modulo').first()
+            ultima_resposta = ponteiro.resposta_modulo if ponteiro else None
 
             if ultima_resposta:
                 prazo_minimo = ultima_resposta.dataResposta + timedelta(days=2)
@@ -571,6 +563,7 @@ class CheckDeadlineResponde(APIView):
 
 class SearchLastDimensaoResultados(APIView):
     permission_classes = [IsAuthenticated]
+    renderer_classes = RENDERIZADORES_RAPIDOS
 
     def get(self, request):
         user = request.user
@@ -578,46 +571,35 @@ class SearchLastDimensaoResultados(APIView):
         # Buscar dimensoes e última resposta do usuário logado
         dimensoes = Dimensao.objects.all()
 
+        ultimas = {
+            ponteiro.dimensao_id: ponteiro.resposta_dimensao
+            for ponteiro in UltimaRespostaDimensao.objects.filter(
+                usuario=user).select_related('resposta_dimensao')
+        }
+
         dados = []
+        ultimas_usuario = {}
 
         for d in dimensoes:
             # Última resposta do usuário logado para essa dimensão
-            ultima_user = RespostaDimensao.objects.filter(
-                usuario=user,
-                dimensao=d
-            ).order_by('-dataResposta').first()
+            ultima_user = ultimas.get(d.id)
 
             valor_final = ultima_user.valorFinal if ultima_user else None
             data_resp = ultima_user.dataResposta if ultima_user else None
-
-            # Para outros usuários, buscar última resposta de cada um para essa dimensão
-            # Busca o id do usuário e a data mais recente para cada usuário (agrupamento)
-            ultimas_datas_outros = RespostaDimensao.objects.filter(
-                dimensao=d
-            ).exclude(usuario=user).values('usuario').annotate(
-                max_data=Max('dataResposta')
-            )
-
-            # Agora, para cada usuário, pega o valorFinal da última resposta
-            valores_outros = []
-            for entry in ultimas_datas_outros:
-                resposta = RespostaDimensao.objects.filter(
-                    usuario=entry['usuario'],
-                    dimensao=d,
-                    dataResposta=entry['max_data']
-                ).first()
-                if resposta:
-                    valores_outros.append(resposta.valorFinal)
-
-            media_outros = round(sum(valores_outros) / len(valores_outros), 2) if valores_outros else 0
+            if ultima_user:
+                ultimas_usuario[d.id] = valor_final
 
             dados.append({
                 "dimensao": d.titulo,
                 "valorFinal": valor_final,
                 "data": data_resp.date().isoformat() if data_resp else None,
-                "media": media_outros,
             })
 
+        # Média da última resposta dos outros usuários, lida do agregado
+        medias = medias_outros_usuarios(user, ultimas_usuario)
+        for d, item in zip(dimensoes, dados):
+            item["media"] = medias.get(d.id, 0)
+
         return Response(dados)
     
 class RespostaModuloViewSet(APIView):
@@ -627,34 +609,86 @@ class RespostaModuloViewSet(APIView):
     def get(self, request):
         user = request.user
         pk = request.GET.get('modulo_id')
-        resposta_modulo = get_object_or_404(RespostaModulo, id=pk, usuario=user)
+        # usuario, modulo e dimensões num número fixo de consultas
+        resposta_modulo = get_object_or_404(
+            RespostaModuloSerializer.preparar_queryset(RespostaModulo.objects.all()), id=pk, usuario=user)
 
-        dimensoes = Dimensao.objects.all()
-        media_dimensoes = {}
+        media_dimensoes = medias_outros_usuarios(user)
 
-        for d in dimensoes:
-
-            ultimas_datas_outros = RespostaDimensao.objects.filter(
-                    dimensao=d
-                ).exclude(usuario=user).values('usuario').annotate(
-                    max_data=Max('dataResposta')
-                )
-
-            # Agora, para cada usuário, pega o valorFinal da última resposta
-            valores_outros = []
-            for entry in ultimas_datas_outros:
-                resposta = RespostaDimensao.objects.filter(
-                    usuario=entry['usuario'],
-                    dimensao=d,
-                    dataResposta=entry['max_data']
-                ).first()
-                if resposta:
-                    valores_outros.append(resposta.valorFinal)
-
-            media_outros = round(sum(valores_outros) / len(valores_outros), 2) if valores_outros else 0
-            media_dimensoes[d.id] = media_outros
-            
         media_dimensoes_str = {str(k): v for k, v in media_dimensoes.items()}
         serializer = RespostaModuloSerializer(resposta_modulo, context={'media_dimensoes': media_dimensoes_str})
         
-        return Response(serializer.data,)
\ No newline at end of file
+        return Response(serializer.data,)
+
+class BenchmarkModuloView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def _limites(self, peso_minimo, peso_maximo):
+        return limites_histograma(
+            peso_minimo * Pergunta.VALOR_MINIMO,
+            peso_maximo * Pergunta.VALOR_MAXIMO
+        )
+
+    def get(self, request, identificador):
+        user = request.user
+
+        if identificador.isdigit():
+            modulo = get_object_or_404(Modulo, id=int(identificador))
+        else:
+            modulo = get_object_or_404(Modulo, nome=identificador)
+
+        dimensoes = list(Dimensao.objects.filter(modulo=modulo).annotate(
+            peso_total=Sum('perguntas__peso')
+        ))
+
+        limites_dimensoes = {
+            d.id: self._limites(d.peso_total or 0, d.peso_total or 0) for d in dimensoes
+        }
+        peso_obrigatorio = sum(d.peso_total or 0 for d in dimensoes if d.tipo == 'OBRIGATORIO')
+        peso_total = sum(d.peso_total or 0 for d in dimensoes)
+
+        total, por_dimensao = distribuicoes.estatisticas_modulo(
+            user.id, modulo.id, self._limites(peso_obrigatorio, peso_total), limites_dimensoes
+        )
+
+        return Response({
+            'modulo': modulo.nome,
+            'total': total,
+            'dimensoes': [
+                {'dimensao': d.titulo, **por_dimensao[d.id]} for d in dimensoes
+            ],
+        })
+
+class ExportarRelatoriosView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        identificador = request.GET.get('modulo')
+        modulo = None
+        if identificador:
+            if identificador.isdigit():
+                modulo = get_object_or_404(Modulo, id=int(identificador))
+            else:
+                modulo = get_object_or_404(Modulo, nome=identificador)
+
+        try:
+            de = data_parametro(request, 'de')
+            ate = data_parametro(request, 'ate', fim_do_dia=True)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        todas = request.GET.get('todas', '').lower() in ('1', 'true')
+        respostas = selecionar_respostas(modulo=modulo, de=de, ate=ate, todas=todas)
+
+        response = StreamingHttpResponse(gerar_zip(respostas), content_type='application/zip')
+        nome = (modulo.nome if modulo else 'todos').replace(' ', '_')
+        periodo = f"{request.GET.get('de', 'inicio')}_{request.GET.get('ate', 'hoje')}"
+        response['Content-Disposition'] = f'attachment; filename="relatorios_{nome}_{periodo}.zip"'
+        return response
+
+class MetricasView(APIView):
+    # Formato texto do Prometheus, somado entre os workers (ver questionario/metricas.py)
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(exposicao(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import UserAccount
+from .models import TokenRevogado, UserAccount
 
 # Register your models here.
 admin.site.register(UserAccount)
+admin.site.register(TokenRevogado)
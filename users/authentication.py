@@ -1,5 +1,53 @@
+import threading
+import time
+from collections import OrderedDict
 from django.conf import settings
+from django.core.cache import cache
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from .models import chave_cache_usuario
+from .revogacao import lista_revogacao
+
+# Segundos que um usuário fica no cache; mudanças via UserAccount.save
+# invalidam antes. Com cache local por processo é o atraso máximo entre workers.
+USUARIO_CACHE_TTL = getattr(settings, 'USUARIO_CACHE_TTL', 60)
+TOKENS_VALIDADOS_MAXIMO = getattr(settings, 'TOKENS_VALIDADOS_MAXIMO', 1024)
+
+
+class TokensValidados:
+    # LRU por processo: token bruto -> token já validado (assinatura e
+    # claims). A chave é o token inteiro, nunca só a assinatura, para que um
+    # payload alterado não reaproveite a validação de outro.
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self._lock = threading.Lock()
+        self._tokens = OrderedDict()
+
+    def obter(self, raw_token):
+        with self._lock:
+            validado = self._tokens.get(raw_token)
+            if validado is None:
+                return None
+            if validado.get('exp', 0) <= time.time():
+                del self._tokens[raw_token]
+                return None
+            self._tokens.move_to_end(raw_token)
+            return validado
+
+    def guardar(self, raw_token, validado):
+        with self._lock:
+            self._tokens[raw_token] = validado
+            self._tokens.move_to_end(raw_token)
+            while len(self._tokens) > self.maximo:
+                self._tokens.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._tokens.clear()
+
+
+tokens_validados = TokensValidados(TOKENS_VALIDADOS_MAXIMO)
 
 
 class CustomJWTAuthentication(JWTAuthentication):
@@ -15,8 +63,26 @@ class CustomJWTAuthentication(JWTAuthentication):
             if raw_token is None:
                 return None
 
-            validated_token = self.get_validated_token(raw_token)
+            if isinstance(raw_token, str):
+                raw_token = raw_token.encode()
+
+            validated_token = tokens_validados.obter(raw_token)
+            if validated_token is None:
+                validated_token = self.get_validated_token(raw_token)
+                tokens_validados.guardar(raw_token, validated_token)
+
+            if lista_revogacao.revogado(validated_token):
+                return None
 
             return self.get_user(validated_token), validated_token
         except:
             return None
+
+    def get_user(self, validated_token):
+        # Usuário ativo em cache por id; o super() faz a consulta e as checagens
+        chave = chave_cache_usuario(validated_token.get(api_settings.USER_ID_CLAIM))
+        user = cache.get(chave)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(chave, user, USUARIO_CACHE_TTL)
+        return user
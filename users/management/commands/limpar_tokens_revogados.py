@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from users.revogacao import limpar_revogacoes_expiradas
+
+
+class Command(BaseCommand):
+    help = 'Remove as revogações de tokens já expirados (agendar periodicamente, ex.: cron diário).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = limpar_revogacoes_expiradas(options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{total} revogações expiradas removidas.'))
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0005_alter_useraccount_cpf"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TokenRevogado",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("chave", models.CharField(max_length=255, unique=True)),
+                (
+                    "revogado_em",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+                ("expira_em", models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
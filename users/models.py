@@ -1,4 +1,5 @@
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
 from localflavor.br.models import BRCNPJField
 from django.contrib.auth.models import (
     BaseUserManager,
@@ -8,6 +9,17 @@ from django.contrib.auth.models import (
 from django.utils import timezone
 
 
+def chave_cache_usuario(pk):
+    # Usuário autenticado em cache (ver users/authentication.py)
+    return f'users:usuario:{pk}'
+
+
+def invalidar_cache_usuario(pk):
+    cache.delete(chave_cache_usuario(pk))
+    # De novo após o commit: uma requisição concorrente pode ter lido a versão antiga
+    transaction.on_commit(lambda: cache.delete(chave_cache_usuario(pk)))
+
+
 class UserAccountManager(BaseUserManager):
     def create_user(self, email, password=None, **kwargs):
         if not email:
@@ -60,6 +72,35 @@ class UserAccount(AbstractBaseUser, PermissionsMixin):
         return self.email
 
     def save(self, *args, **kwargs):
-        if not self.is_active and not self.deactivation_date:
+        # Conta criada inativa (cadastro aguardando ativação) não tem tokens
+        desativando = not self.is_active and not self.deactivation_date and not self._state.adding
+        if self.is_active:
+            # Reativada: a próxima desativação registra a data e revoga de novo
+            self.deactivation_date = None
+        elif not self.deactivation_date:
             self.deactivation_date = timezone.now()
         super().save(*args, **kwargs)
+        invalidar_cache_usuario(self.pk)
+        if desativando:
+            from .revogacao import lista_revogacao
+            pk = self.pk
+            # Só depois do commit: num rollback a conta continua ativa
+            transaction.on_commit(lambda: lista_revogacao.revogar_usuario(pk))
+
+    def delete(self, *args, **kwargs):
+        pk = self.pk
+        resultado = super().delete(*args, **kwargs)
+        invalidar_cache_usuario(pk)
+        return resultado
+
+
+class TokenRevogado(models.Model):
+    # jti de um token revogado (logout) ou 'usuario:<id>' para todos os tokens
+    # do usuário emitidos antes de revogado_em (desativação). Lida pelos
+    # processos através do filtro em memória de users/revogacao.py.
+    chave = models.CharField(max_length=255, unique=True)
+    revogado_em = models.DateTimeField(default=timezone.now, db_index=True)
+    expira_em = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.chave
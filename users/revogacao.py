@@ -0,0 +1,179 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from .models import TokenRevogado
+
+# Lista de revogação de tokens. Cada processo mantém um filtro de Bloom com
+# as chaves revogadas, relido de forma incremental a cada INTERVALO segundos
+# e reconstruído a cada RECONSTRUCAO segundos (para soltar as expiradas).
+# Um token fora do filtro, quase todos, é aceito sem I/O; só os "talvez" vão
+# ao LRU e, em último caso, ao banco.
+INTERVALO = getattr(settings, 'REVOGACAO_INTERVALO', 5)
+RECONSTRUCAO = getattr(settings, 'REVOGACAO_RECONSTRUCAO', 60 * 60)
+CAPACIDADE = getattr(settings, 'REVOGACAO_CAPACIDADE', 100000)
+LRU_MAXIMO = getattr(settings, 'REVOGACAO_LRU_MAXIMO', 4096)
+# Revogações gravadas com revogado_em anterior mas commitadas depois da leitura
+MARGEM = timedelta(seconds=30)
+TAXA_FALSOS_POSITIVOS = 0.001
+
+
+def chave_usuario(usuario_id):
+    return f'usuario:{usuario_id}'
+
+
+class FiltroBloom:
+
+    def __init__(self, capacidade, taxa=TAXA_FALSOS_POSITIVOS):
+        self.capacidade = capacidade
+        self.bits = max(64, int(-capacidade * math.log(taxa) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacidade * math.log(2)))
+        self.itens = 0
+        self._vetor = bytearray((self.bits + 7) // 8)
+
+    def _posicoes(self, chave):
+        # Hash duplo: k posições a partir de dois inteiros de 64 bits
+        digest = hashlib.blake2b(chave.encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], 'little')
+        b = int.from_bytes(digest[8:], 'little') | 1
+        return [(a + i * b) % self.bits for i in range(self.hashes)]
+
+    def adicionar(self, chave):
+        for posicao in self._posicoes(chave):
+            self._vetor[posicao >> 3] |= 1 << (posicao & 7)
+        self.itens += 1
+
+    def __contains__(self, chave):
+        return all(self._vetor[posicao >> 3] & (1 << (posicao & 7)) for posicao in self._posicoes(chave))
+
+
+class ListaRevogacao:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filtro = None
+        # chave -> timestamp de revogado_em, ou None se não está revogada
+        self._lru = OrderedDict()
+        self._ultima = None
+        self._proxima = 0.0
+        self._reconstruir_em = 0.0
+
+    def limpar(self):
+        with self._lock:
+            self._filtro = None
+            self._lru.clear()
+
+    def _lembrar(self, chave, revogado_em):
+        self._lru[chave] = revogado_em
+        self._lru.move_to_end(chave)
+        while len(self._lru) > LRU_MAXIMO:
+            self._lru.popitem(last=False)
+
+    def _atualizar(self):
+        # Chamado com _lock
+        agora = time.monotonic()
+        if self._filtro is not None and agora < self._proxima:
+            return
+        self._proxima = agora + INTERVALO
+
+        if self._filtro is None or agora >= self._reconstruir_em or self._filtro.itens > self._filtro.capacidade:
+            linhas = list(TokenRevogado.objects.filter(
+                expira_em__gt=timezone.now()).values_list('chave', 'revogado_em'))
+            self._filtro = FiltroBloom(max(CAPACIDADE, 2 * len(linhas)))
+            self._lru.clear()
+            self._ultima = None
+            self._reconstruir_em = agora + RECONSTRUCAO
+        else:
+            linhas = TokenRevogado.objects.filter(
+                revogado_em__gte=self._ultima - MARGEM
+            ).values_list('chave', 'revogado_em') if self._ultima else []
+
+        for chave, revogado_em in linhas:
+            self._filtro.adicionar(chave)
+            # Uma resposta negativa guardada antes não vale mais
+            self._lru.pop(chave, None)
+            if self._ultima is None or revogado_em > self._ultima:
+                self._ultima = revogado_em
+        if self._ultima is None:
+            self._ultima = timezone.now()
+
+    def _revogada_em(self, chave):
+        with self._lock:
+            if chave in self._lru:
+                self._lru.move_to_end(chave)
+                return self._lru[chave]
+        revogado_em = TokenRevogado.objects.filter(chave=chave).values_list('revogado_em', flat=True).first()
+        revogado_em = revogado_em.timestamp() if revogado_em else None
+        with self._lock:
+            self._lembrar(chave, revogado_em)
+        return revogado_em
+
+    def revogado(self, token):
+        jti = token.get(api_settings.JTI_CLAIM)
+        usuario_id = token.get(api_settings.USER_ID_CLAIM)
+        with self._lock:
+            self._atualizar()
+            jti_talvez = jti is not None and jti in self._filtro
+            usuario_talvez = usuario_id is not None and chave_usuario(usuario_id) in self._filtro
+
+        if jti_talvez and self._revogada_em(jti) is not None:
+            return True
+        if usuario_talvez:
+            revogado_em = self._revogada_em(chave_usuario(usuario_id))
+            # iat tem resolução de segundos: um token do mesmo segundo da
+            # revogação pode ter sido emitido antes dela e também cai
+            if revogado_em is not None and token.get('iat', 0) <= int(revogado_em):
+                return True
+        return False
+
+    def _registrar(self, chaves):
+        # Vale neste processo na hora; nos outros, na próxima atualização
+        with self._lock:
+            for chave, revogado_em in chaves:
+                if self._filtro is not None:
+                    self._filtro.adicionar(chave)
+                self._lembrar(chave, revogado_em.timestamp())
+
+    def revogar(self, tokens):
+        # Tokens já validados (ex.: os do logout); jti repetido é ignorado
+        agora = timezone.now()
+        revogados = [
+            TokenRevogado(
+                chave=token[api_settings.JTI_CLAIM], revogado_em=agora,
+                expira_em=datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc))
+            for token in tokens if api_settings.JTI_CLAIM in token
+        ]
+        TokenRevogado.objects.bulk_create(revogados, ignore_conflicts=True)
+        self._registrar([(revogado.chave, agora) for revogado in revogados])
+
+    def revogar_usuario(self, usuario_id):
+        # Todos os tokens já emitidos para o usuário, até o último refresh expirar
+        agora = timezone.now()
+        TokenRevogado.objects.bulk_create(
+            [TokenRevogado(chave=chave_usuario(usuario_id), revogado_em=agora,
+                           expira_em=agora + api_settings.REFRESH_TOKEN_LIFETIME)],
+            update_conflicts=True,
+            update_fields=['revogado_em', 'expira_em'],
+            unique_fields=['chave'] if connection.features.supports_update_conflicts_with_target else None,
+        )
+        self._registrar([(chave_usuario(usuario_id), agora)])
+
+
+lista_revogacao = ListaRevogacao()
+
+
+def limpar_revogacoes_expiradas(lote=1000):
+    # Remove em lotes pelo índice de expira_em; retorna quantas saíram
+    total = 0
+    while True:
+        ids = list(TokenRevogado.objects.filter(
+            expira_em__lte=timezone.now()).values_list('id', flat=True)[:lote])
+        if not ids:
+            return total
+        total += TokenRevogado.objects.filter(id__in=ids).delete()[0]
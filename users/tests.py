@@ -1,3 +1,191 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import tokens_validados
+from .models import TokenRevogado, UserAccount
+from .revogacao import lista_revogacao
+from . import urls as users_urls
 
-# Create your tests here.
+# Número de contas cadastradas; as rotas de autenticação não podem depender dele
+ESCALAS = [2, 40]
+
+
+def _rotas(conta):
+    refresh = RefreshToken.for_user(conta)
+    return {
+        'jwt/create/': lambda c: c.post('/api/jwt/create/', {'email': conta.email, 'password': 'senha'}, format='json'),
+        'jwt/refresh/': lambda c: c.post('/api/jwt/refresh/', {'refresh': str(refresh)}, format='json'),
+        'jwt/verify/': lambda c: c.post('/api/jwt/verify/', {'token': str(refresh.access_token)}, format='json'),
+        # Token novo a cada chamada: o logout revoga o anterior
+        'logout/': lambda c: c.post(
+            '/api/logout/', HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(conta).access_token}'),
+    }
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+@mock.patch('users.revogacao.INTERVALO', 10 ** 6)
+class OrcamentoConsultasAutenticacaoTests(TestCase):
+
+    def medir(self, contas):
+        medidas = {}
+        with transaction.atomic():
+            UserAccount.objects.bulk_create([
+                UserAccount(email=f'conta{i}@exemplo.com', username=f'conta{i}', cnpj=f'{i:014d}')
+                for i in range(1, contas)
+            ])
+            conta = UserAccount.objects.create_user(
+                'principal@exemplo.com', password='senha', username='principal', cnpj='99999999999999')
+            cliente = APIClient()
+            for nome, requisicao in _rotas(conta).items():
+                requisicao(cliente)
+                with CaptureQueriesContext(connection) as consultas:
+                    response = requisicao(cliente)
+                self.assertLess(response.status_code, 400, f'{nome}: {response.content[:200]}')
+                medidas[nome] = consultas.captured_queries
+            transaction.set_rollback(True)
+        return medidas
+
+    def test_todas_as_rotas_tem_orcamento(self):
+        conta = UserAccount(pk=1, email='x@exemplo.com')
+        self.assertEqual({str(padrao.pattern) for padrao in users_urls.urlpatterns}, set(_rotas(conta)))
+
+    def test_consultas_constantes_com_o_volume(self):
+        pequena, grande = (self.medir(contas) for contas in ESCALAS)
+        for nome in pequena:
+            with self.subTest(rota=nome):
+                self.assertEqual(len(pequena[nome]), len(grande[nome]),
+                                 '\n'.join(consulta['sql'] for consulta in grande[nome]))
+
+    def test_login_usa_indice(self):
+        medidas = self.medir(ESCALAS[-1])
+        with connection.cursor() as cursor:
+            for nome, consultas in medidas.items():
+                for consulta in consultas:
+                    if not consulta['sql'].startswith('SELECT'):
+                        continue
+                    cursor.execute('EXPLAIN QUERY PLAN ' + consulta['sql'])
+                    plano = [linha[-1] for linha in cursor.fetchall()]
+                    with self.subTest(rota=nome, sql=consulta['sql']):
+                        self.assertNotIn('SCAN users_useraccount', plano)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CacheAutenticacaoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        tokens_validados.limpar()
+        self.conta = UserAccount.objects.create_user(
+            'cache@exemplo.com', password='senha', username='cache', cnpj='11222333000181')
+        self.cliente = APIClient()
+        self.cliente.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.conta).access_token}')
+
+    def test_requisicoes_repetidas_nao_consultam_o_usuario(self):
+        self.assertEqual(self.cliente.get('/api/relatorios/datas/').status_code, 200)
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.cliente.get('/api/relatorios/datas/').status_code, 200)
+        self.assertFalse([c for c in consultas.captured_queries if 'users_useraccount' in c['sql']])
+
+    def test_desativacao_invalida_o_cache(self):
+        self.assertEqual(self.cliente.get('/api/relatorios/datas/').status_code, 200)
+        self.conta.is_active = False
+        self.conta.save()
+        self.assertEqual(self.cliente.get('/api/relatorios/datas/').status_code, 401)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RevogacaoTokensTests(TestCase):
+
+    def setUp(self):
+        lista_revogacao.limpar()
+        tokens_validados.limpar()
+        self.conta = UserAccount.objects.create_user(
+            'revoga@exemplo.com', password='senha', username='revoga', cnpj='11444777000161')
+        self.refresh = RefreshToken.for_user(self.conta)
+        self.cliente = APIClient()
+        self.cliente.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+
+    def test_logout_revoga_access_e_refresh(self):
+        self.assertEqual(self.cliente.get('/api/relatorios/datas/').status_code, 200)
+        self.cliente.post('/api/logout/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(self.cliente.get('/api/relatorios/datas/').status_code, 401)
+        response = APIClient().post('/api/jwt/refresh/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_outros_processos_veem_a_revogacao(self):
+        self.assertEqual(self.cliente.get('/api/relatorios/datas/').status_code, 200)
+        self.cliente.post('/api/logout/')
+        # Processo que ainda não leu a revogação: filtro reconstruído do banco
+        lista_revogacao.limpar()
+        self.assertEqual(self.cliente.get('/api/relatorios/datas/').status_code, 401)
+
+    def test_token_nao_revogado_sem_consulta(self):
+        self.cliente.get('/api/relatorios/datas/')
+        with CaptureQueriesContext(connection) as consultas:
+            self.cliente.get('/api/relatorios/datas/')
+        self.assertFalse([c for c in consultas.captured_queries if 'users_tokenrevogado' in c['sql']])
+
+    def test_desativacao_revoga_refresh_emitido_antes(self):
+        self._desativar(self.conta, segundos=2)
+        self.assertTrue(lista_revogacao.revogado(self.refresh))
+        lista_revogacao.limpar()
+        self.assertTrue(lista_revogacao.revogado(self.refresh))
+
+    def _desativar(self, conta, segundos):
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(seconds=segundos)):
+            with self.captureOnCommitCallbacks(execute=True):
+                conta.is_active = False
+                conta.save()
+
+    def test_segunda_desativacao_revoga_de_novo(self):
+        self._desativar(self.conta, segundos=-10)
+        self.conta.is_active = True
+        self.conta.save()
+        self.assertIsNone(self.conta.deactivation_date)
+
+        refresh = RefreshToken.for_user(self.conta)
+        self.assertFalse(lista_revogacao.revogado(refresh))
+        self._desativar(self.conta, segundos=2)
+        self.assertTrue(lista_revogacao.revogado(refresh))
+
+    def test_token_emitido_no_mesmo_segundo_da_desativacao(self):
+        revogado_em = timezone.now().replace(microsecond=900000) + timedelta(seconds=5)
+        with mock.patch('django.utils.timezone.now', return_value=revogado_em):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.conta.is_active = False
+                self.conta.save()
+        self.refresh['iat'] = int(revogado_em.timestamp())
+        self.assertTrue(lista_revogacao.revogado(self.refresh))
+        lista_revogacao.limpar()
+        self.assertTrue(lista_revogacao.revogado(self.refresh))
+
+        self.refresh['iat'] = int(revogado_em.timestamp()) + 1
+        self.assertFalse(lista_revogacao.revogado(self.refresh))
+
+    def test_conta_criada_inativa_nao_revoga(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            UserAccount.objects.create_user(
+                'inativa@exemplo.com', password='senha', username='inativa',
+                cnpj='11222333000181', is_active=False)
+        self.assertFalse(TokenRevogado.objects.exists())
+
+    def test_desativacao_desfeita_nao_revoga(self):
+        # Filtro já carregado, como num processo em uso
+        self.assertFalse(lista_revogacao.revogado(self.refresh))
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(seconds=2)):
+                try:
+                    with transaction.atomic():
+                        self.conta.is_active = False
+                        self.conta.save()
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+        self.assertFalse(lista_revogacao.revogado(self.refresh))
+        self.assertFalse(TokenRevogado.objects.exists())
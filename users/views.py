@@ -2,12 +2,34 @@ from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.permissions import AllowAny
 from djoser.social.views import ProviderAuthView
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import UntypedToken
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
     TokenVerifyView
 )
+from .revogacao import lista_revogacao
+
+
+def validar_token(raw_token):
+    # Token com assinatura e validade conferidas, ou None
+    try:
+        return UntypedToken(raw_token)
+    except TokenError:
+        return None
+
+
+def resposta_token_revogado(raw_token):
+    token = validar_token(raw_token) if raw_token else None
+    if token is not None and lista_revogacao.revogado(token):
+        return Response(
+            {'detail': 'Token revogado.', 'code': 'token_revoked'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    return None
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
@@ -46,6 +68,10 @@ class CustomTokenRefreshView(TokenRefreshView):
         if refresh_token:
             request.data['refresh'] = refresh_token
 
+        revogado = resposta_token_revogado(request.data.get('refresh'))
+        if revogado is not None:
+            return revogado
+
         response = super().post(request, *args, **kwargs)
 
         if response.status_code == 200:
@@ -70,10 +96,32 @@ class CustomTokenVerifyView(TokenVerifyView):
         if access_token:
             request.data['token'] = access_token
 
+        revogado = resposta_token_revogado(request.data.get('token'))
+        if revogado is not None:
+            return revogado
+
         return super().post(request, *args, **kwargs)
 
 class LogoutView(APIView):
+    # Sem exigir autenticação: com o access expirado o refresh ainda precisa ser revogado
+    permission_classes = [AllowAny]
+
     def post(self, request, *args, **kwargs):
+        candidatos = [
+            request.COOKIES.get('access'),
+            request.COOKIES.get('refresh'),
+            request.data.get('refresh'),
+        ]
+        header = request.META.get('HTTP_AUTHORIZATION', '').split()
+        if len(header) == 2:
+            candidatos.append(header[1])
+        tokens = {}
+        for raw_token in filter(None, candidatos):
+            token = validar_token(raw_token)
+            if token is not None:
+                tokens[raw_token] = token
+        lista_revogacao.revogar(tokens.values())
+
         response = Response(status=status.HTTP_204_NO_CONTENT)
         response.delete_cookie('access')
         response.delete_cookie('refresh')